@@ -1,15 +1,18 @@
 import os
 import hashlib
+import time
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .database import get_db, Usuario
+from .cache import TTLCache, geracoes
+from .database import get_async_db, Usuario
+from .schemas import UsuarioOut
 
 # Configurações
 SECRET_KEY = os.getenv("SECRET_KEY", "sua-chave-secreta-super-forte-mude-em-producao")
@@ -19,10 +22,29 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 horas
 # Chave para ativar/desativar autenticação
 AUTH_ENABLED = os.getenv("AUTH_ENABLED", "true").lower() in ("true", "1", "yes")
 
-# Utilitários de senha com pre-hash para senhas longas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+# Token já verificado -> (exp, usuário). A chave leva a geração de "usuarios", então
+# qualquer escrita em usuários invalida as entradas; o exp do token continua valendo.
+# A geração é por processo: em outro worker, um usuário removido ou alterado continua
+# autenticando pelo cache por até AUTH_CACHE_TTL segundos, por isso o TTL é curto.
+CACHE_TOKENS = TTLCache(
+    max_entradas=int(os.getenv("AUTH_CACHE_MAX_ENTRADAS", "1024")),
+    ttl_segundos=float(os.getenv("AUTH_CACHE_TTL", "5")),
+)
+
+# passlib e jose (que carrega cryptography) só são importados no primeiro login/token,
+# fora do caminho de boot do worker
+@lru_cache(maxsize=None)
+def _pwd_context():
+    """Utilitários de senha (bcrypt) com pre-hash para senhas longas"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def _jwt():
+    from jose import jwt
+    return jwt
+
 def _pre_hash_password(password: str) -> str:
     """
     Pre-hash da senha usando SHA256 para evitar limite de 72 bytes do bcrypt
@@ -37,12 +59,12 @@ def verificar_senha(senha_plana: str, senha_hash: str) -> bool:
     try:
         # Pre-hash da senha se necessário
         senha_processada = _pre_hash_password(senha_plana)
-        return pwd_context.verify(senha_processada, senha_hash)
+        return _pwd_context().verify(senha_processada, senha_hash)
     except ValueError as e:
         if "password cannot be longer than 72 bytes" in str(e):
             # Fallback: truncar a senha (não recomendado, mas funciona)
             senha_truncada = senha_plana.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-            return pwd_context.verify(senha_truncada, senha_hash)
+            return _pwd_context().verify(senha_truncada, senha_hash)
         raise e
     except Exception as e:
         print(f"Erro na verificação de senha: {e}")
@@ -53,12 +75,12 @@ def gerar_hash_senha(senha: str) -> str:
     try:
         # Pre-hash da senha se necessário
         senha_processada = _pre_hash_password(senha)
-        return pwd_context.hash(senha_processada)
+        return _pwd_context().hash(senha_processada)
     except ValueError as e:
         if "password cannot be longer than 72 bytes" in str(e):
             # Fallback: truncar a senha
             senha_truncada = senha.encode('utf-8')[:72].decode('utf-8', errors='ignore')
-            return pwd_context.hash(senha_truncada)
+            return _pwd_context().hash(senha_truncada)
         raise e
     except Exception as e:
         print(f"Erro ao gerar hash da senha: {e}")
@@ -72,32 +94,46 @@ def criar_token_acesso(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return _jwt().encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Valida token e retorna usuário autenticado"""
+async def _usuario_por_email(db: AsyncSession, email: str) -> Optional[UsuarioOut]:
+    usuario = await db.scalar(select(Usuario).where(Usuario.email == email))
+    return UsuarioOut(id=usuario.id, nome=usuario.nome, email=usuario.email) if usuario else None
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Valida token e retorna usuário autenticado (id, nome, email)"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Token inválido",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    chave = (token, geracoes(["usuarios"]))
+    em_cache = CACHE_TOKENS.get(chave)
+    if em_cache is not None:
+        expira_em, user = em_cache
+        if expira_em > time.time():
+            return user
+        raise credentials_exception
+
+    from jose import JWTError
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = _jwt().decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = db.query(Usuario).filter(Usuario.email == email).first()
+    user = await _usuario_por_email(db, email)
     if user is None:
         raise credentials_exception
+    CACHE_TOKENS.set(chave, (payload.get("exp", float("inf")), user))
     return user
 
-async def get_dummy_user(db: Session = Depends(get_db)):
+async def get_dummy_user(db: AsyncSession = Depends(get_async_db)):
     """Retorna usuário fictício quando auth está desabilitado"""
     # Tenta buscar um usuário admin existente
-    admin_user = db.query(Usuario).filter(Usuario.email == "admin@xmap.com").first()
+    admin_user = await _usuario_por_email(db, "admin@xmap.com")
     if admin_user:
         return admin_user
     
@@ -0,0 +1,136 @@
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import Float, case, cast, func, insert, literal
+from sqlalchemy.orm import Session
+
+from .database import CONFIG_TEXTO, Mapa, MapaTexto, Metadados
+
+BPMN_NS = "{http://www.omg.org/spec/BPMN/20100524/MODEL}"
+
+# XML de um mapa criado sem diagrama
+XML_VAZIO = '<bpmn:definitions id="Definitions_1"><bpmn:process id="Process_1"></bpmn:process></bpmn:definitions>'
+
+
+def _nome_local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _normalizar(texto: Optional[str]) -> str:
+    return " ".join((texto or "").split())
+
+
+def _ler_xml(xml: Optional[str]) -> Optional[ET.Element]:
+    if not xml:
+        return None
+    try:
+        return ET.fromstring(xml)
+    except ET.ParseError as e:
+        print(f"Erro ao ler XML BPMN: {e}")
+        return None
+
+
+def extrair_textos(xml: Optional[str]) -> List[Dict[str, str]]:
+    """
+    Extrai os textos de um XML BPMN: atributo `name` dos elementos (tarefas,
+    raias, eventos...), `bpmn:documentation` e o texto de `bpmn:textAnnotation`.
+    Cada texto fica ligado ao id do elemento a que pertence.
+    """
+    raiz = _ler_xml(xml)
+    if raiz is None:
+        return []
+
+    textos = []
+    for elemento in raiz.iter():
+        id_elemento = elemento.get("id")
+        if not elemento.tag.startswith(BPMN_NS) or not id_elemento:
+            continue
+        tipo = _nome_local(elemento.tag)
+
+        nome = _normalizar(elemento.get("name"))
+        if nome:
+            textos.append({"id_elemento": id_elemento, "tipo_elemento": tipo, "campo": "nome", "texto": nome})
+
+        for filho in elemento:
+            local = _nome_local(filho.tag)
+            conteudo = _normalizar(filho.text)
+            if not filho.tag.startswith(BPMN_NS) or not conteudo:
+                continue
+            if local == "documentation":
+                textos.append({"id_elemento": id_elemento, "tipo_elemento": tipo, "campo": "documentacao", "texto": conteudo})
+            elif local == "text":
+                textos.append({"id_elemento": id_elemento, "tipo_elemento": tipo, "campo": "texto", "texto": conteudo})
+    return textos
+
+
+def indexar_textos_mapa(db: Session, mapa: Mapa) -> None:
+    """
+    Regrava os textos indexados de um mapa a partir do XML atual.
+    Deve ser chamado antes do commit, na mesma transação que salva o XML.
+    """
+    if mapa.id is None:
+        db.flush()
+    db.query(MapaTexto).filter(MapaTexto.id_mapa == mapa.id).delete(synchronize_session=False)
+    linhas = [dict(t, id_mapa=mapa.id) for t in extrair_textos(mapa.XML)]
+    if linhas:
+        db.execute(insert(MapaTexto), linhas)
+
+
+def extrair_ids_elementos(xml: Optional[str]) -> Optional[Set[str]]:
+    """
+    Ids de todos os elementos BPMN do XML. Retorna None se o XML não puder
+    ser lido ou não for um documento BPMN (raiz `bpmn:definitions`), para que
+    nada seja considerado órfão por engano.
+    """
+    raiz = _ler_xml(xml)
+    if raiz is None or raiz.tag != f"{BPMN_NS}definitions":
+        return None
+    return {e.get("id") for e in raiz.iter() if e.tag.startswith(BPMN_NS) and e.get("id")}
+
+
+def remover_metadados_orfaos(db: Session, mapa_id: int, xml: Optional[str]) -> int:
+    """
+    Remove os metadados do mapa cujas atividades não existem mais no XML.
+    Deve ser chamado na mesma transação que salva o XML; retorna quantos saíram.
+    """
+    ids = extrair_ids_elementos(xml)
+    if ids is None:
+        return 0
+    return db.query(Metadados).filter(
+        Metadados.id_processo == mapa_id,
+        Metadados.id_atividade.notin_(ids),
+    ).delete(synchronize_session=False)
+
+
+def _consulta_texto(termo: str):
+    """tsquery com prefixo para as palavras do termo (None se não houver palavras)"""
+    palavras = re.findall(r"\w+", termo.lower())
+    if not palavras:
+        return None
+    return func.to_tsquery(CONFIG_TEXTO, " & ".join(f"{p}:*" for p in palavras))
+
+
+def filtro_texto(termo: str):
+    """Filtro de texto completo (com prefixo) sobre MapaTexto, coberto pelo índice GIN"""
+    consulta = _consulta_texto(termo)
+    if consulta is None:
+        return MapaTexto.id.is_(None)
+    return func.to_tsvector(CONFIG_TEXTO, MapaTexto.texto).op("@@")(consulta)
+
+
+def relevancia_texto(termos: List[str]):
+    """
+    Relevância dos textos de mapas na mesma escala de `relevancia_sql`: cada termo
+    encontrado vale 2.0 (termo contido em coluna principal) mais o ts_rank
+    normalizado para [0, 1). Casamentos por radical ou prefixo também pontuam.
+    """
+    total = literal(0.0)
+    for termo in termos:
+        consulta = _consulta_texto(termo)
+        if consulta is None:
+            continue
+        vetor = func.to_tsvector(CONFIG_TEXTO, MapaTexto.texto)
+        # Normalização 32: rank / (rank + 1)
+        total = total + case((vetor.op("@@")(consulta), 2.0 + func.ts_rank(vetor, consulta, 32)), else_=0.0)
+    return cast(total, Float)
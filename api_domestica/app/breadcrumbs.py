@@ -0,0 +1,119 @@
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from .database import Processo, Mapa, MacroProcesso, MacroProcessoProcesso
+
+
+def _no(tipo: str, entidade) -> Dict[str, Any]:
+    return {"tipo": tipo, "id": entidade.id, "titulo": entidade.titulo}
+
+
+def _caminhos_iniciais(db: Session, processos: List[Processo]) -> None:
+    """Calcula o caminho de cada processo a partir do caminho já gravado no pai (ou do macroprocesso)"""
+    pais_ids = {p.id_pai for p in processos if p.id_pai is not None}
+    pais = {p.id: p for p in db.query(Processo).filter(Processo.id.in_(pais_ids)).all()} if pais_ids else {}
+
+    raizes_ids = [p.id for p in processos if p.id_pai is None]
+    macros = {}
+    if raizes_ids:
+        linhas = db.query(MacroProcessoProcesso.processo_id, MacroProcesso).join(
+            MacroProcesso, MacroProcesso.id == MacroProcessoProcesso.macro_processo_id
+        ).filter(MacroProcessoProcesso.processo_id.in_(raizes_ids)).all()
+        macros = {processo_id: macro for processo_id, macro in linhas}
+
+    for proc in processos:
+        pai = pais.get(proc.id_pai)
+        if pai is not None:
+            proc.caminho = list(pai.caminho or []) + [_no("processo", pai)]
+        elif proc.id in macros:
+            proc.caminho = [_no("macro", macros[proc.id])]
+        else:
+            proc.caminho = []
+
+
+def _atualizar_mapas(db: Session, processos: List[Processo]) -> None:
+    """Regrava o caminho dos mapas dos processos informados (um UPDATE em lote)"""
+    if not processos:
+        return
+    tabela = Mapa.__table__
+    db.execute(
+        update(tabela).where(tabela.c.id_proc == bindparam("b_id_proc")).values(caminho=bindparam("b_caminho")),
+        [{"b_id_proc": p.id, "b_caminho": list(p.caminho or []) + [_no("processo", p)]} for p in processos],
+    )
+
+
+def atualizar_caminhos(db: Session, processo_ids: Iterable[int]) -> None:
+    """
+    Recalcula o breadcrumb dos processos informados, de toda a subárvore abaixo
+    deles e dos mapas correspondentes. Chamar após renomear/mover, antes do commit.
+    """
+    processo_ids = list(processo_ids)
+    if not processo_ids:
+        return
+    db.flush()
+    nivel = db.query(Processo).filter(Processo.id.in_(processo_ids)).all()
+    _caminhos_iniciais(db, nivel)
+
+    visitados = set()
+    while nivel:
+        visitados.update(p.id for p in nivel)
+        _atualizar_mapas(db, nivel)
+        por_id = {p.id: p for p in nivel}
+        filhos = db.query(Processo).filter(Processo.id_pai.in_(por_id)).all()
+        filhos = [f for f in filhos if f.id not in visitados]
+        for filho in filhos:
+            pai = por_id[filho.id_pai]
+            filho.caminho = list(pai.caminho or []) + [_no("processo", pai)]
+        nivel = filhos
+
+
+def atualizar_caminhos_macro(db: Session, macro_id: int) -> None:
+    """Recalcula os caminhos sob um macroprocesso (ex.: após renomeá-lo)"""
+    db.flush()
+    ids = [a.processo_id for a in db.query(MacroProcessoProcesso.processo_id).filter(
+        MacroProcessoProcesso.macro_processo_id == macro_id
+    ).all()]
+    atualizar_caminhos(db, ids)
+
+
+def atualizar_caminhos_lote(db: Session, processo_ids: Iterable[int]) -> None:
+    """
+    Como atualizar_caminhos, para um conjunto de processos que pode conter pais
+    e filhos ao mesmo tempo (ex.: escrita em lote). Só os processos sem nenhum
+    ancestral no conjunto servem de ponto de partida; o resto vem pela subárvore.
+    """
+    afetados = set(processo_ids)
+    if not afetados:
+        return
+    pai_de = dict(db.query(Processo.id, Processo.id_pai).filter(Processo.id.in_(afetados)).all())
+    pais_fora = {pai for pai in pai_de.values() if pai is not None and pai not in afetados}
+    # O caminho de um pai fora do conjunto já lista os ancestrais dele
+    caminhos = dict(db.query(Processo.id, Processo.caminho).filter(Processo.id.in_(pais_fora)).all()) if pais_fora else {}
+
+    raizes = []
+    for proc_id, pai in pai_de.items():
+        if pai in afetados:
+            continue
+        if any(no.get("tipo") == "processo" and no.get("id") in afetados for no in caminhos.get(pai) or []):
+            continue
+        raizes.append(proc_id)
+    atualizar_caminhos(db, raizes)
+
+
+def caminho_abaixo(proc: Processo) -> List[Dict[str, Any]]:
+    """Caminho de um filho (processo ou mapa) do processo informado"""
+    return list(proc.caminho or []) + [_no("processo", proc)]
+
+
+def atualizar_caminho_mapa(db: Session, mapa: Mapa) -> None:
+    """Define o caminho de um mapa a partir do processo dono (ao criar ou mover)"""
+    proc = db.get(Processo, mapa.id_proc) if mapa.id_proc is not None else None
+    mapa.caminho = caminho_abaixo(proc) if proc else []
+
+
+def reconstruir_caminhos(db: Session) -> None:
+    """Recalcula todos os caminhos a partir dos processos de nível superior"""
+    raizes = [p.id for p in db.query(Processo.id).filter(Processo.id_pai.is_(None)).all()]
+    atualizar_caminhos(db, raizes)
@@ -0,0 +1,113 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+# Contadores de geração por tabela. Cada escrita em uma tabela incrementa
+# sua geração; chaves de cache que embutem a geração deixam de ser
+# encontradas e as entradas antigas saem naturalmente pelo LRU/TTL.
+_geracoes: Dict[str, int] = {}
+_alteradas_em: Dict[str, float] = {}
+_geracoes_lock = threading.Lock()
+
+
+def invalidar_tabelas(*tabelas: str) -> None:
+    """Incrementa a geração das tabelas informadas (chamar após o commit)."""
+    agora = time.monotonic()
+    with _geracoes_lock:
+        for tabela in tabelas:
+            _geracoes[tabela] = _geracoes.get(tabela, 0) + 1
+            _alteradas_em[tabela] = agora
+
+
+def alteradas_ha_menos_de(tabelas: Iterable[str], segundos: float) -> bool:
+    """Se alguma das tabelas foi invalidada (por este processo) nos últimos `segundos`"""
+    limite = time.monotonic() - segundos
+    with _geracoes_lock:
+        return any(_alteradas_em.get(t, float("-inf")) > limite for t in tabelas)
+
+
+def geracoes(tabelas: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+    """Retorna a geração atual de cada tabela, em ordem estável, para compor chaves."""
+    with _geracoes_lock:
+        return tuple((t, _geracoes.get(t, 0)) for t in sorted(set(tabelas)))
+
+
+def _tamanho_aproximado(obj: Any, vistos: Optional[set] = None) -> int:
+    """Estimativa (em bytes) da memória ocupada por um resultado serializável."""
+    if vistos is None:
+        vistos = set()
+    if id(obj) in vistos:
+        return 0
+    vistos.add(id(obj))
+    tamanho = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        tamanho += sum(_tamanho_aproximado(k, vistos) + _tamanho_aproximado(v, vistos) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        tamanho += sum(_tamanho_aproximado(i, vistos) for i in obj)
+    return tamanho
+
+
+class TTLCache:
+    """Cache LRU limitado por número de entradas, com expiração por TTL."""
+
+    def __init__(self, max_entradas: int = 256, ttl_segundos: float = 60.0):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._dados: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._memoria = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+
+    def get(self, chave: Hashable, padrao: Any = None) -> Any:
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is None:
+                self.falhas += 1
+                return padrao
+            expira_em, tamanho, valor = entrada
+            if expira_em < agora:
+                self._remover(chave)
+                self.falhas += 1
+                return padrao
+            self._dados.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def set(self, chave: Hashable, valor: Any) -> None:
+        tamanho = _tamanho_aproximado(valor)
+        with self._lock:
+            if chave in self._dados:
+                self._remover(chave)
+            self._dados[chave] = (time.monotonic() + self.ttl_segundos, tamanho, valor)
+            self._memoria += tamanho
+            while len(self._dados) > self.max_entradas:
+                self._remover(next(iter(self._dados)))
+                self.remocoes += 1
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+            self._memoria = 0
+
+    def _remover(self, chave: Hashable) -> None:
+        _, tamanho, _ = self._dados.pop(chave)
+        self._memoria -= tamanho
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "entradas": len(self._dados),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl_segundos,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "taxa_acerto": round(self.acertos / consultas, 4) if consultas else 0.0,
+                "remocoes_lru": self.remocoes,
+                "memoria_bytes": self._memoria,
+            }
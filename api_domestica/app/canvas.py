@@ -1,18 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile, File
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from .database import get_db, Mapa
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import get_db, get_async_db, get_async_db_leitura, Mapa
+from .cache import invalidar_tabelas
+from .bpmn import indexar_textos_mapa, remover_metadados_orfaos
+from .breadcrumbs import atualizar_caminho_mapa
+from .dashboard import ajustar_resumo_status, registrar_evento_mapa
+from .relatorios import marcar_mapas_pendentes
 import shutil
 import os
 import uuid
 router = APIRouter(prefix="/canvas")
 
 @router.get("/view/{mapa_id}")
-async def view_map_canvas(mapa_id: int, db: Session = Depends(get_db)):
+async def view_map_canvas(mapa_id: int, db: AsyncSession = Depends(get_async_db_leitura)):
     """
     Retorna o XML do mapa para visualização no canvas
     """
-    # Buscar o mapa pelo ID diretamente
-    mapa = db.query(Mapa).filter(Mapa.id == mapa_id).first()
+    # Buscar apenas o XML do mapa
+    mapa = (await db.execute(select(Mapa.XML).where(Mapa.id == mapa_id))).first()
     
     if not mapa:
         # Se não existir, retornar XML básico
@@ -50,12 +57,12 @@ async def view_map_canvas(mapa_id: int, db: Session = Depends(get_db)):
     )
 
 @router.get("/edit/{mapa_id}")
-async def edit_map_canvas(mapa_id: int, db: Session = Depends(get_db)):
+async def edit_map_canvas(mapa_id: int, db: AsyncSession = Depends(get_async_db)):
     """
     Retorna o XML do mapa para edição no canvas
     """
-    # Buscar o mapa pelo ID diretamente
-    mapa = db.query(Mapa).filter(Mapa.id == mapa_id).first()
+    # Buscar apenas o XML do mapa
+    mapa = (await db.execute(select(Mapa.XML).where(Mapa.id == mapa_id))).first()
     
     if not mapa:
         # Se não existir, retornar XML básico
@@ -93,7 +100,7 @@ async def edit_map_canvas(mapa_id: int, db: Session = Depends(get_db)):
     )
 
 @router.put("/save/{mapa_id}")
-async def save_map_canvas(
+def save_map_canvas(
     mapa_id: int, 
     xml_content: str,
     db: Session = Depends(get_db)
@@ -115,26 +122,34 @@ async def save_map_canvas(
             db.refresh(processo)
         
         # Criar novo mapa
-        mapa = Mapa(id_proc=processo.id, XML=xml_content)
+        mapa = Mapa(id_proc=processo.id, XML=xml_content, status="Em andamento")
         db.add(mapa)
+        ajustar_resumo_status(db, mapa.status, 1)
+        atualizar_caminho_mapa(db, mapa)
+        indexar_textos_mapa(db, mapa)
+        registrar_evento_mapa(db, mapa, "criado", status_novo=mapa.status)
         db.commit()
+        invalidar_tabelas("processos", "mapas")
         db.refresh(mapa)
         
         return {"message": "Mapa criado com sucesso!", "mapa_id": mapa.id}
     
     # Atualizar o XML
     mapa.XML = xml_content
+    indexar_textos_mapa(db, mapa)
+    orfaos = remover_metadados_orfaos(db, mapa.id, xml_content)
+    if orfaos:
+        marcar_mapas_pendentes(db, Mapa.id == mapa.id)
+    registrar_evento_mapa(db, mapa, "modificado")
     db.commit()
+    invalidar_tabelas("mapas", *(["metadados"] if orfaos else []))
     db.refresh(mapa)
     
     return {"message": "Mapa salvo com sucesso!", "mapa_id": mapa.id}
 
-# Diretório para salvar os uploads
+# Diretório para salvar os uploads (criado no startup da API, não no import)
 UPLOAD_DIR = "uploads"
 
-# Garante que o diretório de uploads exista
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 
 @router.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
@@ -1,48 +1,291 @@
-from fastapi import APIRouter, Depends, Query
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Date, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from typing import Any, Dict, List, Optional
 
-from .database import get_db, Processo, Mapa
+from .cache import TTLCache, geracoes
+from .database import (
+    get_async_db_leitura, pode_guardar_em_cache, Processo, Mapa, Metadados, MacroProcesso, MacroProcessoProcesso,
+    ResumoStatusMapa, EventoMapa, AtividadeDiaria,
+)
 
 router = APIRouter()
 
+SEM_STATUS = "Sem status"
+
+# Rollups hierárquicos: recalculados só quando alguma das tabelas abaixo muda
+TABELAS_ROLLUP = ("processos", "mapas", "metadados", "macro_processos", "macro_processo_processo")
+CACHE_ROLLUPS = TTLCache(max_entradas=4, ttl_segundos=300)
+
+
+def ajustar_resumo_status(db: Session, status: Optional[str], delta: int):
+    """
+    Soma `delta` à contagem de mapas do status informado. Chamar antes do commit,
+    na mesma transação da escrita no mapa, para o resumo nunca divergir.
+    """
+    if not delta:
+        return
+    stmt = insert(ResumoStatusMapa).values(status=status or SEM_STATUS, total=delta)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ResumoStatusMapa.status],
+        set_={"total": ResumoStatusMapa.total + delta},
+    )
+    db.execute(stmt)
+
+
+def descontar_mapas_do_resumo(db: Session, *filtros, sinal: int = -1):
+    """Desconta do resumo os mapas que serão removidos (filtros sobre Mapa); sinal=1 os devolve"""
+    contagens = db.query(Mapa.status, func.count(Mapa.id)).filter(*filtros).group_by(Mapa.status).all()
+    for status, total in contagens:
+        ajustar_resumo_status(db, status, sinal * total)
+
+
+def reconstruir_resumo_status(db: Session):
+    """Recalcula o resumo a partir da tabela de mapas (carga inicial ou correção)"""
+    db.query(ResumoStatusMapa).delete()
+    contagens: Dict[str, int] = {}
+    for status, total in db.query(Mapa.status, func.count(Mapa.id)).group_by(Mapa.status).all():
+        chave = status or SEM_STATUS
+        contagens[chave] = contagens.get(chave, 0) + total
+    for status, total in contagens.items():
+        db.add(ResumoStatusMapa(status=status, total=total))
+
+
+def registrar_evento_mapa(db: Session, mapa: Mapa, tipo: str, status_anterior: Optional[str] = None, status_novo: Optional[str] = None):
+    """
+    Acrescenta um evento ao log de mapas e incrementa o rollup diário correspondente.
+    Chamar antes do commit, na mesma transação da escrita no mapa.
+    """
+    if mapa.id is None:
+        db.flush()
+    registrar_eventos_mapas(db, [{
+        "id_mapa": mapa.id, "id_proc": mapa.id_proc, "tipo": tipo,
+        "status_anterior": status_anterior, "status_novo": status_novo,
+    }])
+
+
+def registrar_eventos_mapas(db: Session, eventos: List[Dict[str, Any]]):
+    """
+    Versão em lote de registrar_evento_mapa: cada evento tem id_mapa, id_proc, tipo
+    e, opcionalmente, status_anterior/status_novo. Um INSERT para o log e um upsert
+    para o rollup, qualquer que seja o número de eventos.
+    """
+    if not eventos:
+        return
+    ids_proc = {e["id_proc"] for e in eventos if e.get("id_proc") is not None}
+    processos = {
+        p.id: p for p in db.query(Processo.id, Processo.id_area, Processo.caminho).filter(Processo.id.in_(ids_proc))
+    } if ids_proc else {}
+
+    agora = datetime.utcnow()
+    log = []
+    totais: Dict[tuple, int] = {}
+    for evento in eventos:
+        processo = processos.get(evento.get("id_proc"))
+        id_area = processo.id_area if processo else None
+        caminho = (processo.caminho or []) if processo else []
+        id_macro = caminho[0]["id"] if caminho and caminho[0].get("tipo") == "macro" else None
+        log.append({
+            "id_mapa": evento["id_mapa"],
+            "tipo": evento["tipo"],
+            "status_anterior": evento.get("status_anterior"),
+            "status_novo": evento.get("status_novo"),
+            "id_area": id_area,
+            "id_macro": id_macro,
+            "data": agora,
+        })
+        chave = (evento["tipo"], id_area or 0, id_macro or 0)
+        totais[chave] = totais.get(chave, 0) + 1
+
+    db.execute(insert(EventoMapa), log)
+    stmt = insert(AtividadeDiaria).values([
+        {"dia": agora.date(), "tipo": tipo, "id_area": id_area, "id_macro": id_macro, "total": total}
+        for (tipo, id_area, id_macro), total in totais.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AtividadeDiaria.dia, AtividadeDiaria.tipo, AtividadeDiaria.id_area, AtividadeDiaria.id_macro],
+        set_={"total": AtividadeDiaria.total + stmt.excluded.total},
+    )
+    db.execute(stmt)
+
+
+@router.get("/atividade")
+async def get_atividade(
+    granularidade: str = Query("dia", description="'dia' ou 'semana'"),
+    inicio: Optional[date] = Query(None, description="Data inicial (padrão: 12 meses atrás)"),
+    fim: Optional[date] = Query(None, description="Data final (padrão: hoje)"),
+    id_area: Optional[int] = Query(None),
+    id_macro: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_db_leitura),
+):
+    """
+    Série temporal de atividade dos mapas (criados, modificados e trocas de status)
+    por dia ou semana, lida do rollup diário em vez da tabela de mapas.
+    """
+    if granularidade not in ("dia", "semana"):
+        raise HTTPException(status_code=400, detail="Granularidade inválida. Use 'dia' ou 'semana'.")
+    fim = fim or datetime.utcnow().date()
+    inicio = inicio or fim - timedelta(days=365)
+
+    if granularidade == "semana":
+        periodo = cast(func.date_trunc(literal_column("'week'"), AtividadeDiaria.dia), Date)
+    else:
+        periodo = AtividadeDiaria.dia
+
+    query = select(periodo.label("periodo"), AtividadeDiaria.tipo, func.sum(AtividadeDiaria.total))\
+              .where(AtividadeDiaria.dia >= inicio, AtividadeDiaria.dia <= fim)
+    if id_area is not None:
+        query = query.where(AtividadeDiaria.id_area == id_area)
+    if id_macro is not None:
+        query = query.where(AtividadeDiaria.id_macro == id_macro)
+    linhas = (await db.execute(query.group_by(periodo, AtividadeDiaria.tipo).order_by(periodo))).all()
+
+    series: Dict[date, Dict[str, int]] = {}
+    for dia, tipo, total in linhas:
+        series.setdefault(dia, {"criado": 0, "modificado": 0, "status": 0})[tipo] = int(total)
+
+    return {
+        "granularidade": granularidade,
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+        "serie": [{"periodo": dia.isoformat(), **totais} for dia, totais in series.items()]
+    }
+
+
+def _totais_vazios() -> Dict[str, Any]:
+    return {"processos": 0, "mapas": 0, "status": {}, "metadados": 0, "lgpd": {}}
+
+
+def _somar(destino: Dict[str, Any], origem: Dict[str, Any]):
+    for campo in ("processos", "mapas", "metadados"):
+        destino[campo] += origem[campo]
+    for campo in ("status", "lgpd"):
+        for chave, total in origem[campo].items():
+            destino[campo][chave] = destino[campo].get(chave, 0) + total
+
+
+def calcular_rollups(db: Session) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Totais por nó (processos, mapas, status, metadados e classificação LGPD) para
+    cada subárvore de processo, macroprocesso e área, com um número fixo de
+    consultas agregadas e uma única passada sobre a árvore.
+    """
+    processos = db.query(Processo.id, Processo.id_pai, Processo.id_area, Processo.titulo).all()
+    proprios = {p.id: _totais_vazios() for p in processos}
+    for p in processos:
+        proprios[p.id]["processos"] = 1
+
+    for id_proc, status, total in db.query(Mapa.id_proc, Mapa.status, func.count(Mapa.id))\
+                                    .group_by(Mapa.id_proc, Mapa.status).all():
+        if id_proc in proprios:
+            proprios[id_proc]["mapas"] += total
+            chave = status or SEM_STATUS
+            proprios[id_proc]["status"][chave] = proprios[id_proc]["status"].get(chave, 0) + total
+
+    # Metadados.id_processo guarda o id do mapa
+    for id_proc, lgpd, total in db.query(Mapa.id_proc, Metadados.lgpd, func.count(Metadados.id))\
+                                  .join(Mapa, Mapa.id == Metadados.id_processo)\
+                                  .group_by(Mapa.id_proc, Metadados.lgpd).all():
+        if id_proc in proprios:
+            proprios[id_proc]["metadados"] += total
+            chave = lgpd or "N/A"
+            proprios[id_proc]["lgpd"][chave] = proprios[id_proc]["lgpd"].get(chave, 0) + total
+
+    # Subárvores: pós-ordem iterativa (filhos antes dos pais)
+    filhos: Dict[Optional[int], List[int]] = {}
+    for p in processos:
+        filhos.setdefault(p.id_pai if p.id_pai in proprios else None, []).append(p.id)
+    subarvores: Dict[int, Dict[str, Any]] = {}
+    pilha = [(raiz, False) for raiz in filhos.get(None, [])]
+    while pilha:
+        proc_id, expandido = pilha.pop()
+        if expandido:
+            totais = _totais_vazios()
+            _somar(totais, proprios[proc_id])
+            for filho in filhos.get(proc_id, []):
+                _somar(totais, subarvores[filho])
+            subarvores[proc_id] = totais
+        elif proc_id not in subarvores:
+            pilha.append((proc_id, True))
+            pilha.extend((filho, False) for filho in filhos.get(proc_id, []))
+
+    macros = []
+    assocs: Dict[int, List[int]] = {}
+    for macro_id, processo_id in db.query(MacroProcessoProcesso.macro_processo_id, MacroProcessoProcesso.processo_id).all():
+        assocs.setdefault(macro_id, []).append(processo_id)
+    for macro in db.query(MacroProcesso.id, MacroProcesso.titulo).all():
+        totais = _totais_vazios()
+        for processo_id in assocs.get(macro.id, []):
+            if processo_id in subarvores:
+                _somar(totais, subarvores[processo_id])
+        macros.append({"id": macro.id, "titulo": macro.titulo, "totais": totais})
+
+    # Áreas somam os totais próprios de cada processo (sem dupla contagem de subárvores)
+    areas: Dict[Optional[int], Dict[str, Any]] = {}
+    for p in processos:
+        _somar(areas.setdefault(p.id_area, _totais_vazios()), proprios[p.id])
+
+    return {
+        "macroprocessos": macros,
+        "processos": [
+            {"id": p.id, "id_pai": p.id_pai, "titulo": p.titulo, "totais": subarvores.get(p.id, proprios[p.id])}
+            for p in processos
+        ],
+        "areas": [{"id_area": id_area, "totais": totais} for id_area, totais in areas.items()],
+    }
+
+
+@router.get("/rollups")
+async def get_rollups(db: AsyncSession = Depends(get_async_db_leitura)):
+    """
+    Totais hierárquicos por macroprocesso, subárvore de processo e área.
+    O resultado fica em cache até a próxima escrita nas tabelas envolvidas.
+    """
+    chave = geracoes(TABELAS_ROLLUP)
+    rollups = CACHE_ROLLUPS.get(chave)
+    if rollups is None:
+        rollups = await db.run_sync(calcular_rollups)
+        if pode_guardar_em_cache(db, TABELAS_ROLLUP):
+            CACHE_ROLLUPS.set(chave, rollups)
+    return rollups
+
+
 @router.get("/")
 async def get_dashboard_data(
     status_filter: Optional[str] = Query(None, alias="status"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db_leitura),
 ):
     """
     Fornece dados agregados para o dashboard (endpoint público).
     Pode ser filtrado por status (ex: /dashboard?status=Concluído).
     """
-    # Query base que une Processo e Mapa
-    query = db.query(Processo, Mapa).join(Mapa, Processo.id == Mapa.id_proc)
-
-    # Aplica o filtro de status no campo da tabela Mapa
-    if status_filter and status_filter != "todos":
-        query = query.filter(Mapa.status == status_filter)
-
-    # 1. Contagem total de processos (respeitando o filtro)
-    total_processos = query.count()
+    # 1. Contagens por status lidas do resumo (uma linha por status)
+    resumo = await db.execute(select(ResumoStatusMapa.status, ResumoStatusMapa.total))
+    status_counts = {r.status: r.total for r in resumo if r.total}
 
-    # 2. Contagem de processos por status (sempre global, buscando de Mapa)
-    status_counts_query = db.query(Mapa.status, func.count(Processo.id))\
-                            .join(Processo, Mapa.id_proc == Processo.id)\
-                            .group_by(Mapa.status).all()
-    status_counts = {status or "Sem status": count for status, count in status_counts_query}
+    # 2. Total de mapas (respeitando o filtro)
+    filtrar = bool(status_filter and status_filter != "todos")
+    total_processos = status_counts.get(status_filter, 0) if filtrar else sum(status_counts.values())
 
-    # 3. Processos modificados recentemente (usando data_modificacao do Mapa)
-    processos_recentes_tuplas = query.order_by(Mapa.data_modificacao.desc()).limit(10).all()
+    # 3. Processos modificados recentemente (índice em Mapa.data_modificacao)
+    query = select(Processo.id, Processo.titulo, Processo.caminho, Mapa.status, Mapa.data_modificacao)\
+              .join(Mapa, Processo.id == Mapa.id_proc)
+    if filtrar:
+        query = query.where(Mapa.status == status_filter)
+    processos_recentes_tuplas = (await db.execute(query.order_by(Mapa.data_modificacao.desc()).limit(10))).all()
 
     # Monta a lista de processos recentes a partir das tuplas
     processos_recentes = []
-    for processo, mapa in processos_recentes_tuplas:
+    for linha in processos_recentes_tuplas:
         processos_recentes.append({
-            "id": processo.id,
-            "titulo": processo.titulo,
-            "status": mapa.status or "Sem status",
-            "dataModificacao": mapa.data_modificacao.isoformat() if mapa.data_modificacao else None
+            "id": linha.id,
+            "titulo": linha.titulo,
+            "status": linha.status or SEM_STATUS,
+            "dataModificacao": linha.data_modificacao.isoformat() if linha.data_modificacao else None,
+            "caminho": linha.caminho or []
         })
 
     return {
@@ -51,4 +294,4 @@ async def get_dashboard_data(
             "statusCounts": status_counts,
         },
         "processosRecentes": processos_recentes
-    }
\ No newline at end of file
+    }
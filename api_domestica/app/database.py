@@ -1,31 +1,120 @@
 # Updated database.py with new classes
 
 import os
+import time
 import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Date, JSON, Boolean, DateTime, ForeignKey
+import itertools
+from sqlalchemy import create_engine, event, select, Column, Integer, String, Text, Date, JSON, Boolean, DateTime, DDL, ForeignKey, Index, UniqueConstraint, cast, func, literal_column
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker, with_loader_criteria
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from fastapi import Request
 
-DB_HOST = "db"
-DB_PORT = "5432"
-DB_NAME = "sucu_db"
-DB_USER = "sucupira"
-DB_PASSWORD = "12345"
+from .cache import alteradas_ha_menos_de
+from .metricas import PoolAsyncMedido, PoolMedido, registrar_engine
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+DB_HOST = os.getenv("DB_HOST", "db")
+DB_PORT = os.getenv("DB_PORT", "5432")
+DB_NAME = os.getenv("DB_NAME", "sucu_db")
+DB_USER = os.getenv("DB_USER", "sucupira")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "12345")
 
-engine = create_engine(DATABASE_URL)
+DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Pool de conexões (por processo do uvicorn: o total no Postgres é
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) para cada engine)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("true", "1", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 = sem limite
+
+OPCOES_POOL = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+def _criar_engine(url: str, nome: str):
+    engine = create_engine(
+        url,
+        poolclass=PoolMedido,
+        connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"},
+        **OPCOES_POOL,
+    )
+    registrar_engine(nome, engine, DB_MAX_OVERFLOW)
+    return engine
+
+def _criar_engine_async(url: str, nome: str):
+    engine = create_async_engine(
+        url.replace("postgresql://", "postgresql+asyncpg://", 1),
+        poolclass=PoolAsyncMedido,
+        connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}},
+        **OPCOES_POOL,
+    )
+    registrar_engine(nome, engine.sync_engine, DB_MAX_OVERFLOW)
+    return engine
+
+engine = _criar_engine(DATABASE_URL, "sincrono")
 
 Base = declarative_base()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def create_all_tables(): 
-    Base.metadata.create_all(bind=engine)
+# Engine assíncrono (asyncpg) para os endpoints de leitura declarados com `async def`,
+# que não podem bloquear o event loop. As escritas continuam na sessão síncrona,
+# executadas no threadpool do FastAPI (endpoints declarados com `def`).
+async_engine = _criar_engine_async(DATABASE_URL, "assincrono")
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Réplicas de leitura (opcionais). Endpoints só de leitura usam get_db_leitura /
+# get_async_db_leitura, que escolhem uma réplica em rodízio. Depois de uma escrita,
+# o cliente recebe o cookie COOKIE_ULTIMA_ESCRITA e, durante JANELA_LEITURA_PROPRIA
+# segundos, suas leituras continuam no primário (lê o que acabou de gravar).
+DB_REPLICA_URLS = [url.strip() for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url.strip()]
+JANELA_LEITURA_PROPRIA = float(os.getenv("DB_JANELA_LEITURA_PROPRIA", "5"))
+COOKIE_ULTIMA_ESCRITA = "xmap_ultima_escrita"
 
-def drop_and_create_all_tables():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+replicas = [_criar_engine(url, f"replica_{i}") for i, url in enumerate(DB_REPLICA_URLS, 1)]
+replicas_async = [_criar_engine_async(url, f"replica_{i}_assincrono") for i, url in enumerate(DB_REPLICA_URLS, 1)]
+_rodizio = itertools.count()
+
+class ExclusaoLogica:
+    """
+    Tabelas com exclusão lógica: linhas com `excluido_em` preenchido somem de
+    todas as consultas ORM (ver _ocultar_excluidos) e são removidas de fato
+    pela purga da lixeira (lixeira.py), depois da janela de restauração.
+    """
+    excluido_em = Column(DateTime, nullable=True)
+
+@event.listens_for(Session, "do_orm_execute")
+def _ocultar_excluidos(execute_state):
+    # Vale para Session e AsyncSession. A lixeira liga session.info["incluir_excluidos"]
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.session.info.get("incluir_excluidos")
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(ExclusaoLogica, lambda cls: cls.excluido_em.is_(None), include_aliases=True),
+            # Metadados e textos indexados seguem o mapa (ver em_mapa_ativo)
+            with_loader_criteria(Metadados, lambda cls: em_mapa_ativo(cls.id_processo), include_aliases=True),
+            with_loader_criteria(MapaTexto, lambda cls: em_mapa_ativo(cls.id_mapa), include_aliases=True),
+            # Associações de um processo na lixeira somem com ele e voltam na restauração
+            with_loader_criteria(MacroProcessoProcesso, lambda cls: em_processo_ativo(cls.processo_id), include_aliases=True),
+        )
+
+class SchemaVersao(Base):
+    """Migrações aplicadas (ver migracoes.py)"""
+    __tablename__ = "schema_versao"
+
+    versao = Column(Integer, primary_key=True)
+    descricao = Column(String(200), nullable=False)
+    aplicada_em = Column(DateTime, default=datetime.datetime.utcnow)
 
 class Usuario(Base):
     __tablename__ = "usuarios"
@@ -43,6 +132,8 @@ class Item(Base):
 
 class Metadados(Base):
     __tablename__ = "metadados"
+    # Uma linha por (mapa, atividade, nome): base do upsert em lote (e índice de id_processo)
+    __table_args__ = (UniqueConstraint("id_processo", "id_atividade", "nome", name="uq_metadados_atividade"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     id_processo = Column(Integer)
     id_atividade = Column(String(100), index=True) ##mudanca de Integer para String
@@ -50,28 +141,123 @@ class Metadados(Base):
     lgpd= Column(String(100), index=True)
     dados = Column(JSON)  # aqui vai guardar o json
 
-class Processo(Base):
+# Busca por substring (ilike '%termo%') em /metadados/buscar/ usa índices de trigramas.
+# As consultas devem usar exatamente DADOS_TEXTO para que o índice de `dados` seja aproveitado.
+DADOS_TEXTO = cast(Metadados.dados, Text).label("dados_texto")
+CRIAR_EXTENSAO_TRGM = DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+event.listen(Base.metadata, "before_create", CRIAR_EXTENSAO_TRGM)
+
+Index("ix_metadados_nome_trgm", Metadados.nome, postgresql_using="gin", postgresql_ops={"nome": "gin_trgm_ops"})
+Index("ix_metadados_lgpd_trgm", Metadados.lgpd, postgresql_using="gin", postgresql_ops={"lgpd": "gin_trgm_ops"})
+Index("ix_metadados_dados_trgm", DADOS_TEXTO, postgresql_using="gin", postgresql_ops={"dados_texto": "gin_trgm_ops"})
+
+class Processo(ExclusaoLogica, Base):
     __tablename__ = "processos" 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    id_pai = Column(Integer, ForeignKey('processos.id'), nullable=True)
+    id_pai = Column(Integer, ForeignKey('processos.id'), nullable=True, index=True)
     id_area = Column(Integer, nullable=True)
     ordem = Column(Integer, nullable=True)
     titulo = Column(String(200), nullable=False)
     data_publicacao = Column(Date, default=datetime.date(day=7, month=10, year=2005))
     data_criacao = Column(DateTime, default=datetime.datetime.utcnow)
+    # Breadcrumb pré-calculado: [{"tipo", "id", "titulo"}, ...] do macroprocesso até o pai
+    caminho = Column(JSON, nullable=True)
 
-class Mapa(Base):
+class Mapa(ExclusaoLogica, Base):
     __tablename__ = 'mapas'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    id_proc = Column(Integer)
+    id_proc = Column(Integer, index=True)
     titulo = Column(String(200), nullable=False)
     status = Column(String(50), default="Em andamento")  # Mudado para String com valores: "Concluído", "Em andamento", "Pendente"
     XML = Column(String)
     data_criacao = Column(DateTime, default=datetime.datetime.utcnow)
-    data_modificacao = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    data_modificacao = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow, index=True)
+    # Breadcrumb pré-calculado: do macroprocesso até o processo dono do mapa
+    caminho = Column(JSON, nullable=True)
+
+# Índices parciais: as leituras filtram `excluido_em IS NULL` e a purga busca o contrário
+Index("ix_processos_pai_ativos", Processo.id_pai, postgresql_where=Processo.excluido_em.is_(None))
+Index("ix_mapas_proc_ativos", Mapa.id_proc, postgresql_where=Mapa.excluido_em.is_(None))
+Index("ix_processos_excluidos", Processo.excluido_em, postgresql_where=Processo.excluido_em.isnot(None))
+Index("ix_mapas_excluidos", Mapa.excluido_em, postgresql_where=Mapa.excluido_em.isnot(None))
+
+def em_mapa_ativo(coluna_id_mapa):
+    """
+    Filtro das tabelas ligadas a mapas (metadados, textos indexados): a exclusão
+    lógica fica só no mapa, e as linhas dele somem junto (aplicado em _ocultar_excluidos).
+    """
+    return coluna_id_mapa.in_(select(Mapa.id).where(Mapa.excluido_em.is_(None)))
+
+def em_processo_ativo(coluna_id_processo):
+    """Mesmo filtro para as associações macroprocesso-processo, que seguem o processo"""
+    return coluna_id_processo.in_(select(Processo.id).where(Processo.excluido_em.is_(None)))
+
+
+class ResumoStatusMapa(Base):
+    """Contagem de mapas por status, mantida na mesma transação das escritas em mapas"""
+    __tablename__ = 'resumo_status_mapas'
+
+    status = Column(String(50), primary_key=True)  # "Sem status" para mapas sem status
+    total = Column(Integer, nullable=False, default=0)
+
+class EventoMapa(Base):
+    """Log append-only de alterações em mapas (criação, modificação e troca de status)"""
+    __tablename__ = 'eventos_mapas'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    id_mapa = Column(Integer, index=True)
+    tipo = Column(String(20), nullable=False)  # "criado", "modificado" ou "status"
+    status_anterior = Column(String(50), nullable=True)
+    status_novo = Column(String(50), nullable=True)
+    id_area = Column(Integer, nullable=True)
+    id_macro = Column(Integer, nullable=True)
+    data = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
+class AtividadeDiaria(Base):
+    """Rollup diário de EventoMapa por tipo, área e macroprocesso (0 = sem área/macro)"""
+    __tablename__ = 'atividade_diaria'
+
+    dia = Column(Date, primary_key=True)
+    tipo = Column(String(20), primary_key=True)
+    id_area = Column(Integer, primary_key=True, default=0)
+    id_macro = Column(Integer, primary_key=True, default=0)
+    total = Column(Integer, nullable=False, default=0)
+
+class RelatorioLgpdMapa(Base):
+    """Agregado LGPD por mapa, recalculado em segundo plano a partir dos metadados"""
+    __tablename__ = 'relatorio_lgpd_mapas'
+
+    id_mapa = Column(Integer, primary_key=True)
+    id_proc = Column(Integer, index=True)
+    total_atividades = Column(Integer, default=0)
+    classificacoes = Column(JSON)  # {"Pessoal": 3, ...}
+    campos = Column(JSON)  # {"CPF": 2, "Nome": 5, ...}
+    atualizado_em = Column(DateTime, default=datetime.datetime.utcnow)
+
+class LgpdMapaPendente(Base):
+    """Mapas cujos metadados mudaram desde a última execução do relatório LGPD"""
+    __tablename__ = 'lgpd_mapas_pendentes'
+
+    id_mapa = Column(Integer, primary_key=True)
+    marcado_em = Column(DateTime, default=datetime.datetime.utcnow)
+
+# Configuração de busca textual usada no índice e nas consultas de MapaTexto
+CONFIG_TEXTO = literal_column("'portuguese'::regconfig")
+
+class MapaTexto(Base):
+    """Textos extraídos do XML BPMN de um mapa ao salvar (nomes, documentação, anotações)"""
+    __tablename__ = 'mapas_textos'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    id_mapa = Column(Integer, index=True)
+    id_elemento = Column(String(100))
+    tipo_elemento = Column(String(100))  # ex.: task, lane, textAnnotation
+    campo = Column(String(20))  # "nome", "documentacao" ou "texto"
+    texto = Column(String)
+
+Index("ix_mapas_textos_texto_fts", func.to_tsvector(CONFIG_TEXTO, MapaTexto.texto), postgresql_using="gin")
 
-    
 class Area(Base):
     __tablename__ = 'areas'
 
@@ -84,12 +270,12 @@ class Documento(Base):
     __tablename__ = 'documentos'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    id_proc = Column(Integer)
+    id_proc = Column(Integer, index=True)
     nome_documento = Column(String)
     link = Column(String)
 
 # New classes for restructuring
-class MacroProcesso(Base):
+class MacroProcesso(ExclusaoLogica, Base):
     __tablename__ = "macro_processos"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -97,17 +283,71 @@ class MacroProcesso(Base):
     data_publicacao = Column(Date, default=datetime.date(day=7, month=10, year=2005))
     data_criacao = Column(DateTime, default=datetime.datetime.utcnow)
 
+Index("ix_macro_processos_excluidos", MacroProcesso.excluido_em, postgresql_where=MacroProcesso.excluido_em.isnot(None))
+
 class MacroProcessoProcesso(Base):
     __tablename__ = "macro_processo_processo"
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    macro_processo_id = Column(Integer, ForeignKey("macro_processos.id"), nullable=False)
-    processo_id = Column(Integer, ForeignKey("processos.id"), nullable=False)
+    macro_processo_id = Column(Integer, ForeignKey("macro_processos.id"), nullable=False, index=True)
+    processo_id = Column(Integer, ForeignKey("processos.id"), nullable=False, index=True)
     ordem = Column(Integer, nullable=True)
 
-def get_db():
+def _rota(request: Request) -> str:
+    """Rótulo da rota com os parâmetros de caminho no lugar dos valores (ex.: /mapas/{mapa_id})"""
+    parametros = {str(valor): nome for nome, valor in request.path_params.items()}
+    segmentos = [f"{{{parametros[s]}}}" if s in parametros else s for s in request.url.path.split("/")]
+    return f"{request.method} {'/'.join(segmentos)}"
+
+def get_db(request: Request):
     db = SessionLocal()
+    db.info["rota"] = _rota(request)  # usado nas métricas de retenção de conexão
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db(request: Request):
+    async with AsyncSessionLocal() as db:
+        db.sync_session.info["rota"] = _rota(request)
+        yield db
+
+def _leitura_no_primario(request: Request) -> bool:
+    if not DB_REPLICA_URLS:
+        return True
+    try:
+        ultima_escrita = float(request.cookies.get(COOKIE_ULTIMA_ESCRITA, 0))
+    except ValueError:
+        return False
+    return time.time() - ultima_escrita < JANELA_LEITURA_PROPRIA
+
+def get_db_leitura(request: Request):
+    """Sessão para endpoints só de leitura: réplica, ou primário logo após uma escrita do cliente"""
+    if _leitura_no_primario(request):
+        yield from get_db(request)
+        return
+    db = SessionLocal(bind=replicas[next(_rodizio) % len(replicas)])
+    db.info["rota"] = _rota(request)
+    db.info["replica"] = True
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db_leitura(request: Request):
+    if _leitura_no_primario(request):
+        async for db in get_async_db(request):
+            yield db
+        return
+    async with AsyncSessionLocal(bind=replicas_async[next(_rodizio) % len(replicas_async)]) as db:
+        db.sync_session.info["rota"] = _rota(request)
+        db.sync_session.info["replica"] = True
+        yield db
+
+def pode_guardar_em_cache(db, tabelas) -> bool:
+    """
+    Resultado lido de uma réplica logo após uma escrita nas tabelas pode ainda não
+    refleti-la, e ficaria no cache sob a geração nova: nesse caso não é guardado.
+    Vale para Session e AsyncSession.
+    """
+    return not (db.info.get("replica") and alteradas_ha_menos_de(tabelas, JANELA_LEITURA_PROPRIA))
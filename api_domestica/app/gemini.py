@@ -1,11 +1,13 @@
-from fastapi import APIRouter
+from functools import lru_cache
+
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import google.generativeai as genai
 import os
 
 
 API_KEY = os.getenv("GEMINI_API_KEY", "SUA_API_KEY_AQUI")
-genai.configure(api_key=API_KEY)
+# Desligado, a rota /gemini nem é registrada
+GEMINI_ENABLED = os.getenv("GEMINI_ENABLED", "true").lower() in ("true", "1", "yes")
 
 
 router = APIRouter(prefix="/gemini", tags=["Gemini"])
@@ -14,9 +16,21 @@ router = APIRouter(prefix="/gemini", tags=["Gemini"])
 SYSTEM_MESSAGE = "Você é um assistente especializado em segurança cibernética. Responda sempre de forma clara e objetiva."
 
 
+@lru_cache(maxsize=None)
+def _genai():
+    """Importa e configura o SDK só no primeiro uso (o import custa ~0,5 s no boot do worker)"""
+    try:
+        import google.generativeai as genai
+    except ImportError as e:
+        print(f"Integração com o Gemini indisponível: {e}")
+        raise HTTPException(status_code=503, detail="Integração com o Gemini indisponível.")
+    genai.configure(api_key=API_KEY)
+    return genai
+
+
 @router.post("/")
 def query_gemini(user_input: str):
-    model = genai.GenerativeModel("gemini-1.5flash")
+    model = _genai().GenerativeModel("gemini-1.5flash")
 
     response = model.generate_content(
         [
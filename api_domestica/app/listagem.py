@@ -0,0 +1,97 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .respostas import RespostaJSON
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+
+def como_lista(valor):
+    """Formatador de colunas JSON que podem ser nulas (ex.: caminho)"""
+    return valor or []
+
+
+class ParametrosListagem:
+    """Parâmetros comuns das listagens (dependência do FastAPI)"""
+
+    def __init__(
+        self,
+        fields: Optional[str] = Query(None, description="Campos separados por vírgula (padrão: todos)"),
+        limite: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+        cursor: Optional[int] = Query(None, description="proximo_cursor da página anterior"),
+    ):
+        self.fields = fields
+        self.limite = limite
+        self.cursor = cursor
+
+
+class Listagem:
+    """
+    Listagem de uma tabela com projeção de campos (`fields=`), filtros de igualdade,
+    ordenação estável por id e paginação por keyset (`id > cursor`).
+    Só as colunas pedidas são lidas do banco.
+    """
+
+    def __init__(
+        self,
+        modelo: Any,
+        chave: str,
+        campos: Iterable[str],
+        filtros: Iterable[str] = (),
+        formatadores: Optional[Dict[str, Callable[[Any], Any]]] = None,
+    ):
+        self.modelo = modelo
+        self.chave = chave
+        self.campos = list(campos)
+        self.filtros = set(filtros)
+        self.formatadores = formatadores or {}
+
+    def _campos(self, fields: Optional[str]) -> List[str]:
+        if not fields:
+            return self.campos
+        pedidos = list(dict.fromkeys(c.strip() for c in fields.split(",") if c.strip()))
+        invalidos = [c for c in pedidos if c not in self.campos]
+        if invalidos or not pedidos:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Campos inválidos: {', '.join(invalidos)}. Use: {', '.join(self.campos)}",
+            )
+        return pedidos
+
+    def consulta(self, campos: List[str], parametros: ParametrosListagem, **filtros: Any):
+        colunas = [getattr(self.modelo, c).label(c) for c in campos]
+        if "id" not in campos:
+            colunas.append(self.modelo.id.label("_id"))
+        consulta = select(*colunas).order_by(self.modelo.id)
+        for nome, valor in filtros.items():
+            if nome not in self.filtros:
+                raise ValueError(f"Filtro não declarado na listagem de {self.chave}: {nome}")
+            if valor is not None:
+                consulta = consulta.where(getattr(self.modelo, nome) == valor)
+        if parametros.cursor is not None:
+            consulta = consulta.where(self.modelo.id > parametros.cursor)
+        return consulta.limit(parametros.limite + 1)
+
+    async def listar(self, db: AsyncSession, parametros: ParametrosListagem, **filtros: Any) -> RespostaJSON:
+        campos = self._campos(parametros.fields)
+        linhas = (await db.execute(self.consulta(campos, parametros, **filtros))).all()
+        pagina = linhas[:parametros.limite]
+
+        itens = []
+        for linha in pagina:
+            registro = linha._mapping
+            itens.append({
+                c: self.formatadores[c](registro[c]) if c in self.formatadores else registro[c]
+                for c in campos
+            })
+
+        proximo = None
+        if len(linhas) > parametros.limite:
+            ultimo = pagina[-1]._mapping
+            proximo = ultimo["id"] if "id" in campos else ultimo["_id"]
+        # As linhas vão direto para o orjson, sem jsonable_encoder
+        return RespostaJSON({self.chave: itens, "proximo_cursor": proximo})
@@ -0,0 +1,293 @@
+import asyncio
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import exists, select, text
+from sqlalchemy.orm import Session, aliased
+
+from .breadcrumbs import atualizar_caminhos, atualizar_caminhos_macro, atualizar_caminho_mapa
+from .cache import invalidar_tabelas
+from .dashboard import descontar_mapas_do_resumo
+from .database import (
+    get_db, SessionLocal, engine, Processo, Mapa, MapaTexto, Metadados, MacroProcesso, MacroProcessoProcesso,
+    RelatorioLgpdMapa, LgpdMapaPendente,
+)
+from .relatorios import marcar_mapas_pendentes
+
+router = APIRouter(prefix="/lixeira", tags=["Lixeira"])
+
+JANELA_RESTAURACAO = timedelta(days=float(os.getenv("LIXEIRA_JANELA_DIAS", "7")))
+TAMANHO_LOTE_PURGA = int(os.getenv("LIXEIRA_LOTE_PURGA", "200"))
+INTERVALO_PURGA = int(os.getenv("LIXEIRA_INTERVALO_PURGA", "3600"))  # segundos; 0 = só manual
+
+# Uma purga por processo (_job_lock) e uma entre todos os workers (advisory lock)
+_job_lock = threading.Lock()
+CHAVE_LOCK_PURGA = 7_305_002
+ESTADO_PURGA: Dict[str, Any] = {
+    "executando": False,
+    "inicio": None,
+    "fim": None,
+    "limite": None,
+    "pendentes": {},
+    "removidos": {"mapas": 0, "metadados": 0, "processos": 0, "macroprocessos": 0},
+    "erro": None,
+}
+
+
+def _subarvore(db: Session, processo_id: int, excluido_em: Optional[datetime] = None) -> List[int]:
+    """
+    Ids do processo e de todos os descendentes com o mesmo `excluido_em`
+    (None = ativos), em uma única consulta recursiva.
+    """
+    mesmo_estado = Processo.excluido_em.is_(None) if excluido_em is None else Processo.excluido_em == excluido_em
+    arvore = select(Processo.id).where(Processo.id == processo_id, mesmo_estado).cte("arvore", recursive=True)
+    arvore = arvore.union_all(select(Processo.id).where(Processo.id_pai == arvore.c.id, mesmo_estado))
+    return list(db.scalars(select(arvore.c.id)).all())
+
+
+def _desativar_mapas(db: Session, *filtros) -> None:
+    """Tira os mapas do resumo de status e marca o relatório LGPD para recálculo"""
+    descontar_mapas_do_resumo(db, *filtros)
+    marcar_mapas_pendentes(db, *filtros)
+
+
+def excluir_processo(db: Session, processo: Processo) -> datetime:
+    """
+    Exclusão lógica do processo, da subárvore e dos mapas dela, com o mesmo
+    `excluido_em` (é por ele que a restauração encontra o que foi excluído junto).
+    """
+    agora = datetime.utcnow()
+    ids = _subarvore(db, processo.id)
+    filtro_mapas = (Mapa.id_proc.in_(ids), Mapa.excluido_em.is_(None))
+    _desativar_mapas(db, *filtro_mapas)
+    db.query(Mapa).filter(*filtro_mapas).update({Mapa.excluido_em: agora}, synchronize_session=False)
+    db.query(Processo).filter(Processo.id.in_(ids)).update({Processo.excluido_em: agora}, synchronize_session=False)
+    return agora
+
+
+def excluir_mapa(db: Session, mapa: Mapa) -> datetime:
+    _desativar_mapas(db, Mapa.id == mapa.id)
+    mapa.excluido_em = datetime.utcnow()
+    return mapa.excluido_em
+
+
+def excluir_macroprocesso(db: Session, macro: MacroProcesso) -> datetime:
+    """As associações ficam (para a restauração); os processos perdem o macro no breadcrumb"""
+    macro.excluido_em = datetime.utcnow()
+    atualizar_caminhos_macro(db, macro.id)
+    return macro.excluido_em
+
+
+def restaurar_ate(excluido_em: datetime) -> datetime:
+    return excluido_em + JANELA_RESTAURACAO
+
+
+def _na_lixeira(db: Session, modelo: Any, entidade_id: int):
+    entidade = db.get(modelo, entidade_id)
+    if entidade is None or entidade.excluido_em is None:
+        raise HTTPException(status_code=404, detail=f"{modelo.__name__} não está na lixeira.")
+    if restaurar_ate(entidade.excluido_em) < datetime.utcnow():
+        raise HTTPException(status_code=410, detail="A janela de restauração expirou.")
+    return entidade
+
+
+@router.get("/")
+def listar_lixeira(db: Session = Depends(get_db)):
+    """Itens excluídos que ainda podem ser restaurados (só a raiz de cada exclusão)"""
+    db.info["incluir_excluidos"] = True
+    limite = datetime.utcnow() - JANELA_RESTAURACAO
+    pai = aliased(Processo)
+    processos = db.execute(
+        select(Processo.id, Processo.titulo, Processo.excluido_em)
+        .outerjoin(pai, pai.id == Processo.id_pai)
+        .where(Processo.excluido_em > limite, pai.excluido_em.is_distinct_from(Processo.excluido_em))
+        .order_by(Processo.excluido_em.desc())
+    ).all()
+    dono = aliased(Processo)
+    mapas = db.execute(
+        select(Mapa.id, Mapa.titulo, Mapa.excluido_em)
+        .outerjoin(dono, dono.id == Mapa.id_proc)
+        .where(Mapa.excluido_em > limite, dono.excluido_em.is_distinct_from(Mapa.excluido_em))
+        .order_by(Mapa.excluido_em.desc())
+    ).all()
+    macros = db.execute(
+        select(MacroProcesso.id, MacroProcesso.titulo, MacroProcesso.excluido_em)
+        .where(MacroProcesso.excluido_em > limite)
+        .order_by(MacroProcesso.excluido_em.desc())
+    ).all()
+
+    def itens(linhas):
+        return [{"id": l.id, "titulo": l.titulo, "excluido_em": l.excluido_em, "restaurar_ate": restaurar_ate(l.excluido_em)} for l in linhas]
+
+    return {"processos": itens(processos), "mapas": itens(mapas), "macroprocessos": itens(macros)}
+
+
+@router.post("/processos/{processo_id}/restaurar")
+def restaurar_processo(processo_id: int, db: Session = Depends(get_db)):
+    """Restaura o processo com tudo o que foi excluído junto com ele"""
+    db.info["incluir_excluidos"] = True
+    processo = _na_lixeira(db, Processo, processo_id)
+    pai = db.get(Processo, processo.id_pai) if processo.id_pai is not None else None
+    if pai is not None and pai.excluido_em is not None:
+        raise HTTPException(status_code=409, detail="O processo pai também está na lixeira; restaure-o primeiro.")
+
+    excluido_em = processo.excluido_em
+    ids = _subarvore(db, processo.id, excluido_em)
+    filtro_mapas = (Mapa.id_proc.in_(ids), Mapa.excluido_em == excluido_em)
+    descontar_mapas_do_resumo(db, *filtro_mapas, sinal=1)
+    marcar_mapas_pendentes(db, *filtro_mapas)
+    db.query(Mapa).filter(*filtro_mapas).update({Mapa.excluido_em: None}, synchronize_session=False)
+    db.query(Processo).filter(Processo.id.in_(ids)).update({Processo.excluido_em: None}, synchronize_session=False)
+
+    # O pai ou o macro podem ter sido renomeados nesse meio tempo
+    db.info.pop("incluir_excluidos")
+    db.expire_all()
+    atualizar_caminhos(db, [processo.id])
+    db.commit()
+    invalidar_tabelas("processos", "mapas", "metadados")
+    return {"message": "Processo restaurado com sucesso!", "processos": len(ids)}
+
+
+@router.post("/mapas/{mapa_id}/restaurar")
+def restaurar_mapa(mapa_id: int, db: Session = Depends(get_db)):
+    db.info["incluir_excluidos"] = True
+    mapa = _na_lixeira(db, Mapa, mapa_id)
+    dono = db.get(Processo, mapa.id_proc) if mapa.id_proc is not None else None
+    if dono is not None and dono.excluido_em is not None:
+        raise HTTPException(status_code=409, detail="O processo do mapa está na lixeira; restaure-o primeiro.")
+
+    mapa.excluido_em = None
+    db.flush()
+    descontar_mapas_do_resumo(db, Mapa.id == mapa.id, sinal=1)
+    marcar_mapas_pendentes(db, Mapa.id == mapa.id)
+    atualizar_caminho_mapa(db, mapa)
+    db.commit()
+    invalidar_tabelas("mapas", "metadados")
+    return {"message": "Mapa restaurado com sucesso!"}
+
+
+@router.post("/macroprocessos/{macro_id}/restaurar")
+def restaurar_macroprocesso(macro_id: int, db: Session = Depends(get_db)):
+    db.info["incluir_excluidos"] = True
+    macro = _na_lixeira(db, MacroProcesso, macro_id)
+    macro.excluido_em = None
+    db.flush()
+    db.info.pop("incluir_excluidos")
+    atualizar_caminhos_macro(db, macro.id)
+    db.commit()
+    invalidar_tabelas("macro_processos", "macro_processo_processo", "processos", "mapas")
+    return {"message": "MacroProcesso restaurado com sucesso!"}
+
+
+def _pendentes(db: Session, limite: datetime) -> Dict[str, int]:
+    return {
+        "mapas": db.query(Mapa).filter(Mapa.excluido_em <= limite).count(),
+        "processos": db.query(Processo).filter(Processo.excluido_em <= limite).count(),
+        "macroprocessos": db.query(MacroProcesso).filter(MacroProcesso.excluido_em <= limite).count(),
+    }
+
+
+def purgar_excluidos():
+    """
+    Job em segundo plano: remove de fato o que saiu da janela de restauração,
+    em lotes de TAMANHO_LOTE_PURGA com commit por lote (os locks duram um lote).
+    Ordem: mapas (com metadados e textos), processos das folhas para a raiz, macros.
+    """
+    if not _job_lock.acquire(blocking=False):
+        return
+    conn_lock = engine.connect()
+    try:
+        obtido = conn_lock.scalar(text("SELECT pg_try_advisory_lock(:chave)"), {"chave": CHAVE_LOCK_PURGA})
+        conn_lock.commit()
+    except Exception as e:
+        print(f"Erro ao obter o lock da purga: {e}")
+        obtido = False
+    if not obtido:
+        # Outro worker já está purgando
+        conn_lock.close()
+        _job_lock.release()
+        return
+    limite = datetime.utcnow() - JANELA_RESTAURACAO
+    removidos = {"mapas": 0, "metadados": 0, "processos": 0, "macroprocessos": 0}
+    ESTADO_PURGA.update(
+        executando=True, inicio=datetime.utcnow().isoformat(), fim=None,
+        limite=limite.isoformat(), removidos=removidos, erro=None,
+    )
+    db = SessionLocal()
+    db.info["incluir_excluidos"] = True
+    try:
+        ESTADO_PURGA["pendentes"] = _pendentes(db, limite)
+
+        while True:
+            ids = db.scalars(select(Mapa.id).where(Mapa.excluido_em <= limite).limit(TAMANHO_LOTE_PURGA)).all()
+            if not ids:
+                break
+            removidos["metadados"] += db.query(Metadados).filter(Metadados.id_processo.in_(ids)).delete(synchronize_session=False)
+            db.query(MapaTexto).filter(MapaTexto.id_mapa.in_(ids)).delete(synchronize_session=False)
+            db.query(RelatorioLgpdMapa).filter(RelatorioLgpdMapa.id_mapa.in_(ids)).delete(synchronize_session=False)
+            db.query(LgpdMapaPendente).filter(LgpdMapaPendente.id_mapa.in_(ids)).delete(synchronize_session=False)
+            removidos["mapas"] += db.query(Mapa).filter(Mapa.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+
+        # Só processos sem filhos e sem mapas: cada lote sobe um nível da subárvore
+        filho = aliased(Processo)
+        while True:
+            ids = db.scalars(
+                select(Processo.id).where(
+                    Processo.excluido_em <= limite,
+                    ~exists().where(filho.id_pai == Processo.id),
+                    ~exists().where(Mapa.id_proc == Processo.id),
+                ).limit(TAMANHO_LOTE_PURGA)
+            ).all()
+            if not ids:
+                break
+            db.query(MacroProcessoProcesso).filter(MacroProcessoProcesso.processo_id.in_(ids)).delete(synchronize_session=False)
+            removidos["processos"] += db.query(Processo).filter(Processo.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+
+        while True:
+            ids = db.scalars(select(MacroProcesso.id).where(MacroProcesso.excluido_em <= limite).limit(TAMANHO_LOTE_PURGA)).all()
+            if not ids:
+                break
+            db.query(MacroProcessoProcesso).filter(MacroProcessoProcesso.macro_processo_id.in_(ids)).delete(synchronize_session=False)
+            removidos["macroprocessos"] += db.query(MacroProcesso).filter(MacroProcesso.id.in_(ids)).delete(synchronize_session=False)
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Erro na purga da lixeira: {e}")
+        ESTADO_PURGA["erro"] = str(e)
+    finally:
+        db.close()
+        ESTADO_PURGA.update(executando=False, fim=datetime.utcnow().isoformat())
+        try:
+            conn_lock.execute(text("SELECT pg_advisory_unlock(:chave)"), {"chave": CHAVE_LOCK_PURGA})
+            conn_lock.commit()
+        finally:
+            conn_lock.close()
+            _job_lock.release()
+
+
+async def purga_periodica():
+    """Roda a purga a cada INTERVALO_PURGA segundos (iniciada no startup da API)"""
+    while INTERVALO_PURGA > 0:
+        await asyncio.sleep(INTERVALO_PURGA)
+        await run_in_threadpool(purgar_excluidos)
+
+
+@router.post("/purgar")
+async def agendar_purga(background_tasks: BackgroundTasks):
+    """Agenda a remoção definitiva do que saiu da janela de restauração"""
+    if ESTADO_PURGA["executando"]:
+        raise HTTPException(status_code=409, detail="A purga já está em andamento.")
+    background_tasks.add_task(purgar_excluidos)
+    return {"message": "Purga da lixeira agendada."}
+
+
+@router.get("/purga")
+async def status_purga():
+    """Progresso da purga: o que havia para remover e o que já foi removido"""
+    return ESTADO_PURGA
@@ -0,0 +1,48 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Set, Type
+
+from fastapi import Depends
+from sqlalchemy.orm import Session
+
+from .database import get_db_leitura
+
+
+class CarregadorLote:
+    """
+    Resolve entidades relacionadas em lote durante uma requisição (dataloader).
+    Os formatadores registram os ids que vão precisar; na primeira leitura de um
+    tipo, todos os ids pendentes são buscados com uma única query `IN`.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._pendentes: Dict[Type[Any], Set[Any]] = defaultdict(set)
+        self._carregados: Dict[Type[Any], Dict[Any, Any]] = defaultdict(dict)
+
+    def registrar(self, modelo: Type[Any], ids: Iterable[Any]) -> None:
+        carregados = self._carregados[modelo]
+        self._pendentes[modelo].update(i for i in ids if i is not None and i not in carregados)
+
+    def carregar(self, modelo: Type[Any]) -> None:
+        pendentes = self._pendentes.pop(modelo, None)
+        if not pendentes:
+            return
+        carregados = self._carregados[modelo]
+        for entidade in self.db.query(modelo).filter(modelo.id.in_(pendentes)).all():
+            carregados[entidade.id] = entidade
+        # Ids inexistentes também ficam registrados, para não gerar nova query
+        for entidade_id in pendentes:
+            carregados.setdefault(entidade_id, None)
+
+    def obter(self, modelo: Type[Any], entidade_id: Any) -> Optional[Any]:
+        if entidade_id is None:
+            return None
+        if entidade_id not in self._carregados[modelo]:
+            self.registrar(modelo, [entidade_id])
+            self.carregar(modelo)
+        return self._carregados[modelo].get(entidade_id)
+
+
+def get_carregador(db: Session = Depends(get_db_leitura)) -> CarregadorLote:
+    """Um carregador por requisição, usando a mesma sessão de get_db_leitura."""
+    return CarregadorLote(db)
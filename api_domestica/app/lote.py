@@ -0,0 +1,272 @@
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import Integer, column, insert, select, update, values
+from sqlalchemy.orm import Session
+
+from .bpmn import XML_VAZIO, extrair_textos, indexar_textos_mapa, remover_metadados_orfaos
+from .breadcrumbs import atualizar_caminhos_lote, caminho_abaixo
+from .cache import invalidar_tabelas
+from .dashboard import ajustar_resumo_status, registrar_eventos_mapas
+from .database import get_db, Processo, Mapa, MapaTexto, MacroProcesso, MacroProcessoProcesso
+from .relatorios import marcar_mapas_pendentes
+from .schemas import HierarquiaLote, HierarquiaLoteResponse, ReordenarFilhos
+
+router = APIRouter(prefix="/hierarchy", tags=["Hierarquia"])
+
+STATUS_PADRAO = "Em andamento"
+
+
+def _validar_itens(itens: List[Any], nome: str) -> None:
+    refs = set()
+    for item in itens:
+        if (item.ref is None) == (item.id is None):
+            raise HTTPException(status_code=400, detail=f"Cada item de {nome} deve ter 'ref' (novo) ou 'id' (existente).")
+        if item.ref is not None:
+            if item.ref in refs:
+                raise HTTPException(status_code=400, detail=f"ref duplicado em {nome}: {item.ref}")
+            refs.add(item.ref)
+        if item.titulo is not None and not item.titulo.strip():
+            raise HTTPException(status_code=400, detail="O título não pode ser vazio.")
+
+
+def _carregar(db: Session, modelo: Any, ids: Iterable[int]) -> Dict[int, Any]:
+    """Carrega as entidades existentes com uma consulta; 404 se faltar alguma"""
+    ids = set(ids)
+    if not ids:
+        return {}
+    encontrados = {e.id: e for e in db.query(modelo).filter(modelo.id.in_(ids)).all()}
+    faltando = sorted(ids - set(encontrados))
+    if faltando:
+        raise HTTPException(status_code=404, detail=f"{modelo.__name__} não encontrado: {', '.join(map(str, faltando))}")
+    return encontrados
+
+
+def _resolver(valor: Any, ids: Dict[str, int]) -> Any:
+    return ids[valor] if isinstance(valor, str) else valor
+
+
+@router.post("/lote/", response_model=HierarquiaLoteResponse)
+def salvar_hierarquia_lote(lote: HierarquiaLote, db: Session = Depends(get_db)):
+    """
+    Cria e atualiza processos, mapas e associações em uma única transação.
+    Itens novos usam ids temporários (`ref`) que outros itens do lote podem
+    referenciar; a resposta traz o mapeamento ref -> id criado.
+    """
+    _validar_itens(lote.processos, "processos")
+    _validar_itens(lote.mapas, "mapas")
+
+    novos_processos = {p.ref: p for p in lote.processos if p.ref is not None}
+    for p in lote.processos:
+        if p.ref is not None and p.titulo is None:
+            raise HTTPException(status_code=400, detail=f"Processo novo sem título: {p.ref}")
+        if p.id is not None and p.id_pai is not None:
+            raise HTTPException(status_code=400, detail="Para mover um processo existente use PUT /processos/{id}/move.")
+    for m in lote.mapas:
+        if m.ref is not None and (m.id_proc is None or m.titulo is None):
+            raise HTTPException(status_code=400, detail=f"Mapa novo precisa de id_proc e titulo: {m.ref}")
+        if m.id is not None and m.id_proc is not None:
+            raise HTTPException(status_code=400, detail="Para mover um mapa existente use PUT /mapas/{id}/move.")
+
+    referencias = (
+        [p.id_pai for p in novos_processos.values()]
+        + [m.id_proc for m in lote.mapas]
+        + [a.processo_id for a in lote.associacoes]
+    )
+    for valor in referencias:
+        if isinstance(valor, str) and valor not in novos_processos:
+            raise HTTPException(status_code=400, detail=f"Referência desconhecida: {valor}")
+
+    # Entidades existentes: uma consulta por tabela
+    processos = _carregar(
+        db, Processo,
+        [p.id for p in lote.processos if p.id is not None] + [v for v in referencias if isinstance(v, int)],
+    )
+    mapas = _carregar(db, Mapa, [m.id for m in lote.mapas if m.id is not None])
+    _carregar(db, MacroProcesso, [a.macro_processo_id for a in lote.associacoes])
+
+    for a in lote.associacoes:
+        if isinstance(a.processo_id, str):
+            id_pai = novos_processos[a.processo_id].id_pai
+        else:
+            id_pai = processos[a.processo_id].id_pai
+        if id_pai is not None:
+            raise HTTPException(
+                status_code=400,
+                detail="Apenas processos de nível superior (sem pai) podem ser associados a macroprocessos."
+            )
+
+    # 1. Processos novos, um INSERT ... RETURNING por nível da árvore
+    ids_processos: Dict[str, int] = {}
+    pendentes = list(novos_processos.values())
+    while pendentes:
+        prontos = [p for p in pendentes if not isinstance(p.id_pai, str) or p.id_pai in ids_processos]
+        if not prontos:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Referência circular entre processos: {', '.join(p.ref for p in pendentes)}"
+            )
+        novos_ids = db.scalars(insert(Processo).returning(Processo.id, sort_by_parameter_order=True), [{
+            "titulo": p.titulo.strip(),
+            "id_pai": _resolver(p.id_pai, ids_processos),
+            "id_area": p.id_area,
+            "ordem": p.ordem,
+            "data_publicacao": p.data_publicacao,
+        } for p in prontos]).all()
+        ids_processos.update(zip((p.ref for p in prontos), novos_ids))
+        pendentes = [p for p in pendentes if p.ref not in ids_processos]
+
+    # 2. Processos existentes (sem mudança de pai)
+    renomeados = []
+    for p in lote.processos:
+        if p.id is None:
+            continue
+        proc = processos[p.id]
+        for campo in ("id_area", "ordem", "data_publicacao"):
+            valor = getattr(p, campo)
+            if valor is not None:
+                setattr(proc, campo, valor)
+        if p.titulo is not None:
+            proc.titulo = p.titulo.strip()
+            renomeados.append(proc.id)
+
+    # 3. Associações
+    associados = [_resolver(a.processo_id, ids_processos) for a in lote.associacoes]
+    ids_associacoes: List[int] = []
+    if lote.associacoes:
+        ids_associacoes = db.scalars(
+            insert(MacroProcessoProcesso).returning(MacroProcessoProcesso.id, sort_by_parameter_order=True),
+            [{"macro_processo_id": a.macro_processo_id, "processo_id": processo_id, "ordem": a.ordem}
+             for a, processo_id in zip(lote.associacoes, associados)],
+        ).all()
+
+    # 4. Breadcrumbs dos processos novos, renomeados e associados (e das subárvores)
+    atualizar_caminhos_lote(db, [*ids_processos.values(), *renomeados, *associados])
+
+    # 5. Mapas novos, com caminho, textos indexados, resumo e eventos em lote
+    eventos: List[Dict[str, Any]] = []
+    ids_mapas: Dict[str, int] = {}
+    novos_mapas = [m for m in lote.mapas if m.ref is not None]
+    if novos_mapas:
+        donos_ids = {_resolver(m.id_proc, ids_processos) for m in novos_mapas}
+        donos = {p.id: p for p in db.query(Processo).filter(Processo.id.in_(donos_ids)).all()}
+        linhas = []
+        for m in novos_mapas:
+            dono = donos[_resolver(m.id_proc, ids_processos)]
+            linhas.append({
+                "id_proc": dono.id,
+                "titulo": m.titulo,
+                "XML": m.XML or XML_VAZIO,
+                "status": m.status or STATUS_PADRAO,
+                "caminho": caminho_abaixo(dono),
+            })
+        novos_ids = db.scalars(insert(Mapa).returning(Mapa.id, sort_by_parameter_order=True), linhas).all()
+        ids_mapas = dict(zip((m.ref for m in novos_mapas), novos_ids))
+
+        textos = [dict(t, id_mapa=mapa_id) for linha, mapa_id in zip(linhas, novos_ids) for t in extrair_textos(linha["XML"])]
+        if textos:
+            db.execute(insert(MapaTexto), textos)
+        for status, total in Counter(linha["status"] for linha in linhas).items():
+            ajustar_resumo_status(db, status, total)
+        eventos.extend(
+            {"id_mapa": mapa_id, "id_proc": linha["id_proc"], "tipo": "criado", "status_novo": linha["status"]}
+            for linha, mapa_id in zip(linhas, novos_ids)
+        )
+
+    # 6. Mapas existentes (mesmas regras de PUT /mapas/{id})
+    com_orfaos = []
+    for m in lote.mapas:
+        if m.id is None:
+            continue
+        mapa = mapas[m.id]
+        if m.titulo is not None:
+            mapa.titulo = m.titulo
+        if m.status is not None and m.status != mapa.status:
+            ajustar_resumo_status(db, mapa.status, -1)
+            ajustar_resumo_status(db, m.status, 1)
+            eventos.append({"id_mapa": mapa.id, "id_proc": mapa.id_proc, "tipo": "status",
+                            "status_anterior": mapa.status, "status_novo": m.status})
+            mapa.status = m.status
+        if m.XML is not None:
+            mapa.XML = m.XML
+            indexar_textos_mapa(db, mapa)
+            if remover_metadados_orfaos(db, mapa.id, m.XML):
+                com_orfaos.append(mapa.id)
+        mapa.data_modificacao = datetime.utcnow()
+        eventos.append({"id_mapa": mapa.id, "id_proc": mapa.id_proc, "tipo": "modificado"})
+    if com_orfaos:
+        marcar_mapas_pendentes(db, Mapa.id.in_(com_orfaos))
+    registrar_eventos_mapas(db, eventos)
+
+    db.commit()
+    tabelas = []
+    if lote.processos or lote.associacoes:
+        tabelas.append("processos")
+    # Renomear ou associar processos reescreve o caminho dos mapas abaixo deles
+    if lote.mapas or renomeados or lote.associacoes:
+        tabelas.append("mapas")
+    if lote.associacoes:
+        tabelas.append("macro_processo_processo")
+    if com_orfaos:
+        tabelas.append("metadados")
+    invalidar_tabelas(*tabelas)
+
+    return {
+        "message": "Hierarquia salva com sucesso!",
+        "processos": ids_processos,
+        "mapas": ids_mapas,
+        "associacoes": ids_associacoes,
+        "atualizados": {
+            "processos": [p.id for p in lote.processos if p.id is not None],
+            "mapas": [m.id for m in lote.mapas if m.id is not None],
+        },
+    }
+
+
+@router.put("/ordem/")
+def reordenar_filhos(dados: ReordenarFilhos, db: Session = Depends(get_db)):
+    """
+    Regrava a `ordem` de todos os filhos de um processo (ou dos processos de um
+    macroprocesso) com um único UPDATE ... FROM (VALUES ...). A lista precisa
+    conter exatamente os filhos atuais; o pai fica bloqueado durante a troca.
+    """
+    if (dados.id_pai is None) == (dados.macro_processo_id is None):
+        raise HTTPException(status_code=400, detail="Informe id_pai ou macro_processo_id (apenas um).")
+    if len(set(dados.ids)) != len(dados.ids):
+        raise HTTPException(status_code=400, detail="A lista de ids tem repetições.")
+
+    if dados.id_pai is not None:
+        pai, tabela, chave, filtro = Processo, Processo, Processo.id, Processo.id_pai == dados.id_pai
+        pai_id = dados.id_pai
+    else:
+        pai, tabela, chave = MacroProcesso, MacroProcessoProcesso, MacroProcessoProcesso.processo_id
+        filtro = MacroProcessoProcesso.macro_processo_id == dados.macro_processo_id
+        pai_id = dados.macro_processo_id
+
+    # FOR UPDATE no pai impede que filhos sejam incluídos (FK) até o commit
+    if db.execute(select(pai.id).where(pai.id == pai_id).with_for_update()).first() is None:
+        raise HTTPException(status_code=404, detail=f"{pai.__name__} não encontrado.")
+    atuais = set(db.scalars(select(chave).where(filtro).with_for_update()).all())
+    if atuais != set(dados.ids):
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": "A lista não corresponde aos filhos atuais.",
+                "faltando": sorted(atuais - set(dados.ids)),
+                "desconhecidos": sorted(set(dados.ids) - atuais),
+            },
+        )
+
+    if dados.ids:
+        nova_ordem = values(column("id", Integer), column("ordem", Integer), name="nova_ordem").data(
+            [(item_id, posicao) for posicao, item_id in enumerate(dados.ids, start=1)]
+        )
+        db.execute(
+            update(tabela).where(filtro, chave == nova_ordem.c.id).values(ordem=nova_ordem.c.ordem),
+            execution_options={"synchronize_session": False},
+        )
+    db.commit()
+    invalidar_tabelas("processos" if tabela is Processo else "macro_processo_processo")
+    return {"message": "Ordem atualizada com sucesso!", "ids": dados.ids}
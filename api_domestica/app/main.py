@@ -1,24 +1,43 @@
 # api_domestica/app/main.py
 # (Modified to add /hierarchy/ endpoint)
 
+import asyncio
+import csv
+import io
+import math
+import os
+import time
 from datetime import datetime
-from sqlalchemy import String
-from fastapi import FastAPI, Depends, HTTPException,status
+from sqlalchemy import String, Text, cast, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from fastapi import FastAPI, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .database import Metadados, create_all_tables, drop_and_create_all_tables,get_db, Usuario, Item, Processo, Mapa, Area, Documento, MacroProcesso, MacroProcessoProcesso
+from .database import Metadados, DADOS_TEXTO, get_db, get_async_db_leitura, SessionLocal, DB_REPLICA_URLS, JANELA_LEITURA_PROPRIA, COOKIE_ULTIMA_ESCRITA, Usuario, Item, Processo, Mapa, MapaTexto, Area, Documento, MacroProcesso, MacroProcessoProcesso
+from .bpmn import XML_VAZIO, indexar_textos_mapa, remover_metadados_orfaos
+from .breadcrumbs import atualizar_caminhos, atualizar_caminhos_macro, atualizar_caminho_mapa
 from fastapi.middleware.cors import CORSMiddleware
-from .utils import validate_entity
-from fastapi.responses import Response
-from .schemas import UsuarioCreate,UsuarioLogin,UsuarioOut,MetadadosBase,MetadadosCreate,MetadadosResponse
+from .utils import validate_entity, validate_entity_async
+from .listagem import Listagem, ParametrosListagem, como_lista
+from .respostas import para_json
+from .cache import invalidar_tabelas
+from .search import CACHE_BUSCA, chave_busca, guardar_busca
+from fastapi.responses import Response, StreamingResponse
+from .schemas import UsuarioCreate,UsuarioLogin,UsuarioOut,MetadadosBase,MetadadosCreate,MetadadosResponse,MetadadosLote,MetadadosLoteResponse
+from .schemas import MapaDetalheResponse, HierarquiaResponse, BuscaMetadadosResponse
 from fastapi.staticfiles import StaticFiles  # Importar StaticFiles
 from .auth import AUTH_ENABLED, get_current_active_user
 
 from .auth import gerar_hash_senha, verificar_senha, criar_token_acesso
 from .schemas import MacroCreate
 from pydantic import BaseModel
-from typing import List
-from . import xbanco, dashboard
+from typing import Dict, List
+from .migracoes import verificar_versao
+from . import xbanco, dashboard, relatorios, manutencao, metricas, lote, lixeira
+from .lixeira import excluir_processo, excluir_mapa, excluir_macroprocesso, restaurar_ate
+from .relatorios import marcar_mapas_pendentes
+from .dashboard import ajustar_resumo_status, registrar_evento_mapa
 from . import gemini
 from . import canvas
 
@@ -51,20 +70,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def marcar_ultima_escrita(request, call_next):
+    """Após uma escrita bem-sucedida, mantém as leituras do cliente no primário por alguns segundos"""
+    response = await call_next(request)
+    if DB_REPLICA_URLS and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(
+            COOKIE_ULTIMA_ESCRITA, str(time.time()),
+            max_age=math.ceil(JANELA_LEITURA_PROPRIA), httponly=True, samesite="lax",
+        )
+    return response
+
 # Endpoints
 app.include_router(xbanco.router)
-app.include_router(gemini.router)   
+if gemini.GEMINI_ENABLED:
+    app.include_router(gemini.router)
 app.include_router(canvas.router)
 app.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
+app.include_router(relatorios.router)
+app.include_router(manutencao.router)
+app.include_router(metricas.router)
+app.include_router(lote.router)
+app.include_router(lixeira.router)
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# check_dir=False: o diretório é criado no startup, não como efeito colateral do import
+app.mount("/uploads", StaticFiles(directory=canvas.UPLOAD_DIR, check_dir=False), name="uploads")
 
 # startup da aplicação
 @app.on_event("startup")
 def on_startup():
-    
-   #create_all_tables()
-   drop_and_create_all_tables() # CUIDADO! Isto irá apagar todos os dados existentes e criar as tabelas novamente.
+    # Só confere a versão do esquema; as migrações rodam antes (python -m app.migracoes)
+    verificar_versao()
+    os.makedirs(canvas.UPLOAD_DIR, exist_ok=True)
+
+
+@app.on_event("startup")
+async def iniciar_purga_lixeira():
+    # Remove fisicamente, em segundo plano, o que passou da janela de restauração
+    # A referência fica em app.state: o loop só guarda referência fraca das tasks
+    app.state.purga_lixeira = asyncio.create_task(lixeira.purga_periodica())
+
+
+@app.on_event("shutdown")
+async def parar_purga_lixeira():
+    tarefa = getattr(app.state, "purga_lixeira", None)
+    if tarefa is None:
+        return
+    tarefa.cancel()
+    try:
+        await tarefa
+    except asyncio.CancelledError:
+        pass
 
 
 # Endpoints
@@ -73,15 +129,17 @@ async def read_root():
     return {"message": "API UHU!"}
 
 # Teste
+LISTAGEM_USUARIOS = Listagem(Usuario, "usuarios", ["id", "nome"])
+
 @app.get("/usuarios/")
-async def get_users_data(db: Session = Depends(get_db)):
-    users = db.query(Usuario).all()
-    return {"usuarios": [{"id": user.id, "nome": user.nome} for user in users]}
+async def get_users_data(parametros: ParametrosListagem = Depends(), db: AsyncSession = Depends(get_async_db_leitura)):
+    return await LISTAGEM_USUARIOS.listar(db, parametros)
+
+LISTAGEM_ITEMS = Listagem(Item, "items", ["id", "nome_item"])
 
 @app.get("/items/")
-async def get_items_data(db: Session = Depends(get_db)):
-    items = db.query(Item).all()
-    return {"items": [{"id": item.id, "nome_item": item.nome_item} for item in items]}
+async def get_items_data(parametros: ParametrosListagem = Depends(), db: AsyncSession = Depends(get_async_db_leitura)):
+    return await LISTAGEM_ITEMS.listar(db, parametros)
 
 # ... código existente ...
 
@@ -108,6 +166,7 @@ def registrar_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
         )
         db.add(novo_usuario)
         db.commit()
+        invalidar_tabelas("usuarios")
         db.refresh(novo_usuario)
         return novo_usuario
         
@@ -136,7 +195,7 @@ def login(usuario: UsuarioLogin, db: Session = Depends(get_db)):
 
 
 @app.post("/usuarios/")
-async def create_user(nome: str, db: Session = Depends(get_db)):
+def create_user(nome: str, db: Session = Depends(get_db)):
 
     if not nome.strip():
         raise HTTPException(status_code=400, detail="O nome não pode ser vazio ou conter apenas espaços.")
@@ -144,6 +203,7 @@ async def create_user(nome: str, db: Session = Depends(get_db)):
     user = Usuario(nome=nome.strip()) 
     db.add(user)
     db.commit()
+    invalidar_tabelas("usuarios")
     db.refresh(user)
     return {"message": "Usuário criado com sucesso!", "usuario": {"id": user.id, "nome": user.nome}}
 
@@ -151,74 +211,57 @@ async def create_user(nome: str, db: Session = Depends(get_db)):
 from .schemas import ProcessoCreate  # Add import
 
 @app.post("/processos/")
-async def create_processo(proc: ProcessoCreate, db: Session = Depends(get_db)):
+def create_processo(proc: ProcessoCreate, db: Session = Depends(get_db)):
     new_proc = Processo(**proc.dict())
     db.add(new_proc)
+    db.flush()
+    atualizar_caminhos(db, [new_proc.id])
     db.commit()
+    invalidar_tabelas("processos")
     db.refresh(new_proc)
-    return {"message": "Processo criado com sucesso!", "processo": {"id": new_proc.id, "id_pai": new_proc.id_pai, "id_area": new_proc.id_area, "ordem": new_proc.ordem, "titulo": new_proc.titulo, "data_publicacao": new_proc.data_publicacao}}
+    return {"message": "Processo criado com sucesso!", "processo": {"id": new_proc.id, "id_pai": new_proc.id_pai, "id_area": new_proc.id_area, "ordem": new_proc.ordem, "titulo": new_proc.titulo, "data_publicacao": new_proc.data_publicacao, "caminho": new_proc.caminho}}
+
+LISTAGEM_PROCESSOS = Listagem(
+    Processo, "processos",
+    ["id", "id_pai", "id_area", "ordem", "titulo", "data_publicacao", "data_criacao", "caminho"],
+    filtros=["id_pai", "id_area"],
+    formatadores={"caminho": como_lista},
+)
 
 @app.get("/processos/")
-async def get_processos(db: Session = Depends(get_db)):
-    processos = db.query(Processo).all()
-    return {"processos": [{"id": proc.id, "id_pai": proc.id_pai, "id_area": proc.id_area, "ordem": proc.ordem, "titulo": proc.titulo, "data_publicacao": proc.data_publicacao, "data_criacao": proc.data_criacao} for proc in processos]}
+async def get_processos(
+    id_pai: Optional[int] = None,
+    id_area: Optional[int] = None,
+    parametros: ParametrosListagem = Depends(),
+    db: AsyncSession = Depends(get_async_db_leitura),
+):
+    return await LISTAGEM_PROCESSOS.listar(db, parametros, id_pai=id_pai, id_area=id_area)
 
 @app.get("/processos/{processo_id}")
-async def get_processo(processo_id: int, db: Session = Depends(get_db)):
-    # proc = db.query(Processo).filter(Processo.id == processo_id).first() 
-    proc = validate_entity(db, processo_id, Processo)
-    return {"processo": {"id": proc.id, "id_pai": proc.id_pai, "id_area": proc.id_area, "ordem": proc.ordem, "titulo": proc.titulo, "data_publicacao": proc.data_publicacao}}
+async def get_processo(processo_id: int, db: AsyncSession = Depends(get_async_db_leitura)):
+    proc = await validate_entity_async(db, processo_id, Processo)
+    return {"processo": {"id": proc.id, "id_pai": proc.id_pai, "id_area": proc.id_area, "ordem": proc.ordem, "titulo": proc.titulo, "data_publicacao": proc.data_publicacao, "caminho": proc.caminho or []}}
 
 @app.get("/processos/{processo_id}/{filhos}")
-async def get_processo_filhos(processo_id: int, filhos: bool = False, db: Session = Depends(get_db)):
+async def get_processo_filhos(processo_id: int, filhos: bool = False, db: AsyncSession = Depends(get_async_db_leitura)):
     if filhos:
-        filhos_list = db.query(Processo).filter(Processo.id_pai == processo_id).all()
+        filhos_list = (await db.scalars(select(Processo).where(Processo.id_pai == processo_id))).all()
         filhos_sorted = sorted(filhos_list, key=lambda f: f.ordem or 0)
-        return {"filhos": [{"id": filho.id, "id_pai": filho.id_pai, "id_area": filho.id_area, "ordem": filho.ordem, "titulo": filho.titulo, "data_publicacao": filho.data_publicacao, "data_criacao": filho.data_criacao} for filho in filhos_sorted]}
+        return {"filhos": [{"id": filho.id, "id_pai": filho.id_pai, "id_area": filho.id_area, "ordem": filho.ordem, "titulo": filho.titulo, "data_publicacao": filho.data_publicacao, "data_criacao": filho.data_criacao, "caminho": filho.caminho or []} for filho in filhos_sorted]}
     return []
 
 @app.delete("/processos/{processo_id}")
-async def delete_processo(processo_id: int, db: Session = Depends(get_db)):
+def delete_processo(processo_id: int, db: Session = Depends(get_db)):
     proc = validate_entity(db, processo_id, Processo)
-    
-    # 1. Deletar associações com macroprocessos
-    db.query(MacroProcessoProcesso).filter(
-        MacroProcessoProcesso.processo_id == processo_id
-    ).delete()
-    
-    # 2. Deletar mapas associados ao processo
-    db.query(Mapa).filter(Mapa.id_proc == processo_id).delete()
-    
-    # 3. Deletar metadados associados aos mapas do processo
-    # (Os metadados usam id_processo como id do mapa, então precisamos buscar os mapas primeiro)
-    mapas_ids = [m.id for m in db.query(Mapa.id).filter(Mapa.id_proc == processo_id).all()]
-    if mapas_ids:
-        db.query(Metadados).filter(Metadados.id_processo.in_(mapas_ids)).delete(synchronize_session=False)
-    
-    # 4. Atualizar processos filhos (remover referência ao pai) ou deletá-los
-    # Opção A: Remover referência ao pai (os filhos ficam órfãos)
-    # db.query(Processo).filter(Processo.id_pai == processo_id).update({"id_pai": None})
-    
-    # Opção B: Deletar filhos recursivamente
-    def delete_children(parent_id):
-        children = db.query(Processo).filter(Processo.id_pai == parent_id).all()
-        for child in children:
-            delete_children(child.id)  # Recursivo
-            # Deletar mapas do filho
-            db.query(Mapa).filter(Mapa.id_proc == child.id).delete()
-            db.delete(child)
-    
-    delete_children(processo_id)
-    
-    # 5. Finalmente, deletar o processo
-    db.delete(proc)
+    # Exclusão lógica da subárvore e dos mapas; a remoção de fato fica para a purga da lixeira
+    excluido_em = excluir_processo(db, proc)
     db.commit()
-    
-    return {"message": "Processo deletado com sucesso!"}
+    invalidar_tabelas("processos", "mapas", "metadados", "macro_processo_processo")
+    return {"message": "Processo deletado com sucesso!", "restaurar_ate": restaurar_ate(excluido_em)}
 
 
 @app.put("/processos/{processo_id}")
-async def update_processo(processo_id: int, id_pai: int = None, id_area: int = None, ordem: int = None, titulo: str = None, data_publicacao: str = None, db: Session = Depends(get_db)):
+def update_processo(processo_id: int, id_pai: int = None, id_area: int = None, ordem: int = None, titulo: str = None, data_publicacao: str = None, db: Session = Depends(get_db)):
     # proc = db.query(Processo).filter(Processo.id == processo_id).first()
     # if not proc:
     #     raise HTTPException(status_code=404, detail="Processo não encontrado.")
@@ -233,7 +276,11 @@ async def update_processo(processo_id: int, id_pai: int = None, id_area: int = N
         proc.titulo = titulo
     if data_publicacao is not None:
         proc.data_publicacao = data_publicacao
+    if id_pai is not None or titulo is not None:
+        # Renomear ou mudar o pai altera o breadcrumb da subárvore e dos mapas
+        atualizar_caminhos(db, [proc.id])
     db.commit()
+    invalidar_tabelas("processos", "mapas")
     db.refresh(proc)
     return {"message": "Processo atualizado com sucesso!", "processo": {"id": proc.id, "id_pai": proc.id_pai, "id_area": proc.id_area, "ordem": proc.ordem, "titulo": proc.titulo, "data_publicacao": proc.data_publicacao}}
 
@@ -244,16 +291,21 @@ async def update_processo(processo_id: int, id_pai: int = None, id_area: int = N
 from .schemas import MapCreate  # Add this import
 
 @app.post("/mapas/")
-async def create_mapa(mapa: MapCreate, db: Session = Depends(get_db)):
+def create_mapa(mapa: MapCreate, db: Session = Depends(get_db)):
     new_mapa = Mapa(
         id_proc=mapa.id_proc,
         titulo=mapa.titulo,
-        XML=mapa.XML or '<bpmn:definitions id="Definitions_1"><bpmn:process id="Process_1"></bpmn:process></bpmn:definitions>',
+        XML=mapa.XML or XML_VAZIO,
         status=mapa.status or "Em andamento"
     )
 
     db.add(new_mapa)
+    ajustar_resumo_status(db, new_mapa.status, 1)
+    atualizar_caminho_mapa(db, new_mapa)
+    indexar_textos_mapa(db, new_mapa)
+    registrar_evento_mapa(db, new_mapa, "criado", status_novo=new_mapa.status)
     db.commit()
+    invalidar_tabelas("mapas")
     db.refresh(new_mapa)
 
     return {
@@ -265,32 +317,43 @@ async def create_mapa(mapa: MapCreate, db: Session = Depends(get_db)):
             "XML": new_mapa.XML,
             "status": new_mapa.status,
             "data_criacao": new_mapa.data_criacao,
-            "data_modificacao": new_mapa.data_modificacao
+            "data_modificacao": new_mapa.data_modificacao,
+            "caminho": new_mapa.caminho
         }
     }
 
 # Adicionar endpoint PUT para atualizar mapa
 @app.put("/mapas/{mapa_id}")
-async def update_mapa(
+def update_mapa(
     mapa_id: int, 
     titulo: str = None,
     status: str = None,
     XML: str = None,
     db: Session = Depends(get_db)
 ):
-    mapa = validate_entity(db, mapa_id, Mapa)
+    mapa = validate_entity(db, mapa_id, Mapa, sem_cache=True)
     
     if titulo is not None:
         mapa.titulo = titulo
-    if status is not None:
+    if status is not None and status != mapa.status:
+        ajustar_resumo_status(db, mapa.status, -1)
+        ajustar_resumo_status(db, status, 1)
+        registrar_evento_mapa(db, mapa, "status", status_anterior=mapa.status, status_novo=status)
         mapa.status = status
+    metadados_alterados = False
     if XML is not None:
         mapa.XML = XML
+        indexar_textos_mapa(db, mapa)
+        if remover_metadados_orfaos(db, mapa.id, XML):
+            marcar_mapas_pendentes(db, Mapa.id == mapa.id)
+            metadados_alterados = True
     
     # Atualiza data_modificacao manualmente (caso onupdate não funcione)
-    mapa.data_modificacao = datetime.datetime.utcnow()
+    mapa.data_modificacao = datetime.utcnow()
+    registrar_evento_mapa(db, mapa, "modificado")
     
     db.commit()
+    invalidar_tabelas("mapas", *(["metadados"] if metadados_alterados else []))
     db.refresh(mapa)
     
     return {
@@ -304,12 +367,12 @@ async def update_mapa(
         }
     }
 @app.patch("/mapas/{mapa_id}/status")
-async def update_mapa_status(
+def update_mapa_status(
     mapa_id: int,
     status: str,
     db: Session = Depends(get_db)
 ):
-    mapa = validate_entity(db, mapa_id, Mapa)
+    mapa = validate_entity(db, mapa_id, Mapa, sem_cache=True)
     
     valid_statuses = ["Concluído", "Em andamento", "Pendente"]
     if status not in valid_statuses:
@@ -318,10 +381,15 @@ async def update_mapa_status(
             detail=f"Status inválido. Use um dos seguintes: {', '.join(valid_statuses)}"
         )
     
+    if status != mapa.status:
+        ajustar_resumo_status(db, mapa.status, -1)
+        ajustar_resumo_status(db, status, 1)
+        registrar_evento_mapa(db, mapa, "status", status_anterior=mapa.status, status_novo=status)
     mapa.status = status
-    mapa.data_modificacao = datetime.datetime.utcnow()
+    mapa.data_modificacao = datetime.utcnow()
     
     db.commit()
+    invalidar_tabelas("mapas")
     db.refresh(mapa)
     
     return {
@@ -349,7 +417,7 @@ class MoveMapaRequest(BaseModel):
     target_processo_id: int
     
 @app.put("/processos/{processo_id}/move")
-async def move_processo(
+def move_processo(
     processo_id: int, 
     data: MoveProcessoRequest,
     db: Session = Depends(get_db)
@@ -427,7 +495,9 @@ async def move_processo(
         processo.id_pai = data.target_processo_id
         processo.ordem = data.ordem
     
+    atualizar_caminhos(db, [processo_id])
     db.commit()
+    invalidar_tabelas("processos", "mapas", "macro_processo_processo")
     db.refresh(processo)
     
     return {
@@ -435,13 +505,14 @@ async def move_processo(
         "processo": {
             "id": processo.id,
             "id_pai": processo.id_pai,
-            "titulo": processo.titulo
+            "titulo": processo.titulo,
+            "caminho": processo.caminho
         }
     }
 
 
 @app.put("/mapas/{mapa_id}/move")
-async def move_mapa(
+def move_mapa(
     mapa_id: int,
     data: MoveMapaRequest,
     db: Session = Depends(get_db)
@@ -451,8 +522,10 @@ async def move_mapa(
     validate_entity(db, data.target_processo_id, Processo)
     
     mapa.id_proc = data.target_processo_id
+    atualizar_caminho_mapa(db, mapa)
     
     db.commit()
+    invalidar_tabelas("mapas")
     db.refresh(mapa)
     
     return {
@@ -460,167 +533,248 @@ async def move_mapa(
         "mapa": {
             "id": mapa.id,
             "id_proc": mapa.id_proc,
-            "titulo": mapa.titulo
+            "titulo": mapa.titulo,
+            "caminho": mapa.caminho
         }
     }
 
 # ...existing code...
+LISTAGEM_MAPAS = Listagem(
+    Mapa, "mapas",
+    ["id", "id_proc", "XML", "titulo", "status", "data_criacao", "data_modificacao", "caminho"],
+    filtros=["id_proc", "status"],
+    formatadores={"caminho": como_lista},
+)
+
 @app.get("/mapas/")
-async def get_mapas(db: Session = Depends(get_db)):
-    mapas = db.query(Mapa).all()
-    return {"mapas": [{
-        "id": mapa.id, 
-        "id_proc": mapa.id_proc, 
-        "XML": mapa.XML, 
-        "titulo": mapa.titulo,
-        "status": mapa.status,
-        "data_criacao": mapa.data_criacao.isoformat() if mapa.data_criacao else None,
-        "data_modificacao": mapa.data_modificacao.isoformat() if mapa.data_modificacao else None
-    } for mapa in mapas]}
-
-@app.get("/mapas/{mapa_id}")
-async def get_mapa(mapa_id: int, db:Session = Depends(get_db)):
-    # mapa = db.query(Mapa).filter(Mapa.id == mapa_id).first
-    mapa = validate_entity(db, mapa_id, Mapa)
+async def get_mapas(
+    id_proc: Optional[int] = None,
+    status: Optional[str] = None,
+    parametros: ParametrosListagem = Depends(),
+    db: AsyncSession = Depends(get_async_db_leitura),
+):
+    # Sem `fields`, o XML de cada mapa vem junto: prefira fields=id,titulo,status,...
+    return await LISTAGEM_MAPAS.listar(db, parametros, id_proc=id_proc, status=status)
+
+@app.get("/mapas/{mapa_id}", response_model=MapaDetalheResponse)
+async def get_mapa(mapa_id: int, db: AsyncSession = Depends(get_async_db_leitura)):
+    mapa = await validate_entity_async(db, mapa_id, Mapa)
     return {"mapa": {
         "id": mapa.id,
         "proc_id": mapa.id_proc,
         "XML": mapa.XML ,
-        "titulo": mapa.titulo
+        "titulo": mapa.titulo,
+        "caminho": mapa.caminho or []
         }}
 
 @app.get("/mapas/xml/{mapa_id}") # Nova rota para retornar apenas o XML
-async def get_mapa_xml(mapa_id: int, db: Session = Depends(get_db)):
-
-    mapa = validate_entity(db, mapa_id, Mapa)
+async def get_mapa_xml(mapa_id: int, db: AsyncSession = Depends(get_async_db_leitura)):
+    # Lê só a coluna XML
+    xml = (await db.execute(select(Mapa.XML).where(Mapa.id == mapa_id))).first()
+    if xml is None:
+        raise HTTPException(status_code=404, detail="Mapa não encontrado.")
     
     # Retorna o conteúdo do campo XML com o tipo de mídia correto
-    return Response(content=mapa.XML, media_type="application/xml")
+    return Response(content=xml.XML, media_type="application/xml")
 
 # Documentos e Areas
 
 @app.get("/documentos/")
-async def get_documentos(db: Session = Depends(get_db)):
+def get_documentos(db: Session = Depends(get_db)):
     #documentos = db.query(Documentos).all() lembra de descomentar quando for usar
    # return {"documentos": [{"id": doc.id, "id_proc": doc.id_proc, "nome_documento": doc.nome_documento, "link": doc.link} for doc in documentos]}
     pass
 
 @app.post("/documentos/")
-async def create_documento(id_proc: int, nome_documento: str, link: str, db: Session = Depends(get_db)):
+def create_documento(id_proc: int, nome_documento: str, link: str, db: Session = Depends(get_db)):
     doc = Documento(id_proc=id_proc, nome_documento=nome_documento, link=link)
     db.add(doc)
     db.commit()
+    invalidar_tabelas("documentos")
     db.refresh(doc)
     return {"message": "Documento criado com sucesso!", "documento": {"id": doc.id, "id_proc": doc.id_proc, "nome_documento": doc.nome_documento, "link": doc.link}}
 
 
+LISTAGEM_AREAS = Listagem(Area, "areas", ["id", "nome_area", "sigla", "tipo"], filtros=["tipo"])
+
 @app.get("/areas/")
-async def get_areas(db: Session = Depends(get_db)):
-    areas = db.query(Area).all()
-    return {"areas": [{"id": area.id, "nome_area": area.nome_area, "sigla": area.sigla, "tipo": area.tipo} for area in areas]}
+async def get_areas(tipo: Optional[str] = None, parametros: ParametrosListagem = Depends(), db: AsyncSession = Depends(get_async_db_leitura)):
+    return await LISTAGEM_AREAS.listar(db, parametros, tipo=tipo)
 
 @app.post("/areas/")
-async def create_area(nome_area: str, sigla: str, tipo: str, db: Session = Depends(get_db)):
+def create_area(nome_area: str, sigla: str, tipo: str, db: Session = Depends(get_db)):
     area = Area(nome_area=nome_area, sigla=sigla, tipo=tipo)
     db.add(area)
     db.commit()
+    invalidar_tabelas("areas")
     db.refresh(area)
     return {"message": "Area criada com sucesso!", "area": {"id": area.id, "nome_area": area.nome_area, "sigla": area.sigla, "tipo": area.tipo}}
 
 @app.delete("/areas/{area_id}")
-async def delete_area(area_id: int, db:Session = Depends(get_db)):
+def delete_area(area_id: int, db:Session = Depends(get_db)):
     area = validate_entity(db, area_id, Area)
     db.delete(area)
     db.commit()
+    invalidar_tabelas("areas")
     return {"message": "Area deletada com sucesso!"}
 
 
 
-class MetadadosOut(BaseModel):
-    id: int
-    nome: str
-    dados: List[str]
-    lgpd: str
-    id_processo: int
-    id_atividade: str
+CAMPOS_METADADOS = ("id", "id_processo", "id_atividade", "nome", "lgpd", "dados")
 
-    class Config:
-        orm_mode = True
 
-@app.get("/todos-metadados/", response_model=dict[str, List[MetadadosOut]])
-async def get_metadados(db: Session = Depends(get_db)):
+def _consulta_metadados(campos, mapa: Optional[int], processo: Optional[int], lgpd: Optional[str], cursor: Optional[int]):
+    """SELECT com as colunas pedidas (id sempre incluso, para o keyset) e filtros, ordenado por id"""
+    colunas = [Metadados.id] + [getattr(Metadados, c) for c in campos if c != "id"]
+    consulta = select(*colunas).order_by(Metadados.id)
+    if mapa is not None:
+        consulta = consulta.where(Metadados.id_processo == mapa)
+    if processo is not None:
+        consulta = consulta.where(Metadados.id_processo.in_(select(Mapa.id).where(Mapa.id_proc == processo)))
+    if lgpd is not None:
+        consulta = consulta.where(Metadados.lgpd == lgpd)
+    if cursor is not None:
+        consulta = consulta.where(Metadados.id > cursor)
+    return consulta
+
+
+def _stream_metadados(consulta, campos, formato: str):
+    # Sessão própria: a requisição termina antes do fim do streaming
+    db = SessionLocal()
+    try:
+        linhas = db.execute(consulta.execution_options(stream_results=True, yield_per=1000))
+        if formato == "csv":
+            buffer = io.StringIO()
+            escritor = csv.writer(buffer)
+            escritor.writerow(campos)
+        for linha in linhas:
+            registro = linha._mapping
+            if formato == "csv":
+                escritor.writerow("; ".join(map(str, registro[c] or [])) if c == "dados" else registro[c] for c in campos)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            else:
+                yield para_json({c: registro[c] for c in campos}) + b"\n"
+        if formato == "csv" and buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        db.close()
+
+
+@app.get("/todos-metadados/")
+def get_metadados(
+    mapa: Optional[int] = None,
+    processo: Optional[int] = None,
+    lgpd: Optional[str] = None,
+    campos: Optional[str] = Query(None, description="Colunas separadas por vírgula (padrão: todas)"),
+    limite: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="proximo_cursor da página anterior"),
+    formato: str = Query("json", description="'json' (paginado), 'ndjson' ou 'csv' (exportação em streaming)"),
+    db: Session = Depends(get_db),
+):
     """
-    Retorna todos os metadados sem duplicação.
+    Lista os metadados com paginação por keyset (id), filtros por mapa, processo
+    e classificação LGPD e seleção de colunas. Em 'ndjson'/'csv' exporta todas as
+    linhas a partir do cursor, lidas com cursor no servidor.
     """
-    metadados = db.query(Metadados).all()
+    selecionados = [c.strip() for c in campos.split(",") if c.strip()] if campos else list(CAMPOS_METADADOS)
+    invalidos = [c for c in selecionados if c not in CAMPOS_METADADOS]
+    if invalidos or not selecionados:
+        raise HTTPException(status_code=400, detail=f"Campos inválidos. Use: {', '.join(CAMPOS_METADADOS)}")
+    if formato not in ("json", "ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Formato inválido. Use 'json', 'ndjson' ou 'csv'.")
+
+    consulta = _consulta_metadados(selecionados, mapa, processo, lgpd, cursor)
+    if formato != "json":
+        media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+        return StreamingResponse(_stream_metadados(consulta, selecionados, formato), media_type=media_type)
+
+    linhas = db.execute(consulta.limit(limite + 1)).all()
+    pagina = linhas[:limite]
     return {
-        "metadados": [
-            {
-                "id": meta.id,
-                "nome": meta.nome,
-                "dados": meta.dados,
-                "lgpd": meta.lgpd,
-                "id_processo": meta.id_processo,
-                "id_atividade": meta.id_atividade
-            } 
-            for meta in metadados
-        ]
+        "metadados": [{c: linha._mapping[c] for c in selecionados} for linha in pagina],
+        "proximo_cursor": pagina[-1].id if len(linhas) > limite else None,
     }
 # Adicione após o endpoint @app.get("/mapas/xml/{mapa_id}")
 
 @app.delete("/mapas/{mapa_id}")
-async def delete_mapa(mapa_id: int, db: Session = Depends(get_db)):
+def delete_mapa(mapa_id: int, db: Session = Depends(get_db)):
     mapa = validate_entity(db, mapa_id, Mapa)
-    
-    # Opcional: deletar metadados associados ao mapa
-    db.query(Metadados).filter(Metadados.id_processo == mapa_id).delete()
-    
-    db.delete(mapa)
+    # Metadados e textos indexados saem com o mapa, na purga da lixeira
+    excluido_em = excluir_mapa(db, mapa)
     db.commit()
-    return {"message": "Mapa deletado com sucesso!"}
+    invalidar_tabelas("mapas", "metadados")
+    return {"message": "Mapa deletado com sucesso!", "restaurar_ate": restaurar_ate(excluido_em)}
 
 
-@app.get("/metadados/buscar/")
+@app.get("/metadados/buscar/", response_model=BuscaMetadadosResponse)
 async def buscar_metadados(
     termo: str,
-    db: Session = Depends(get_db)
+    limite: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="proximo_cursor da página anterior"),
+    db: AsyncSession = Depends(get_async_db_leitura),
 ):
     """
     Busca metadados por termo em dados, LGPD ou nome.
-    Retorna também o nome do mapa e do processo associado.
+    Retorna também o nome do mapa e do processo associado, em uma única query.
     """
-    metadados = db.query(Metadados).filter(
-        (Metadados.dados.cast(String).ilike(f"%{termo}%")) |
-        (Metadados.lgpd.ilike(f"%{termo}%")) |
-        (Metadados.nome.ilike(f"%{termo}%"))
-    ).all()
-    
-    result = []
-    for meta in metadados:
-        # Buscar o mapa associado
-        mapa = db.query(Mapa).filter(Mapa.id == meta.id_processo).first()
-        
-        # Buscar o processo associado ao mapa
-        processo_nome = None
-        mapa_titulo = None
-        if mapa:
-            mapa_titulo = mapa.titulo
-            processo = db.query(Processo).filter(Processo.id == mapa.id_proc).first()
-            if processo:
-                processo_nome = processo.titulo
-        
-        result.append({
-            "id": meta.id,
-            "nome": meta.nome,
-            "dados": meta.dados,
-            "lgpd": meta.lgpd,
-            "id_processo": meta.id_processo,  # ID do Mapa
-            "id_atividade": meta.id_atividade,
-            "mapa_titulo": mapa_titulo,
-            "processo_nome": processo_nome
-        })
-    
-    return {"metadados": result}
+    chave = chave_busca("metadados-buscar", [termo], ["metadados", "mapas", "processos"], limite=limite, cursor=cursor)
+    em_cache = CACHE_BUSCA.get(chave)
+    if em_cache is not None:
+        return em_cache
+
+    padrao = f"%{termo}%"
+    consulta = (
+        select(
+            Metadados.id, Metadados.nome, Metadados.dados, Metadados.lgpd,
+            Metadados.id_processo,  # ID do Mapa
+            Metadados.id_atividade,
+            Mapa.titulo.label("mapa_titulo"),
+            Processo.titulo.label("processo_nome"),
+        )
+        .select_from(Metadados)
+        .outerjoin(Mapa, Mapa.id == Metadados.id_processo)
+        .outerjoin(Processo, Processo.id == Mapa.id_proc)
+        .where(or_(
+            DADOS_TEXTO.element.ilike(padrao),
+            Metadados.lgpd.ilike(padrao),
+            Metadados.nome.ilike(padrao),
+        ))
+        .order_by(Metadados.id)
+        .limit(limite + 1)
+    )
+    if cursor is not None:
+        consulta = consulta.where(Metadados.id > cursor)
+
+    linhas = (await db.execute(consulta)).all()
+    pagina = linhas[:limite]
+    resposta = {
+        "metadados": [dict(linha._mapping) for linha in pagina],
+        "proximo_cursor": pagina[-1].id if len(linhas) > limite else None,
+    }
+    guardar_busca(db, chave, resposta)
+    return resposta
+
+def _upsert_metadados(linhas, somente_alterados: bool = False):
+    """
+    INSERT ... ON CONFLICT na chave (id_processo, id_atividade, nome).
+    Com `somente_alterados`, linhas idênticas não são regravadas (e não retornam).
+    A coluna `criado` indica se a linha foi inserida (xmax = 0) ou atualizada.
+    """
+    stmt = insert(Metadados).values(linhas)
+    alterado = None
+    if somente_alterados:
+        alterado = or_(
+            Metadados.lgpd.is_distinct_from(stmt.excluded.lgpd),
+            cast(Metadados.dados, Text).is_distinct_from(cast(stmt.excluded.dados, Text)),
+        )
+    return stmt.on_conflict_do_update(
+        constraint="uq_metadados_atividade",
+        set_={"lgpd": stmt.excluded.lgpd, "dados": stmt.excluded.dados},
+        where=alterado,
+    ).returning(*Metadados.__table__.c, literal_column("xmax = 0").label("criado"))
+
 
 @app.post("/metadados/", response_model=MetadadosResponse)
 def create_or_update_metadados(
@@ -629,89 +783,53 @@ def create_or_update_metadados(
 ):
     """
     Cria ou atualiza os metadados de uma atividade específica de um processo.
-    Versão com logs detalhados para depuração.
     """
-    print("\n--- INICIANDO REQUISIÇÃO PARA /metadados/ ---")
-    print(f"Recebido: id_processo={metadados.id_processo}, id_atividade='{metadados.id_atividade}', nome='{metadados.nome}'")
-
-    # Tenta encontrar o objeto existente com base na chave única
     try:
-        existing_metadata = db.query(Metadados).filter(
-            Metadados.id_processo == metadados.id_processo,
-            Metadados.id_atividade == metadados.id_atividade,
-            Metadados.nome == metadados.nome
-        ).one_or_none() # Usar one_or_none() é mais explícito que .first()
-
-        if existing_metadata:
-            # Se encontrou, entra no modo de ATUALIZAÇÃO
-            print(f"--> ENCONTRADO registro existente com ID: {existing_metadata.id}. ATUALIZANDO.")
-            existing_metadata.lgpd = metadados.lgpd
-            existing_metadata.dados = metadados.dados
-            db_metadados_final = existing_metadata
-            
-        else:
-            # Se NÃO encontrou, entra no modo de CRIAÇÃO
-            print("--> NÃO ENCONTRADO registro existente. CRIANDO NOVO.")
-            db_metadados_novo = Metadados(**metadados.dict())
-            db.add(db_metadados_novo)
-            db_metadados_final = db_metadados_novo
-
-        # Salva as alterações (seja criação ou atualização)
+        registro = db.execute(_upsert_metadados(metadados.dict())).one()
+        marcar_mapas_pendentes(db, Mapa.id == metadados.id_processo)
         db.commit()
-        # Refresh para obter o estado final do objeto do banco de dados
-        db.refresh(db_metadados_final)
-        
-        print(f"Operação concluída. ID final do registro: {db_metadados_final.id}")
-        print("--- FIM DA REQUISIÇÃO ---\n")
-        
-        return db_metadados_final
-
+        invalidar_tabelas("metadados")
+        return registro
     except Exception as e:
-        print(f"!!!!!! OCORREU UM ERRO INESPERADO: {e} !!!!!!")
+        print(f"Erro ao salvar metadados: {e}")
         db.rollback() # Desfaz a transação em caso de erro
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/metadados/lote/", response_model=MetadadosLoteResponse)
+def upsert_metadados_lote(lote: MetadadosLote, db: Session = Depends(get_db)):
+    """
+    Grava todos os metadados de um mapa com um único INSERT ... ON CONFLICT,
+    em uma transação. Itens repetidos no lote valem pela última ocorrência.
+    """
+    linhas = {}
+    for item in lote.metadados:
+        linhas[(item.id_atividade, item.nome)] = {"id_processo": lote.id_processo, **item.dict()}
+    if not linhas:
+        return {"criados": 0, "atualizados": 0, "inalterados": 0}
+
+    try:
+        gravados = db.execute(_upsert_metadados(list(linhas.values()), somente_alterados=True)).all()
+        if gravados:
+            marcar_mapas_pendentes(db, Mapa.id == lote.id_processo)
+        db.commit()
+    except Exception as e:
+        print(f"Erro ao salvar metadados em lote: {e}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if gravados:
+        invalidar_tabelas("metadados")
+    criados = sum(1 for linha in gravados if linha.criado)
+    return {
+        "criados": criados,
+        "atualizados": len(gravados) - criados,
+        "inalterados": len(linhas) - len(gravados),
+    }
 
-    @app.put("/metadados/{metadado_id}")
-    async def update_metadados(metadado_id: int, nome: str = None, lgpd: str = None, dados: dict = None, db: Session = Depends(get_db)):
-        metadado = db.query(Metadados).filter(Metadados.id == metadado_id).first()
-        
-        if not metadado:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metadado não encontrado.")
-        
-        updated = False
-        if nome is not None:
-            metadado.nome = nome
-            updated = True
-        if lgpd is not None:
-            metadado.lgpd = lgpd
-            updated = True
-        if dados is not None:
-            metadado.dados = dados
-            updated = True
-
-        if updated:
-            db.commit()
-            db.refresh(metadado)
-
-        return {
-            "metadados": [
-                {
-                    "id": meta.id,
-                    "nome": meta.nome,
-                    "dados": meta.dados,
-                    "lgpd": meta.lgpd,
-                    "id_processo": meta.id_processo,
-                    "id_atividade": meta.id_atividade
-                }
-                for meta in metadados
-            ]
-        }
-    
 
 @app.put("/metadados/{metadado_id}")
-async def update_metadados(metadado_id: int, nome: str = None, lgpd: str = None, dados: dict = None, db: Session = Depends(get_db)):
+def update_metadados(metadado_id: int, nome: str = None, lgpd: str = None, dados: dict = None, db: Session = Depends(get_db)):
     metadado = db.query(Metadados).filter(Metadados.id == metadado_id).first()
     
     if not metadado:
@@ -729,7 +847,9 @@ async def update_metadados(metadado_id: int, nome: str = None, lgpd: str = None,
         updated = True
 
     if updated:
+        marcar_mapas_pendentes(db, Mapa.id == metadado.id_processo)
         db.commit()
+        invalidar_tabelas("metadados")
         db.refresh(metadado)
 
     return {
@@ -744,12 +864,6 @@ async def update_metadados(metadado_id: int, nome: str = None, lgpd: str = None,
         }
     }
 
-@app.get("/todos-metadados/")
-async def get_metadados( db: Session = Depends(get_db)):
-    metadados = db.query(Metadados).all()
-
-    return {"metadados": [metadados for meta in metadados]}
-
 # New endpoints for MacroProcesso
 #@app.post("/macroprocessos/")
 #async def create_macroprocesso(titulo: str, data_publicacao: str = None, db: Session = Depends(get_db)):
@@ -761,50 +875,49 @@ async def get_metadados( db: Session = Depends(get_db)):
 #    db.refresh(macro)
 #    return {"message": "MacroProcesso criado com sucesso!", "macroprocesso": {"id": macro.id, "titulo": macro.titulo, "data_publicacao": macro.data_publicacao}}
 
+LISTAGEM_MACROPROCESSOS = Listagem(MacroProcesso, "macroprocessos", ["id", "titulo", "data_publicacao", "data_criacao"])
+
 @app.get("/macroprocessos/")
-async def get_macroprocessos(db: Session = Depends(get_db)):
-    macros = db.query(MacroProcesso).all()
-    return {"macroprocessos": [{"id": m.id, "titulo": m.titulo, "data_publicacao": m.data_publicacao, "data_criacao": m.data_criacao} for m in macros]}
+async def get_macroprocessos(parametros: ParametrosListagem = Depends(), db: AsyncSession = Depends(get_async_db_leitura)):
+    return await LISTAGEM_MACROPROCESSOS.listar(db, parametros)
 
 @app.get("/macroprocessos/{macro_id}")
-async def get_macroprocesso(macro_id: int, db: Session = Depends(get_db)):
-    macro = validate_entity(db, macro_id, MacroProcesso)
+async def get_macroprocesso(macro_id: int, db: AsyncSession = Depends(get_async_db_leitura)):
+    macro = await validate_entity_async(db, macro_id, MacroProcesso)
     return {"macroprocesso": {"id": macro.id, "titulo": macro.titulo, "data_publicacao": macro.data_publicacao}}
 
 
 @app.delete("/macroprocessos/{macro_id}")
-async def delete_macroprocesso(macro_id: int, db: Session = Depends(get_db)):
+def delete_macroprocesso(macro_id: int, db: Session = Depends(get_db)):
     macro = validate_entity(db, macro_id, MacroProcesso)
-    
-    # Deletar associações com processos primeiro
-    db.query(MacroProcessoProcesso).filter(
-        MacroProcessoProcesso.macro_processo_id == macro_id
-    ).delete()
-    
-    db.delete(macro)
+    excluido_em = excluir_macroprocesso(db, macro)
     db.commit()
-    return {"message": "MacroProcesso deletado com sucesso!"}
+    invalidar_tabelas("macro_processos", "macro_processo_processo", "processos", "mapas")
+    return {"message": "MacroProcesso deletado com sucesso!", "restaurar_ate": restaurar_ate(excluido_em)}
 
 
 @app.put("/macroprocessos/{macro_id}")
-async def update_macroprocesso(macro_id: int, titulo: str = None, data_publicacao: str = None, db: Session = Depends(get_db)):
+def update_macroprocesso(macro_id: int, titulo: str = None, data_publicacao: str = None, db: Session = Depends(get_db)):
     macro = validate_entity(db, macro_id, MacroProcesso)
     if titulo is not None:
         macro.titulo = titulo
     if data_publicacao is not None:
         macro.data_publicacao = data_publicacao
+    if titulo is not None:
+        atualizar_caminhos_macro(db, macro_id)
     db.commit()
+    invalidar_tabelas("macro_processos", "processos", "mapas")
     db.refresh(macro)
     return {"message": "MacroProcesso atualizado com sucesso!", "macroprocesso": {"id": macro.id, "titulo": macro.titulo, "data_publicacao": macro.data_publicacao}}
 
 # Endpoints for associations (MacroProcessoProcesso)
 @app.post("/macroprocesso_processos/")
-async def create_association(
+def create_association(
     data: MacroProcessoProcessoCreate,
     db: Session = Depends(get_db)
 ):
     validate_entity(db, data.macro_processo_id, MacroProcesso)
-    proc = validate_entity(db, data.processo_id, Processo)
+    proc = validate_entity(db, data.processo_id, Processo, sem_cache=True)
 
     if proc.id_pai is not None:
         raise HTTPException(
@@ -819,7 +932,9 @@ async def create_association(
     )
 
     db.add(assoc)
+    atualizar_caminhos(db, [proc.id])
     db.commit()
+    invalidar_tabelas("macro_processo_processo", "processos", "mapas")
     db.refresh(assoc)
 
     return {
@@ -834,35 +949,66 @@ async def create_association(
 
 
 @app.get("/macroprocessos/{macro_id}/processos/")
-async def get_macro_processos(macro_id: int, db: Session = Depends(get_db)):
-    validate_entity(db, macro_id, MacroProcesso)
-    assocs = db.query(MacroProcessoProcesso).filter(MacroProcessoProcesso.macro_processo_id == macro_id).all()
+async def get_macro_processos(macro_id: int, db: AsyncSession = Depends(get_async_db_leitura)):
+    await validate_entity_async(db, macro_id, MacroProcesso)
+    assocs = (await db.scalars(select(MacroProcessoProcesso).where(MacroProcessoProcesso.macro_processo_id == macro_id))).all()
     if not assocs:
         return {"processos": []}
     processo_ids = [a.processo_id for a in assocs]
-    processos = db.query(Processo).filter(Processo.id.in_(processo_ids)).all()
+    processos = (await db.scalars(select(Processo).where(Processo.id.in_(processo_ids)))).all()
     assoc_map = {a.processo_id: a.ordem for a in assocs}
     processos_sorted = sorted(processos, key=lambda p: assoc_map.get(p.id, 0))
-    return {"processos": [{"id": p.id, "id_pai": p.id_pai, "id_area": p.id_area, "ordem": p.ordem, "titulo": p.titulo, "data_publicacao": p.data_publicacao, "data_criacao": p.data_criacao} for p in processos_sorted]}
+    return {"processos": [{"id": p.id, "id_pai": p.id_pai, "id_area": p.id_area, "ordem": p.ordem, "titulo": p.titulo, "data_publicacao": p.data_publicacao, "data_criacao": p.data_criacao, "caminho": p.caminho or []} for p in processos_sorted]}
 
 
+LISTAGEM_ASSOCIACOES = Listagem(
+    MacroProcessoProcesso, "associacoes",
+    ["id", "macro_processo_id", "processo_id", "ordem"],
+    filtros=["macro_processo_id", "processo_id"],
+)
+
 @app.get("/macroprocesso_processos/")
-async def get_associations(db: Session = Depends(get_db)):
-    assocs = db.query(MacroProcessoProcesso).all()
-    return {"associacoes": [{"id": a.id, "macro_processo_id": a.macro_processo_id, "processo_id": a.processo_id, "ordem": a.ordem} for a in assocs]}
+async def get_associations(
+    macro_processo_id: Optional[int] = None,
+    processo_id: Optional[int] = None,
+    parametros: ParametrosListagem = Depends(),
+    db: AsyncSession = Depends(get_async_db_leitura),
+):
+    return await LISTAGEM_ASSOCIACOES.listar(db, parametros, macro_processo_id=macro_processo_id, processo_id=processo_id)
 
 # Add endpoint to get mapa for a specific processo
 @app.get("/processos/{processo_id}/mapa")
-async def get_processo_mapa(processo_id: int, db: Session = Depends(get_db)):
-    mapa = db.query(Mapa).filter(Mapa.id_proc == processo_id).first()
+async def get_processo_mapa(processo_id: int, db: AsyncSession = Depends(get_async_db_leitura)):
+    mapa = (await db.scalars(select(Mapa).where(Mapa.id_proc == processo_id).limit(1))).first()
     if not mapa:
         return {"mapa": None}
     return {"mapa": {"id": mapa.id, "id_proc": mapa.id_proc, "XML": mapa.XML, "titulo": mapa.titulo}}
 
 # New endpoint for full hierarchy
-@app.get("/hierarchy/")
-async def get_hierarchy(db: Session = Depends(get_db)):
-    macros = db.query(MacroProcesso).all()
+@app.get("/hierarchy/", response_model=HierarquiaResponse)
+async def get_hierarchy(db: AsyncSession = Depends(get_async_db_leitura)):
+    # Quatro consultas e a árvore montada em memória (antes: consultas por nó)
+    macros = (await db.execute(select(MacroProcesso.id, MacroProcesso.titulo))).all()
+    assocs = (await db.execute(
+        select(MacroProcessoProcesso.macro_processo_id, MacroProcessoProcesso.processo_id)
+        .order_by(MacroProcessoProcesso.ordem)
+    )).all()
+    processos = (await db.execute(
+        select(Processo.id, Processo.id_pai, Processo.titulo, Processo.data_criacao).order_by(Processo.ordem)
+    )).all()
+    mapas = (await db.execute(select(Mapa.id, Mapa.id_proc, Mapa.titulo).order_by(Mapa.id))).all()
+
+    por_id = {proc.id: proc for proc in processos}
+    processos_por_macro: Dict[int, list] = {}
+    for assoc in assocs:
+        processos_por_macro.setdefault(assoc.macro_processo_id, []).append(assoc.processo_id)
+    filhos: Dict[int, list] = {}
+    for proc in processos:
+        filhos.setdefault(proc.id_pai, []).append(proc)
+    mapas_por_proc: Dict[int, list] = {}
+    for mapa in mapas:
+        mapas_por_proc.setdefault(mapa.id_proc, []).append(mapa)
+
     result = []
     for macro in macros:
         macro_dict = {
@@ -871,51 +1017,43 @@ async def get_hierarchy(db: Session = Depends(get_db)):
             "type": "macro",
             "children": []
         }
-        assocs = db.query(MacroProcessoProcesso).filter(
-            MacroProcessoProcesso.macro_processo_id == macro.id
-        ).order_by(MacroProcessoProcesso.ordem).all()
-        for assoc in assocs:
-            proc = db.query(Processo).filter(Processo.id == assoc.processo_id).first()
-            if proc:
-                proc_node = build_proc_dict(proc, db)
-                macro_dict["children"].append(proc_node)
+        for processo_id in processos_por_macro.get(macro.id, []):
+            if processo_id in por_id:
+                macro_dict["children"].append(build_proc_dict(por_id[processo_id], filhos, mapas_por_proc))
         result.append(macro_dict)
     return {"hierarchy": result}
 
-def build_proc_dict(proc: Processo, db: Session):
-    children = db.query(Processo).filter(
-        Processo.id_pai == proc.id
-    ).order_by(Processo.ordem).all()
-    mapas = db.query(Mapa).filter(Mapa.id_proc == proc.id).all()
+def build_proc_dict(proc, filhos: Dict[int, list], mapas_por_proc: Dict[int, list]):
     proc_dict = {
         "id": proc.id,
         "titulo": proc.titulo,
         "type": "process",
-        "data_criacao": proc.data_criacao.isoformat() if proc.data_criacao else None,
+        "data_criacao": proc.data_criacao,
         "children": []
     }
-    for child in children:
-        child_dict = build_proc_dict(child, db)
+    for child in filhos.get(proc.id, []):
+        child_dict = build_proc_dict(child, filhos, mapas_por_proc)
         proc_dict["children"].append(child_dict)
-    for mapa in mapas:
+    for mapa in mapas_por_proc.get(proc.id, []):
         map_node = {
             "id": mapa.id,
             "titulo": mapa.titulo,
             "type": "map",
             "proc_id": proc.id,
-            "data_criacao": proc.data_criacao.isoformat() if proc.data_criacao else None,
+            "data_criacao": proc.data_criacao,
         }
         proc_dict["children"].append(map_node)
     return proc_dict
 
 from .schemas import MacroCreate
 @app.post("/macroprocessos/")
-async def create_macroprocesso(macro: MacroCreate, db: Session = Depends(get_db)):
+def create_macroprocesso(macro: MacroCreate, db: Session = Depends(get_db)):
     if not macro.titulo.strip():
         raise HTTPException(status_code=400, detail="O título não pode ser vazio.")
     new_macro = MacroProcesso(titulo=macro.titulo.strip(), data_publicacao=macro.data_publicacao)
     db.add(new_macro)
     db.commit()
+    invalidar_tabelas("macro_processos")
     db.refresh(new_macro)
     return {"message": "MacroProcesso criado com sucesso!", "macroprocesso": {"id": new_macro.id, "titulo": new_macro.titulo, "data_publicacao": new_macro.data_publicacao}}
     
\ No newline at end of file
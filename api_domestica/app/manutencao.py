@@ -0,0 +1,96 @@
+import threading
+from datetime import datetime
+from typing import Any, Dict
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from sqlalchemy import select
+
+from .bpmn import remover_metadados_orfaos
+from .cache import invalidar_tabelas
+from .database import SessionLocal, Mapa, Metadados
+from .relatorios import marcar_mapas_pendentes
+
+router = APIRouter(prefix="/manutencao", tags=["Manutenção"])
+
+TAMANHO_LOTE = 100
+
+_job_lock = threading.Lock()
+ESTADO_ORFAOS: Dict[str, Any] = {
+    "executando": False,
+    "inicio": None,
+    "fim": None,
+    "mapas_verificados": 0,
+    "removidos_sem_mapa": 0,
+    "removidos_atividade_inexistente": 0,
+    "erro": None,
+}
+
+
+def reconciliar_metadados_orfaos():
+    """
+    Job em segundo plano: remove metadados de mapas que não existem mais e,
+    mapa a mapa (em lotes, com commit por lote), metadados de atividades que
+    não aparecem no XML salvo.
+    """
+    if not _job_lock.acquire(blocking=False):
+        return
+    ESTADO_ORFAOS.update(
+        executando=True, inicio=datetime.utcnow().isoformat(), fim=None, mapas_verificados=0,
+        removidos_sem_mapa=0, removidos_atividade_inexistente=0, erro=None,
+    )
+    db = SessionLocal()
+    # Mapas na lixeira ainda existem: seus metadados só saem na purga
+    db.info["incluir_excluidos"] = True
+    try:
+        ESTADO_ORFAOS["removidos_sem_mapa"] = db.query(Metadados).filter(
+            Metadados.id_processo.notin_(select(Mapa.id))
+        ).delete(synchronize_session=False)
+        db.commit()
+
+        com_metadados = select(Metadados.id_processo).distinct()
+        ultimo_id = 0
+        while True:
+            lote = db.query(Mapa.id, Mapa.XML).filter(
+                Mapa.id > ultimo_id, Mapa.id.in_(com_metadados)
+            ).order_by(Mapa.id).limit(TAMANHO_LOTE).all()
+            if not lote:
+                break
+            alterados, removidos = [], 0
+            for mapa_id, xml in lote:
+                total = remover_metadados_orfaos(db, mapa_id, xml)
+                if total:
+                    alterados.append(mapa_id)
+                    removidos += total
+            if alterados:
+                marcar_mapas_pendentes(db, Mapa.id.in_(alterados))
+            db.commit()
+            ultimo_id = lote[-1].id
+            ESTADO_ORFAOS["mapas_verificados"] += len(lote)
+            ESTADO_ORFAOS["removidos_atividade_inexistente"] += removidos
+    except Exception as e:
+        db.rollback()
+        print(f"Erro na reconciliação de metadados: {e}")
+        ESTADO_ORFAOS["erro"] = str(e)
+    finally:
+        db.close()
+        invalidar_tabelas("metadados")
+        ESTADO_ORFAOS.update(executando=False, fim=datetime.utcnow().isoformat())
+        _job_lock.release()
+
+
+@router.post("/metadados-orfaos")
+async def agendar_reconciliacao(background_tasks: BackgroundTasks):
+    """Agenda a remoção de metadados órfãos já existentes no banco"""
+    if ESTADO_ORFAOS["executando"]:
+        raise HTTPException(status_code=409, detail="A reconciliação já está em andamento.")
+    background_tasks.add_task(reconciliar_metadados_orfaos)
+    return {"message": "Reconciliação de metadados agendada."}
+
+
+@router.get("/metadados-orfaos")
+async def status_reconciliacao():
+    """Estado da última reconciliação e quantas linhas foram removidas"""
+    return {
+        **ESTADO_ORFAOS,
+        "total_removidos": ESTADO_ORFAOS["removidos_sem_mapa"] + ESTADO_ORFAOS["removidos_atividade_inexistente"],
+    }
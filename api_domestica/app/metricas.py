@@ -0,0 +1,128 @@
+import threading
+import time
+from typing import Any, Dict
+
+from fastapi import APIRouter
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+router = APIRouter(prefix="/metricas", tags=["Métricas"])
+
+SEM_ROTA = "(fora de requisição)"
+
+_lock = threading.Lock()
+_esperas: Dict[str, Dict[str, float]] = {}  # por pool
+_rotas: Dict[str, Dict[str, float]] = {}  # tempo de retenção de conexão por rota
+_pools: Dict[str, Any] = {}
+
+
+def _acumular(destino: Dict[str, Dict[str, float]], chave: str, segundos: float, **extras: float):
+    with _lock:
+        item = destino.setdefault(chave, {"total": 0, "segundos": 0.0, "max_segundos": 0.0, "timeouts": 0})
+        item["total"] += 1
+        item["segundos"] += segundos
+        item["max_segundos"] = max(item["max_segundos"], segundos)
+        for campo, valor in extras.items():
+            item[campo] += valor
+
+
+class _MedirEspera:
+    """Mede quanto tempo cada checkout espera por uma conexão livre no pool"""
+    nome_metricas = "pool"
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except PoolTimeoutError:
+            _acumular(_esperas, self.nome_metricas, time.perf_counter() - inicio, timeouts=1)
+            raise
+        _acumular(_esperas, self.nome_metricas, time.perf_counter() - inicio)
+        return conexao
+
+
+class PoolMedido(_MedirEspera, QueuePool):
+    pass
+
+
+class PoolAsyncMedido(_MedirEspera, AsyncAdaptedQueuePool):
+    pass
+
+
+def registrar_engine(nome: str, engine, max_overflow: int) -> None:
+    """Liga as métricas de espera e de retenção de conexões ao pool do engine"""
+    pool = engine.pool
+    pool.nome_metricas = nome
+    # O pool não expõe o limite de overflow; vem da configuração (DB_MAX_OVERFLOW)
+    pool.max_overflow_metricas = max_overflow
+    _pools[nome] = pool
+
+    @event.listens_for(pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["inicio_checkout"] = time.perf_counter()
+        connection_record.info["rota"] = SEM_ROTA
+
+    @event.listens_for(pool, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        inicio = connection_record.info.pop("inicio_checkout", None)
+        if inicio is not None:
+            _acumular(_rotas, connection_record.info.pop("rota", SEM_ROTA), time.perf_counter() - inicio)
+
+
+@event.listens_for(Session, "after_begin")
+def _marcar_rota(session, transaction, connection):
+    # get_db/get_async_db guardam a rota em session.info; a conexão herda o rótulo
+    rota = session.info.get("rota")
+    if rota:
+        connection.connection.info["rota"] = rota
+
+
+def _resumo(item: Dict[str, float]) -> Dict[str, Any]:
+    return {
+        "total": item["total"],
+        "tempo_total_ms": round(item["segundos"] * 1000, 2),
+        "tempo_medio_ms": round(item["segundos"] * 1000 / item["total"], 2) if item["total"] else 0.0,
+        "tempo_max_ms": round(item["max_segundos"] * 1000, 2),
+    }
+
+
+@router.get("/banco")
+async def metricas_banco():
+    """
+    Estado dos pools (conexões em uso, ociosas e overflow), tempo de espera por
+    conexão e tempo médio que cada rota mantém uma conexão do pool.
+    """
+    with _lock:
+        esperas = {nome: dict(item) for nome, item in _esperas.items()}
+        rotas = {rota: dict(item) for rota, item in _rotas.items()}
+
+    pools = {}
+    for nome, pool in _pools.items():
+        espera = esperas.get(nome, {"total": 0, "segundos": 0.0, "max_segundos": 0.0, "timeouts": 0})
+        pools[nome] = {
+            "tamanho": pool.size(),
+            "em_uso": pool.checkedout(),
+            "ociosas": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool.max_overflow_metricas,
+            "timeout_segundos": pool.timeout(),
+            "esperas": {**_resumo(espera), "timeouts": espera["timeouts"]},
+        }
+
+    return {
+        "pools": pools,
+        "rotas": dict(sorted(
+            ((rota, _resumo(item)) for rota, item in rotas.items()),
+            key=lambda par: par[1]["tempo_total_ms"],
+            reverse=True,
+        )),
+    }
+
+
+@router.get("/cache-entidades")
+async def metricas_cache_entidades():
+    """Taxa de acerto do cache de validate_entity (SELECTs evitados = acertos)"""
+    from .utils import CACHE_ENTIDADES
+    return CACHE_ENTIDADES.estatisticas()
@@ -0,0 +1,160 @@
+"""
+Migrações versionadas do esquema.
+
+Cada migração é uma função idempotente que recebe a conexão; as pendentes são
+aplicadas em ordem, uma transação por migração, e registradas em schema_versao.
+Rodam fora da API, antes do uvicorn:
+
+    python -m app.migracoes
+
+O startup da API só confere a versão (verificar_versao), sem DDL.
+Para mudar o esquema: altere o modelo em database.py e acrescente uma migração
+ao fim de MIGRACOES (nunca edite uma que já foi aplicada).
+"""
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .breadcrumbs import reconstruir_caminhos
+from .dashboard import reconstruir_resumo_status
+from .database import Base, CRIAR_EXTENSAO_TRGM, SchemaVersao, engine
+
+# Chave do advisory lock: só um processo migra por vez
+CHAVE_LOCK = 7_305_001
+
+
+def _criar_indices(conn: Connection, tabela: str, *nomes: str) -> None:
+    """Cria (se não existirem) índices declarados nos modelos"""
+    indices = {ix.name: ix for ix in Base.metadata.tables[tabela].indexes}
+    for nome in nomes:
+        indices[nome].create(conn, checkfirst=True)
+
+
+def _esquema_base(conn: Connection) -> None:
+    # Em banco novo cria tudo no estado atual; em banco existente só as tabelas que faltam
+    Base.metadata.create_all(conn)
+
+
+def _trigramas(conn: Connection) -> None:
+    conn.execute(CRIAR_EXTENSAO_TRGM)
+    _criar_indices(conn, "metadados", "ix_metadados_nome_trgm", "ix_metadados_lgpd_trgm", "ix_metadados_dados_trgm")
+
+
+def _exclusao_logica(conn: Connection) -> None:
+    for tabela in ("processos", "mapas", "macro_processos"):
+        conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS excluido_em TIMESTAMP WITHOUT TIME ZONE"))
+    _criar_indices(conn, "processos", "ix_processos_pai_ativos", "ix_processos_excluidos")
+    _criar_indices(conn, "mapas", "ix_mapas_proc_ativos", "ix_mapas_excluidos")
+    _criar_indices(conn, "macro_processos", "ix_macro_processos_excluidos")
+
+
+def _indices_chaves_estrangeiras(conn: Connection) -> None:
+    # metadados.id_processo já é o início de uq_metadados_atividade
+    _criar_indices(conn, "processos", "ix_processos_id_pai")
+    _criar_indices(conn, "mapas", "ix_mapas_id_proc")
+    _criar_indices(conn, "documentos", "ix_documentos_id_proc")
+    _criar_indices(
+        conn, "macro_processo_processo",
+        "ix_macro_processo_processo_macro_processo_id", "ix_macro_processo_processo_processo_id",
+    )
+
+
+def _caminhos_e_data_modificacao(conn: Connection) -> None:
+    for tabela in ("processos", "mapas"):
+        conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS caminho JSON"))
+    _criar_indices(conn, "mapas", "ix_mapas_data_modificacao")
+
+
+def _metadados_unicos(conn: Connection) -> None:
+    """Base do upsert de metadados: uma linha por (mapa, atividade, nome), mantendo a mais recente"""
+    if "uq_metadados_atividade" in {u["name"] for u in inspect(conn).get_unique_constraints("metadados")}:
+        return
+    duplicados = """
+        FROM metadados m, metadados d
+        WHERE m.id_processo = d.id_processo AND m.id_atividade = d.id_atividade
+          AND m.nome = d.nome AND m.id < d.id
+    """
+    # O relatório LGPD desses mapas precisa ser recalculado
+    conn.execute(text(f"""
+        INSERT INTO lgpd_mapas_pendentes (id_mapa, marcado_em)
+        SELECT DISTINCT m.id_processo, now() {duplicados}
+        ON CONFLICT (id_mapa) DO UPDATE SET marcado_em = excluded.marcado_em
+    """))
+    conn.execute(text(f"DELETE FROM metadados WHERE id IN (SELECT m.id {duplicados})"))
+    conn.execute(text(
+        "ALTER TABLE metadados ADD CONSTRAINT uq_metadados_atividade UNIQUE (id_processo, id_atividade, nome)"
+    ))
+
+
+def _preencher_derivados(conn: Connection) -> None:
+    """Breadcrumbs e resumo de status (antes recalculados a cada startup)"""
+    with Session(bind=conn) as db:
+        reconstruir_caminhos(db)
+        reconstruir_resumo_status(db)
+        db.flush()
+
+
+MIGRACOES: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Esquema base", _esquema_base),
+    (2, "Extensão pg_trgm e índices de trigramas em metadados", _trigramas),
+    (3, "Exclusão lógica (excluido_em) e índices parciais", _exclusao_logica),
+    (4, "Índices das chaves estrangeiras", _indices_chaves_estrangeiras),
+    (5, "Colunas de breadcrumb (caminho) e índice de mapas.data_modificacao", _caminhos_e_data_modificacao),
+    (6, "Metadados únicos por (mapa, atividade, nome)", _metadados_unicos),
+    (7, "Preenche breadcrumbs e resumo de status dos mapas", _preencher_derivados),
+]
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+
+def versao_do_banco(conn: Connection) -> Optional[int]:
+    if not inspect(conn).has_table(SchemaVersao.__tablename__):
+        return None
+    return conn.scalar(select(func.max(SchemaVersao.versao)))
+
+
+def migrar(bind: Optional[Engine] = None) -> List[int]:
+    """Aplica as migrações pendentes e devolve as versões aplicadas"""
+    aplicadas = []
+    with (bind or engine).connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:chave)"), {"chave": CHAVE_LOCK})
+        conn.commit()
+        try:
+            SchemaVersao.__table__.create(conn, checkfirst=True)
+            conn.commit()
+            feitas = set(conn.scalars(select(SchemaVersao.versao)))
+            for versao, descricao, migracao in MIGRACOES:
+                if versao in feitas:
+                    continue
+                print(f"Aplicando migração {versao}: {descricao}")
+                # DDL e backfills não devem esbarrar no DB_STATEMENT_TIMEOUT_MS da API
+                conn.execute(text("SET LOCAL statement_timeout = 0"))
+                migracao(conn)
+                conn.execute(SchemaVersao.__table__.insert().values(versao=versao, descricao=descricao))
+                conn.commit()
+                aplicadas.append(versao)
+        finally:
+            conn.rollback()
+            conn.execute(text("SELECT pg_advisory_unlock(:chave)"), {"chave": CHAVE_LOCK})
+            conn.commit()
+    return aplicadas
+
+
+def verificar_versao(bind: Optional[Engine] = None) -> None:
+    """Chamado no startup: uma consulta, sem DDL. Falha se houver migração pendente."""
+    with (bind or engine).connect() as conn:
+        versao = versao_do_banco(conn)
+    if versao is None or versao < VERSAO_ATUAL:
+        raise RuntimeError(
+            f"Esquema do banco na versão {versao}, a API espera a {VERSAO_ATUAL}. "
+            "Rode as migrações: python -m app.migracoes"
+        )
+    if versao > VERSAO_ATUAL:
+        # Banco já migrado por uma versão mais nova da API (deploy em andamento)
+        print(f"Aviso: esquema do banco na versão {versao}, mais nova que a {VERSAO_ATUAL} desta API.")
+
+
+if __name__ == "__main__":
+    aplicadas = migrar()
+    print(f"Esquema na versão {VERSAO_ATUAL}" + (f" (aplicadas: {aplicadas})" if aplicadas else " (nada a aplicar)"))
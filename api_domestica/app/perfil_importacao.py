@@ -0,0 +1,43 @@
+"""
+Perfil do tempo de import de app.main (cold start de cada worker do uvicorn).
+
+    python -m app.perfil_importacao
+
+Roda `python -X importtime -c "import app.main"` em um processo novo, lista os
+módulos mais caros e sai com código 1 se o total passar de ORCAMENTO_IMPORTACAO_MS
+(para usar no CI ou antes de adicionar uma dependência pesada ao caminho de boot).
+"""
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+ORCAMENTO_IMPORTACAO_MS = float(os.getenv("ORCAMENTO_IMPORTACAO_MS", "1200"))
+MAIS_CAROS = 15
+# Diretório que contém o pacote app (api_domestica/), de onde quer que se chame
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def medir(modulo: str = "app.main") -> List[Tuple[int, str]]:
+    """(tempo acumulado em µs, módulo) de cada import, do mais caro para o mais barato"""
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        capture_output=True, text=True, check=True, cwd=RAIZ,
+    ).stderr
+    tempos = []
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+        _, acumulado, nome = linha.split(":", 1)[1].split("|")
+        tempos.append((int(acumulado), nome.rstrip()))
+    return sorted(tempos, reverse=True)
+
+
+if __name__ == "__main__":
+    tempos = medir()
+    total_ms = tempos[0][0] / 1000
+    for acumulado, nome in tempos[:MAIS_CAROS]:
+        print(f"{acumulado / 1000:8.1f} ms  {nome}")
+    print(f"\nimport app.main: {total_ms:.0f} ms (orçamento: {ORCAMENTO_IMPORTACAO_MS:.0f} ms)")
+    if total_ms > ORCAMENTO_IMPORTACAO_MS:
+        sys.exit(1)
@@ -0,0 +1,247 @@
+import csv
+import io
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import (
+    get_async_db, SessionLocal, Area, Mapa, Metadados, Processo,
+    RelatorioLgpdMapa, LgpdMapaPendente,
+)
+from .respostas import para_json
+
+router = APIRouter(prefix="/relatorios", tags=["Relatórios"])
+
+TAMANHO_LOTE = 200
+NIVEIS = ("atividade", "mapa", "processo", "area", "macroprocesso")
+
+# Estado da última execução do job (por processo da API)
+_job_lock = threading.Lock()
+ESTADO_LGPD: Dict[str, Any] = {
+    "executando": False,
+    "inicio": None,
+    "fim": None,
+    "mapas_processados": 0,
+    "erro": None,
+}
+
+
+def marcar_mapas_pendentes(db: Session, *filtros):
+    """
+    Marca para recálculo os mapas que atendem aos filtros (sobre Mapa).
+    Chamar na mesma transação das escritas em metadados/mapas.
+    """
+    stmt = insert(LgpdMapaPendente).from_select(
+        ["id_mapa", "marcado_em"],
+        select(Mapa.id, func.now()).where(*filtros),
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[LgpdMapaPendente.id_mapa],
+        set_={"marcado_em": stmt.excluded.marcado_em},
+    ))
+
+
+def _agregar_lote(db: Session, mapa_ids: List[int]):
+    """Recalcula as linhas do relatório para um lote de mapas"""
+    mapas = {m.id: m.id_proc for m in db.query(Mapa.id, Mapa.id_proc).filter(Mapa.id.in_(mapa_ids)).all()}
+    agregados = {
+        mapa_id: {"id_mapa": mapa_id, "id_proc": id_proc, "total_atividades": 0, "classificacoes": {}, "campos": {}}
+        for mapa_id, id_proc in mapas.items()
+    }
+    linhas = db.query(Metadados.id_processo, Metadados.lgpd, Metadados.dados)\
+               .filter(Metadados.id_processo.in_(list(mapas))).yield_per(1000)
+    for mapa_id, lgpd, dados in linhas:
+        agregado = agregados[mapa_id]
+        agregado["total_atividades"] += 1
+        classe = lgpd or "N/A"
+        agregado["classificacoes"][classe] = agregado["classificacoes"].get(classe, 0) + 1
+        for campo in dados or []:
+            campo = str(campo).strip()
+            if campo:
+                agregado["campos"][campo] = agregado["campos"].get(campo, 0) + 1
+
+    # Mapas removidos saem do relatório
+    removidos = [i for i in mapa_ids if i not in mapas]
+    if removidos:
+        db.query(RelatorioLgpdMapa).filter(RelatorioLgpdMapa.id_mapa.in_(removidos)).delete(synchronize_session=False)
+    if agregados:
+        stmt = insert(RelatorioLgpdMapa).values([dict(a, atualizado_em=datetime.utcnow()) for a in agregados.values()])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[RelatorioLgpdMapa.id_mapa],
+            set_={c: stmt.excluded[c] for c in ("id_proc", "total_atividades", "classificacoes", "campos", "atualizado_em")},
+        ))
+
+
+def processar_relatorio_lgpd(completo: bool = False):
+    """
+    Job em segundo plano: recalcula apenas os mapas marcados como pendentes
+    (ou todos, se `completo`), em lotes com commit por lote.
+    """
+    if not _job_lock.acquire(blocking=False):
+        return
+    ESTADO_LGPD.update(executando=True, inicio=datetime.utcnow().isoformat(), fim=None, mapas_processados=0, erro=None)
+    db = SessionLocal()
+    try:
+        inicio = datetime.utcnow()
+        if completo:
+            ids = [i for (i,) in db.query(Mapa.id).all()]
+            ids += [i for (i,) in db.query(RelatorioLgpdMapa.id_mapa).all() if i not in set(ids)]
+        else:
+            ids = [i for (i,) in db.query(LgpdMapaPendente.id_mapa).all()]
+
+        for posicao in range(0, len(ids), TAMANHO_LOTE):
+            lote = ids[posicao:posicao + TAMANHO_LOTE]
+            _agregar_lote(db, lote)
+            # Mapas remarcados durante o processamento ficam para a próxima execução
+            db.query(LgpdMapaPendente).filter(
+                LgpdMapaPendente.id_mapa.in_(lote),
+                LgpdMapaPendente.marcado_em <= inicio,
+            ).delete(synchronize_session=False)
+            db.commit()
+            ESTADO_LGPD["mapas_processados"] += len(lote)
+    except Exception as e:
+        db.rollback()
+        print(f"Erro no relatório LGPD: {e}")
+        ESTADO_LGPD["erro"] = str(e)
+    finally:
+        db.close()
+        ESTADO_LGPD.update(executando=False, fim=datetime.utcnow().isoformat())
+        _job_lock.release()
+
+
+@router.post("/lgpd/processar")
+async def agendar_relatorio_lgpd(background_tasks: BackgroundTasks, completo: bool = False):
+    """Agenda o recálculo incremental (ou completo) do relatório LGPD"""
+    if ESTADO_LGPD["executando"]:
+        raise HTTPException(status_code=409, detail="O relatório LGPD já está em processamento.")
+    background_tasks.add_task(processar_relatorio_lgpd, completo)
+    return {"message": "Processamento do relatório LGPD agendado.", "completo": completo}
+
+
+@router.get("/lgpd/status")
+async def status_relatorio_lgpd(db: AsyncSession = Depends(get_async_db)):
+    """Estado da última execução e quantidade de mapas aguardando recálculo"""
+    pendentes = await db.scalar(select(func.count(LgpdMapaPendente.id_mapa)))
+    return {**ESTADO_LGPD, "mapas_pendentes": pendentes}
+
+
+def _somar(destino: Dict[str, Any], linha) -> None:
+    destino["total_atividades"] += linha.total_atividades or 0
+    for campo in ("classificacoes", "campos"):
+        for chave, total in (getattr(linha, campo) or {}).items():
+            destino[campo][chave] = destino[campo].get(chave, 0) + total
+
+
+def _registros_agregados(db: Session, nivel: str) -> Iterator[Dict[str, Any]]:
+    """Agrega as linhas por mapa no nível pedido (processo inclui as subárvores)"""
+    processos = {p.id: p for p in db.query(Processo.id, Processo.titulo, Processo.id_area, Processo.caminho).all()}
+    grupos: Dict[Any, Dict[str, Any]] = {}
+
+    def grupo(chave, titulo):
+        return grupos.setdefault(chave, {
+            "nivel": nivel, "id": chave, "titulo": titulo,
+            "total_atividades": 0, "classificacoes": {}, "campos": {},
+        })
+
+    for linha in db.query(RelatorioLgpdMapa).yield_per(1000):
+        processo = processos.get(linha.id_proc)
+        if processo is None:
+            continue
+        caminho = processo.caminho or []
+        if nivel == "processo":
+            # O mapa conta para o próprio processo e para todos os ancestrais
+            for no in [n for n in caminho if n["tipo"] == "processo"] + [{"id": processo.id, "titulo": processo.titulo}]:
+                _somar(grupo(no["id"], no["titulo"]), linha)
+        elif nivel == "area":
+            _somar(grupo(processo.id_area, None), linha)
+        elif nivel == "macroprocesso" and caminho and caminho[0]["tipo"] == "macro":
+            _somar(grupo(caminho[0]["id"], caminho[0]["titulo"]), linha)
+
+    if nivel == "area":
+        areas = {a.id: a.nome_area for a in db.query(Area.id, Area.nome_area).all()}
+        for chave, registro in grupos.items():
+            registro["titulo"] = areas.get(chave, "Sem área")
+    return iter(grupos.values())
+
+
+def _registros(db: Session, nivel: str) -> Iterable[Dict[str, Any]]:
+    if nivel == "atividade":
+        # Cursor no servidor: memória constante mesmo com muitos metadados
+        linhas = db.query(Metadados, Mapa.titulo).outerjoin(Mapa, Mapa.id == Metadados.id_processo)\
+                   .execution_options(stream_results=True).yield_per(1000)
+        for meta, mapa_titulo in linhas:
+            yield {
+                "nivel": nivel, "id": meta.id_atividade, "titulo": meta.nome,
+                "id_mapa": meta.id_processo, "mapa_titulo": mapa_titulo,
+                "classificacao": meta.lgpd, "campos": meta.dados or [],
+            }
+    elif nivel == "mapa":
+        linhas = db.query(RelatorioLgpdMapa, Mapa.titulo).outerjoin(Mapa, Mapa.id == RelatorioLgpdMapa.id_mapa)\
+                   .execution_options(stream_results=True).yield_per(1000)
+        for linha, mapa_titulo in linhas:
+            yield {
+                "nivel": nivel, "id": linha.id_mapa, "titulo": mapa_titulo,
+                "total_atividades": linha.total_atividades,
+                "classificacoes": linha.classificacoes or {}, "campos": linha.campos or {},
+            }
+    else:
+        yield from _registros_agregados(db, nivel)
+
+
+def _formatar_csv(valor: Any) -> Any:
+    if isinstance(valor, dict):
+        return "; ".join(f"{k}={v}" for k, v in valor.items())
+    if isinstance(valor, list):
+        return "; ".join(str(v) for v in valor)
+    return valor
+
+
+def _stream(nivel: str, formato: str) -> Iterator[str]:
+    db = SessionLocal()
+    try:
+        primeiro = True
+        if formato == "json":
+            yield "["
+        for registro in _registros(db, nivel):
+            if formato == "csv":
+                buffer = io.StringIO()
+                escritor = csv.writer(buffer)
+                if primeiro:
+                    escritor.writerow(registro.keys())
+                escritor.writerow(_formatar_csv(v) for v in registro.values())
+                yield buffer.getvalue()
+            else:
+                yield (b"" if primeiro else b",") + para_json(registro)
+            primeiro = False
+        if formato == "json":
+            yield "]"
+    finally:
+        db.close()
+
+
+@router.get("/lgpd")
+async def exportar_relatorio_lgpd(
+    nivel: str = Query("mapa", description=f"Nível de agregação: {', '.join(NIVEIS)}"),
+    formato: str = Query("json", description="'json' ou 'csv'"),
+):
+    """
+    Exporta o relatório LGPD (classificações e campos de dados pessoais) por
+    atividade, mapa, processo, área ou macroprocesso, em streaming.
+    """
+    if nivel not in NIVEIS:
+        raise HTTPException(status_code=400, detail=f"Nível inválido. Use um dos seguintes: {', '.join(NIVEIS)}")
+    if formato not in ("json", "csv"):
+        raise HTTPException(status_code=400, detail="Formato inválido. Use 'json' ou 'csv'.")
+    media_type = "text/csv" if formato == "csv" else "application/json"
+    return StreamingResponse(
+        _stream(nivel, formato),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="relatorio_lgpd_{nivel}.{formato}"'},
+    )
@@ -0,0 +1,29 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _padrao(valor: Any) -> Any:
+    # orjson já serializa datetime/date/UUID; o resto vira float ou texto
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return str(valor)
+
+
+def para_json(conteudo: Any) -> bytes:
+    """Serializa direto para bytes JSON com orjson (sem jsonable_encoder)"""
+    return orjson.dumps(conteudo, default=_padrao, option=orjson.OPT_NON_STR_KEYS)
+
+
+class RespostaJSON(JSONResponse):
+    """
+    JSONResponse renderizada com orjson. Para pular também o jsonable_encoder,
+    o endpoint deve devolver a resposta pronta: `return RespostaJSON(dados)`.
+    Endpoints com `response_model` não precisam dela: o FastAPI já serializa
+    pelo Pydantic direto para bytes.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return para_json(content)
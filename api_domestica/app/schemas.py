@@ -1,6 +1,7 @@
 # schemas.py
-from pydantic import BaseModel
-from typing import Optional, List, Union
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Annotated, Any, Dict, Optional, List, Literal, Union
 
 class UsuarioCreate(BaseModel):
     nome: str
@@ -38,6 +39,21 @@ class MetadadosResponse(MetadadosBase):
     class Config:
         from_attributes = True  # Atualizado de orm_mode para Pydantic v2
 
+class MetadadosLoteItem(BaseModel):
+    id_atividade: str
+    nome: str = "generatedData"
+    lgpd: str
+    dados: List[str]
+
+class MetadadosLote(BaseModel):
+    id_processo: int  # id do mapa
+    metadados: List[MetadadosLoteItem]
+
+class MetadadosLoteResponse(BaseModel):
+    criados: int
+    atualizados: int
+    inalterados: int
+
 class MacroCreate(BaseModel):
     titulo: str
     data_publicacao: Union[str, None] = None
@@ -49,4 +65,109 @@ class ProcessoCreate(BaseModel):
     ordem: Optional[int] = None
     data_publicacao: Optional[str] = None
 
-# REMOVIDO: Segunda definição duplicada de MapCreate
\ No newline at end of file
+# REMOVIDO: Segunda definição duplicada de MapCreate
+
+
+# Escrita em lote da hierarquia (POST /hierarchy/lote/). Itens novos levam um
+# `ref` (id temporário do cliente, ex.: "p1"); referências aceitam o id real
+# (int) ou o `ref` de um item novo do mesmo lote (str).
+
+Referencia = Union[int, str]
+
+class ProcessoLote(BaseModel):
+    ref: Optional[str] = None
+    id: Optional[int] = None  # processo existente a atualizar
+    titulo: Optional[str] = None
+    id_pai: Optional[Referencia] = None
+    id_area: Optional[int] = None
+    ordem: Optional[int] = None
+    data_publicacao: Optional[str] = None
+
+class MapaLote(BaseModel):
+    ref: Optional[str] = None
+    id: Optional[int] = None  # mapa existente a atualizar
+    id_proc: Optional[Referencia] = None
+    titulo: Optional[str] = None
+    XML: Optional[str] = None
+    status: Optional[str] = None
+
+class AssociacaoLote(BaseModel):
+    macro_processo_id: int
+    processo_id: Referencia
+    ordem: Optional[int] = None
+
+class HierarquiaLote(BaseModel):
+    processos: List[ProcessoLote] = []
+    mapas: List[MapaLote] = []
+    associacoes: List[AssociacaoLote] = []
+
+class HierarquiaLoteResponse(BaseModel):
+    message: str
+    processos: Dict[str, int]  # ref -> id criado
+    mapas: Dict[str, int]
+    associacoes: List[int]
+    atualizados: Dict[str, List[int]]
+
+class ReordenarFilhos(BaseModel):
+    # Exatamente um dos dois: processo pai ou macroprocesso
+    id_pai: Optional[int] = None
+    macro_processo_id: Optional[int] = None
+    ids: List[int]  # todos os filhos, na nova ordem
+
+# Modelos de resposta das leituras grandes: com `response_model`, o FastAPI
+# serializa direto para bytes pelo Pydantic (sem jsonable_encoder)
+
+class MapaDetalhe(BaseModel):
+    id: int
+    proc_id: Optional[int] = None
+    XML: Optional[str] = None
+    titulo: str
+    caminho: List[Dict[str, Any]] = []
+
+class MapaDetalheResponse(BaseModel):
+    mapa: MapaDetalhe
+
+class NoMapa(BaseModel):
+    id: int
+    titulo: str
+    type: Literal["map"] = "map"
+    proc_id: Optional[int] = None
+    data_criacao: Optional[datetime] = None
+
+class NoProcesso(BaseModel):
+    id: int
+    titulo: str
+    type: Literal["process"] = "process"
+    data_criacao: Optional[datetime] = None
+    children: List[Annotated[Union["NoProcesso", NoMapa], Field(discriminator="type")]] = []
+
+class NoMacro(BaseModel):
+    id: int
+    titulo: str
+    type: Literal["macro"] = "macro"
+    children: List[NoProcesso] = []
+
+class HierarquiaResponse(BaseModel):
+    hierarchy: List[NoMacro]
+
+class MetadadoBusca(BaseModel):
+    id: int
+    nome: Optional[str] = None
+    dados: Any = None
+    lgpd: Optional[str] = None
+    id_processo: Optional[int] = None
+    id_atividade: Optional[str] = None
+    mapa_titulo: Optional[str] = None
+    processo_nome: Optional[str] = None
+
+class BuscaMetadadosResponse(BaseModel):
+    metadados: List[MetadadoBusca]
+    proximo_cursor: Optional[int] = None
+
+class BuscaGeralResponse(BaseModel):
+    # Cada tabela formata o resultado de um jeito; os itens ficam como dict
+    resultados: List[Dict[str, Any]]
+    total_encontrados: int
+    termos_busca: List[str]
+    tabelas_pesquisadas: List[str]
+    metadata: Dict[str, Any]
@@ -0,0 +1,100 @@
+import os
+import json
+import base64
+import binascii
+from typing import Any, Hashable, Iterable, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Float, and_, case, cast, func, literal, or_
+
+from .cache import TTLCache, geracoes
+from .database import pode_guardar_em_cache
+
+# Cache compartilhado pelos endpoints de busca (/banco/* e /metadados/buscar/)
+CACHE_BUSCA = TTLCache(
+    max_entradas=int(os.getenv("BUSCA_CACHE_MAX_ENTRADAS", "512")),
+    ttl_segundos=float(os.getenv("BUSCA_CACHE_TTL", "120")),
+)
+
+# Tabelas cujos dados aparecem nos resultados de cada tabela pesquisada
+# (metadados exibem o título do processo relacionado, por exemplo)
+DEPENDENCIAS_BUSCA = {
+    "metadados": ("metadados", "processos"),
+}
+
+
+def normalizar_termos(termos: Iterable[str]) -> Tuple[str, ...]:
+    """Termos em minúsculas, sem repetição e em ordem estável (a busca usa ilike)."""
+    return tuple(sorted({t.lower() for t in termos}))
+
+
+def chave_busca(endpoint: str, termos: Iterable[str], tabelas: Iterable[str], **parametros: Any) -> Hashable:
+    """
+    Monta a chave de cache de uma busca normalizada. A chave inclui a geração
+    de cada tabela envolvida, então qualquer escrita nelas invalida a entrada.
+    """
+    tabelas = tuple(sorted(set(tabelas)))
+    dependencias = set()
+    for tabela in tabelas:
+        dependencias.update(DEPENDENCIAS_BUSCA.get(tabela, (tabela,)))
+    return (
+        endpoint,
+        normalizar_termos(termos),
+        tabelas,
+        tuple(sorted(parametros.items())),
+        geracoes(dependencias),
+    )
+
+
+def guardar_busca(db, chave: Hashable, resposta: Any) -> None:
+    """CACHE_BUSCA.set, exceto para leituras de réplica ainda na janela de atraso das tabelas da chave"""
+    if pode_guardar_em_cache(db, [tabela for tabela, _ in chave[-1]]):
+        CACHE_BUSCA.set(chave, resposta)
+
+
+def relevancia_sql(colunas_principais, colunas_secundarias, termos):
+    """
+    Expressão SQL equivalente a `calcular_relevancia` somada sobre colunas e termos,
+    para que a ordenação (e o cursor) do resultado unificado seja feita no banco.
+    """
+    total = literal(0.0)
+    for principal, colunas in ((True, colunas_principais), (False, colunas_secundarias)):
+        for coluna in colunas:
+            for termo in termos:
+                termo = termo.lower()
+                bonus = case(
+                    (func.lower(coluna) == termo, 2.0),
+                    (func.lower(coluna).startswith(termo), 1.0),
+                    else_=0.5,
+                )
+                if principal:
+                    bonus = bonus + 0.5
+                total = total + case((coluna.ilike(f"%{termo}%"), 1.0 + bonus), else_=0.0)
+    return cast(total, Float)
+
+
+def codificar_cursor(relevancia: float, tabela: str, item_id: int) -> str:
+    """Cursor opaco com a posição (relevância, tabela, id) do último resultado da página."""
+    bruto = json.dumps([relevancia, tabela, item_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[float, str, int]:
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        relevancia, tabela, item_id = json.loads(bruto)
+        return float(relevancia), str(tabela), int(item_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido.")
+
+
+def filtro_apos_cursor(coluna_relevancia, coluna_tabela, coluna_id, cursor: Tuple[float, str, int]):
+    """Keyset para a ordenação (relevância DESC, tabela ASC, id ASC)."""
+    relevancia, tabela, item_id = cursor
+    return or_(
+        coluna_relevancia < relevancia,
+        and_(
+            coluna_relevancia == relevancia,
+            or_(coluna_tabela > tabela, and_(coluna_tabela == tabela, coluna_id > item_id)),
+        ),
+    )
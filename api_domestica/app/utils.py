@@ -1,11 +1,106 @@
-from typing import Any, Dict, Type
-from sqlalchemy.orm import Session
+import copy
+import os
+from typing import Any, Dict, Optional, Type
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 
-def validate_entity(db: Session, entity_id: int, entity_class: Type[Any]):
-    entity = db.query(entity_class).filter(entity_class.id == entity_id).first()
+from .cache import TTLCache, geracoes
+from .database import pode_guardar_em_cache
+
+# Cache entre requisições das linhas validadas (processos, mapas, macros, áreas).
+# A chave leva a geração da tabela, então as escritas deste processo o invalidam na
+# hora; o TTL curto limita o atraso em relação às escritas de outros workers.
+CACHE_ENTIDADES = TTLCache(
+    max_entradas=int(os.getenv("ENTIDADES_CACHE_MAX_ENTRADAS", "1024")),
+    ttl_segundos=float(os.getenv("ENTIDADES_CACHE_TTL", "5")),
+)
+
+# Colunas grandes ficam fora do cache: são carregadas só se a rota as acessar
+FORA_DO_CACHE = {"mapas": {"XML"}}
+
+
+def _chave(entity_class: Type[Any], entity_id: int):
+    tabela = entity_class.__tablename__
+    return (tabela, entity_id, geracoes([tabela]))
+
+
+def _da_sessao(db: Session, entity_class: Type[Any], entity_id: int) -> Optional[Any]:
+    """Cache da própria requisição: o identity map da sessão"""
+    return db.identity_map.get(db.identity_key(entity_class, entity_id))
+
+
+def _do_cache(db: Session, entity_class: Type[Any], chave) -> Optional[Any]:
+    """Anexa à sessão, sem SELECT, uma instância montada com as colunas em cache"""
+    if CACHE_ENTIDADES.ttl_segundos <= 0:
+        return None
+    colunas = CACHE_ENTIDADES.get(chave)
+    if colunas is None:
+        return None
+    entity = entity_class(**copy.deepcopy(colunas))
+    # Como se viesse de uma consulta: sem histórico de alteração (e as colunas fora do cache expiradas)
+    make_transient_to_detached(entity)
+    db.add(entity)
+    return entity
+
+
+def _guardar(db: Session, entity: Any, chave) -> None:
+    if CACHE_ENTIDADES.ttl_segundos <= 0 or not pode_guardar_em_cache(db, [entity.__tablename__]):
+        return
+    fora = FORA_DO_CACHE.get(entity.__tablename__, ())
+    CACHE_ENTIDADES.set(chave, {
+        c.key: copy.deepcopy(getattr(entity, c.key))
+        for c in inspect(type(entity)).column_attrs if c.key not in fora
+    })
+
+
+def _nao_encontrado(entity_class: Type[Any]):
+    return HTTPException(status_code=404, detail=f'{entity_class.__name__} não encontrado.')
+
+
+def validate_entity(db: Session, entity_id: int, entity_class: Type[Any], sem_cache: bool = False):
+    """
+    Carrega a entidade ou responde 404. Ordem: identity map da sessão, cache entre
+    requisições, banco. Use sem_cache=True quando o valor atual de uma coluna decide
+    uma escrita (ex.: o status antigo que sai do resumo do dashboard).
+    """
+    if sem_cache:
+        entity = db.get(entity_class, entity_id, populate_existing=True)
+        if not entity:
+            raise _nao_encontrado(entity_class)
+        return entity
+
+    entity = _da_sessao(db, entity_class, entity_id)
+    if entity is not None:
+        return entity
+    # Geração lida antes do SELECT: uma escrita concorrente deixa a entrada órfã, não obsoleta
+    chave = _chave(entity_class, entity_id)
+    entity = _do_cache(db, entity_class, chave)
+    if entity is not None:
+        return entity
+    entity = db.get(entity_class, entity_id)
+    if not entity:
+        raise _nao_encontrado(entity_class)
+    _guardar(db, entity, chave)
+    return entity
+
+async def validate_entity_async(db: AsyncSession, entity_id: int, entity_class: Type[Any]):
+    entity = _da_sessao(db.sync_session, entity_class, entity_id)
+    if entity is not None:
+        return entity
+    chave = _chave(entity_class, entity_id)
+    entity = _do_cache(db.sync_session, entity_class, chave)
+    if entity is not None:
+        # Sem lazy load no AsyncSession: as colunas fora do cache vêm já (só elas)
+        expiradas = inspect(entity).expired_attributes
+        if expiradas:
+            await db.refresh(entity, list(expiradas))
+        return entity
+    entity = await db.get(entity_class, entity_id)
     if not entity:
-        raise HTTPException(status_code=404, detail=f'{entity_class.__name__} não encontrado.')
+        raise _nao_encontrado(entity_class)
+    _guardar(db.sync_session, entity, chave)
     return entity
 
 
@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func, and_
+from sqlalchemy import or_, func, and_, select, literal, String, union_all
 from typing import Optional, List, Dict, Any
 import re
-import json
 
 # Importa a função para obter a sessão do banco e todos os modelos de dados
-from .database import get_db, Usuario, Processo, Metadados, Area, Documento, Item
+from .database import get_db_leitura, SessionLocal, Usuario, Processo, Metadados, Area, Documento, Item, Mapa, MapaTexto
+from .bpmn import filtro_texto, relevancia_texto
+from .loaders import CarregadorLote, get_carregador
+from .search import CACHE_BUSCA, chave_busca, guardar_busca, relevancia_sql, codificar_cursor, decodificar_cursor, filtro_apos_cursor
+from .respostas import para_json
+from .schemas import BuscaGeralResponse
 
 router = APIRouter(
     prefix="/banco",
@@ -14,13 +19,13 @@ router = APIRouter(
 )
 
 # Função auxiliar para formatar metadados
-def formatar_metadado(m, db_session=None):
+def formatar_metadado(m, carregador: Optional[CarregadorLote] = None):
     """Função para formatar resultado de metadado"""
-    # Busca processo relacionado usando id_processo
+    # Busca processo relacionado usando id_processo (já carregado em lote)
     processo_relacionado = None
-    if db_session and hasattr(m, 'id_processo') and getattr(m, 'id_processo', None):
+    if carregador and hasattr(m, 'id_processo') and getattr(m, 'id_processo', None):
         try:
-            processo = db_session.query(Processo).filter(Processo.id == m.id_processo).first()
+            processo = carregador.obter(Processo, m.id_processo)
             processo_relacionado = processo.titulo if processo else f"Processo #{m.id_processo}"
         except Exception as e:
             print(f"Erro ao buscar processo relacionado: {e}")
@@ -45,6 +50,30 @@ def formatar_metadado(m, db_session=None):
         }
     }
 
+# Função auxiliar para formatar textos de mapas BPMN
+def formatar_texto_mapa(t, carregador: Optional[CarregadorLote] = None):
+    """Função para formatar resultado de texto extraído de um mapa BPMN"""
+    mapa = carregador.obter(Mapa, t.id_mapa) if carregador else None
+    mapa_titulo = mapa.titulo if mapa else f"Mapa #{t.id_mapa}"
+
+    return {
+        "id": t.id,
+        "titulo": t.texto,
+        "subtitulo": f"{t.tipo_elemento} ({t.campo}) • {mapa_titulo}",
+        "categoria": "Mapa",
+        "tags": ["mapa", "bpmn", str(t.tipo_elemento).lower()],
+        "data_modificacao": getattr(mapa, 'data_modificacao', None),
+        "relevancia": 1.0,
+        "caminho": getattr(mapa, 'caminho', None) or [],
+        "dados_extras": {
+            "id_mapa": t.id_mapa,
+            "id_elemento": t.id_elemento,
+            "tipo_elemento": t.tipo_elemento,
+            "campo": t.campo,
+            "mapa_titulo": mapa_titulo
+        }
+    }
+
 # Mapeamento melhorado com mais detalhes para busca
 MAPEAMENTO_BUSCA = {
     "usuarios": {
@@ -73,6 +102,7 @@ MAPEAMENTO_BUSCA = {
             "tags": ["processo", "workflow", "bpmn"],
             "data_modificacao": getattr(p, 'data_publicacao', getattr(p, 'updated_at', None)),
             "relevancia": 1.0,
+            "caminho": p.caminho or [],
             "dados_extras": {
                 "tipo": "processo",
                 "status": getattr(p, 'status', 'ativo')
@@ -83,8 +113,23 @@ MAPEAMENTO_BUSCA = {
         "modelo": Metadados,
         "colunas": [Metadados.nome],
         "colunas_secundarias": [Metadados.lgpd],
+        # Entidades que o formatador usa: (modelo, atributo com o id) - carregadas em lote
+        "relacionados": [(Processo, "id_processo")],
         "resultado": formatar_metadado
     },
+    "mapas": {
+        "modelo": MapaTexto,
+        "colunas": [MapaTexto.texto],
+        "colunas_secundarias": [],
+        # Textos dos mapas usam o índice de texto completo em vez de ilike,
+        # e a relevância vem do ts_rank (o ilike não vê radicais nem prefixos)
+        "filtro_termo": filtro_texto,
+        "relevancia": relevancia_texto,
+        "relacionados": [(Mapa, "id_mapa")],
+        # Link direto para o elemento dentro do mapa
+        "link": lambda t: f"/mapas/{t.id_mapa}#{t.id_elemento}",
+        "resultado": formatar_texto_mapa
+    },
     "areas": {
         "modelo": Area,
         "colunas": [Area.nome_area, Area.sigla],
@@ -151,9 +196,85 @@ def calcular_relevancia(item, termo_busca: str, coluna_encontrada: str) -> float
     
     return relevancia
 
+def _extrair_termos(q: str) -> List[str]:
+    """Limpa e separa os termos de busca (mínimo de 2 caracteres cada)"""
+    termos = [t.strip() for t in re.split(r'\s+', q.strip()) if len(t.strip()) >= 2]
+    if not termos:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Termo de busca deve ter pelo menos 2 caracteres válidos."
+        )
+    return termos
+
+def _filtros_busca(config: Dict[str, Any], termos: List[str]) -> list:
+    """Filtros ilike de uma tabela: um OR entre colunas por termo (principais e secundárias)"""
+    if "filtro_termo" in config:
+        return [config["filtro_termo"](termo) for termo in termos]
+
+    colunas_principais = [c for c in config["colunas"] if c is not None]
+    colunas_secundarias = [c for c in config["colunas_secundarias"] if c is not None]
+
+    filtros_principais = []
+    filtros_secundarios = []
+    for termo in termos:
+        # Busca em colunas principais
+        filtros_termo_principal = [coluna.ilike(f"%{termo}%") for coluna in colunas_principais]
+        if filtros_termo_principal:
+            filtros_principais.append(or_(*filtros_termo_principal))
+
+        # Busca em colunas secundárias
+        filtros_termo_secundario = [coluna.ilike(f"%{termo}%") for coluna in colunas_secundarias]
+        if filtros_termo_secundario:
+            filtros_secundarios.append(or_(*filtros_termo_secundario))
+
+    return filtros_principais + filtros_secundarios
+
+def _relevancia_sql(config: Dict[str, Any], termos: List[str]):
+    """Relevância calculada no banco: a da própria tabela, se houver, ou a soma dos ilikes"""
+    if "relevancia" in config:
+        return config["relevancia"](termos)
+    return relevancia_sql(
+        [c for c in config["colunas"] if c is not None],
+        [c for c in config["colunas_secundarias"] if c is not None],
+        termos,
+    )
+
+def _registrar_relacionados(config: Dict[str, Any], itens, carregador: CarregadorLote):
+    """Registra no carregador os ids relacionados de uma página de itens (uma query por tipo)"""
+    for modelo, atributo in config.get("relacionados", []):
+        carregador.registrar(modelo, (getattr(item, atributo, None) for item in itens))
+
+def _montar_resultado(nome_tabela: str, config: Dict[str, Any], item, termos: List[str], carregador: CarregadorLote) -> Dict[str, Any]:
+    """Formata um item encontrado e anexa relevância, colunas encontradas e link"""
+    formatar_resultado = config["resultado"]
+    # Formatadores com entidades relacionadas recebem o carregador
+    if config.get("relacionados"):
+        resultado_base = formatar_resultado(item, carregador)
+    else:
+        resultado_base = formatar_resultado(item)
+
+    # Calcula relevância baseada em onde o termo foi encontrado
+    relevancia_total = 0
+    colunas_encontradas = []
+    todas_colunas = [c for c in config["colunas"] + config["colunas_secundarias"] if c is not None]
+
+    for coluna in todas_colunas:
+        valor_coluna = str(getattr(item, coluna.name, "")).lower()
+        for termo in termos:
+            if termo.lower() in valor_coluna:
+                relevancia_total += calcular_relevancia(item, termo, coluna.name)
+                colunas_encontradas.append(coluna.name)
+
+    resultado_base["relevancia"] = relevancia_total
+    resultado_base["colunas_encontradas"] = list(set(colunas_encontradas))
+    resultado_base["termos_busca"] = termos
+    resultado_base["tabela"] = nome_tabela
+    resultado_base["link_api"] = config["link"](item) if "link" in config else f"/{nome_tabela}/{item.id}"
+    return resultado_base
+
 # Endpoint de teste simples
 @router.get("/teste-metadados/", summary="Teste de metadados")
-async def teste_metadados(db: Session = Depends(get_db)):
+def teste_metadados(db: Session = Depends(get_db_leitura)):
     """Endpoint simples para testar a busca de metadados"""
     try:
         # Busca todos os metadados
@@ -179,10 +300,11 @@ async def teste_metadados(db: Session = Depends(get_db)):
         return {"erro": str(e), "tipo": type(e).__name__}
 
 @router.get("/busca-por-metadados/", summary="Busca processos por dados dos metadados")
-async def busca_processos_por_metadados(
+def busca_processos_por_metadados(
     q: str = Query(..., min_length=2, description="Termo para buscar nos dados dos metadados"),
     limite: int = Query(20, ge=1, le=50, description="Número máximo de resultados"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_leitura),
+    carregador: CarregadorLote = Depends(get_carregador)
 ):
     """
     Busca processos que contêm metadados com dados específicos.
@@ -196,6 +318,11 @@ async def busca_processos_por_metadados(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Termo de busca deve ter pelo menos 2 caracteres válidos."
         )
+
+    chave = chave_busca("busca-por-metadados", termos, ["metadados", "processos"], limite=limite)
+    em_cache = CACHE_BUSCA.get(chave)
+    if em_cache is not None:
+        return em_cache
     
     try:
         # Busca metadados que contêm os termos
@@ -221,7 +348,7 @@ async def busca_processos_por_metadados(
                 try:
                     # Para PostgreSQL com array ou JSON
                     metadados_dados = db.query(Metadados).filter(
-                        func.cast(Metadados.dados, db.Text).ilike(f"%{termo}%")
+                        func.cast(Metadados.dados, String).ilike(f"%{termo}%")
                     ).all()
                     metadados_encontrados.extend(metadados_dados)
                 except Exception as e:
@@ -246,24 +373,33 @@ async def busca_processos_por_metadados(
         
         # Para cada metadado encontrado, busca os processos relacionados
         processos_encontrados = {}
+        carregador.registrar(Processo, (getattr(m, 'id_processo', None) for m in metadados_unicos.values()))
+        
+        # Usa id_processo para encontrar o processo (carregado em lote)
+        processos_por_metadado = {
+            m.id: carregador.obter(Processo, getattr(m, 'id_processo', None))
+            for m in metadados_unicos.values()
+        }
+        
+        # Se não achou por id_processo, busca por referência no título:
+        # uma única query para todos os nomes sem processo
+        nomes_sem_processo = {
+            m.nome for m in metadados_unicos.values()
+            if processos_por_metadado[m.id] is None and m.nome
+        }
+        if nomes_sem_processo:
+            candidatos = db.query(Processo).filter(
+                or_(*(Processo.titulo.ilike(f"%{nome}%") for nome in nomes_sem_processo))
+            ).order_by(Processo.id).all()
+            for m in metadados_unicos.values():
+                if processos_por_metadado[m.id] is None and m.nome:
+                    nome = m.nome.lower()
+                    processos_por_metadado[m.id] = next(
+                        (p for p in candidatos if nome in (p.titulo or "").lower()), None
+                    )
         
         for metadado in metadados_unicos.values():
-            processo_relacionado = None
-            
-            # Usa id_processo para encontrar o processo
-            if hasattr(metadado, 'id_processo') and metadado.id_processo:
-                processo = db.query(Processo).filter(Processo.id == metadado.id_processo).first()
-                if processo:
-                    processo_relacionado = processo
-            
-            # Se não achou por id_processo, busca por referência no título
-            if not processo_relacionado:
-                processos_com_metadado = db.query(Processo).filter(
-                    Processo.titulo.ilike(f"%{metadado.nome}%")
-                ).all()
-                
-                if processos_com_metadado:
-                    processo_relacionado = processos_com_metadado[0]
+            processo_relacionado = processos_por_metadado[metadado.id]
             
             if processo_relacionado and processo_relacionado.id not in processos_encontrados:
                 # Calcula relevância
@@ -308,6 +444,7 @@ async def busca_processos_por_metadados(
                     "colunas_encontradas": metadados_correspondentes,
                     "termos_busca": termos,
                     "link_api": f"/processos/{processo_relacionado.id}",
+                    "caminho": processo_relacionado.caminho or [],
                     "dados_extras": {
                         "metadado_relacionado": {
                             "id": metadado.id,
@@ -336,7 +473,7 @@ async def busca_processos_por_metadados(
                 detail=f"Nenhum processo encontrado com metadados contendo: {', '.join(termos)}"
             )
         
-        return {
+        resposta = {
             "resultados": resultados,
             "total_encontrados": len(resultados),
             "termos_busca": termos,
@@ -346,6 +483,8 @@ async def busca_processos_por_metadados(
                 "processos_encontrados": len(resultados)
             }
         }
+        guardar_busca(db, chave, resposta)
+        return resposta
         
     except HTTPException:
         raise
@@ -357,9 +496,10 @@ async def busca_processos_por_metadados(
 
 # Endpoint de busca por metadados simplificado para debug
 @router.get("/busca-metadados-simples/", summary="Busca simples em metadados")
-async def busca_metadados_simples(
+def busca_metadados_simples(
     q: str = Query(..., min_length=2, description="Termo de busca"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_leitura),
+    carregador: CarregadorLote = Depends(get_carregador)
 ):
     """Busca simples em metadados para debug"""
     try:
@@ -389,11 +529,12 @@ async def busca_metadados_simples(
         metadados_unicos = {m.id: m for m in todos_metadados_lista}
         
         resultados = []
+        carregador.registrar(Processo, (getattr(m, 'id_processo', None) for m in metadados_unicos.values()))
         for metadado in metadados_unicos.values():
-            # Busca processo relacionado usando id_processo
+            # Busca processo relacionado usando id_processo (carregado em lote)
             processo = None
             if hasattr(metadado, 'id_processo') and metadado.id_processo:
-                processo = db.query(Processo).filter(Processo.id == metadado.id_processo).first()
+                processo = carregador.obter(Processo, metadado.id_processo)
             
             # Determina onde foi encontrado
             encontrado_em = []
@@ -434,13 +575,14 @@ async def busca_metadados_simples(
             detail=f"Erro na busca: {str(e)}"
         )
 
-@router.get("/busca-geral/", summary="Realiza uma busca textual inteligente em todo o banco")
-async def busca_geral(
+@router.get("/busca-geral/", response_model=BuscaGeralResponse, summary="Realiza uma busca textual inteligente em todo o banco")
+def busca_geral(
     q: str = Query(..., min_length=2, description="Termo de busca. Mínimo de 2 caracteres."),
     tabelas: Optional[List[str]] = Query(None, description=f"Filtro opcional para tabelas específicas. Opções: {list(MAPEAMENTO_BUSCA.keys())}"),
     limite: int = Query(50, ge=1, le=100, description="Número máximo de resultados por tabela"),
     ordenar_por: str = Query("relevancia", description="Ordenação: 'relevancia', 'alfabetico', 'data'"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_leitura),
+    carregador: CarregadorLote = Depends(get_carregador)
 ):
     """
     Busca inteligente com:
@@ -452,81 +594,38 @@ async def busca_geral(
     """
     
     # Limpa e separa termos de busca
-    termos = [t.strip() for t in re.split(r'\s+', q.strip()) if len(t.strip()) >= 2]
-    if not termos:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Termo de busca deve ter pelo menos 2 caracteres válidos."
-        )
+    termos = _extrair_termos(q)
     
     resultados_finais = []
     tabelas_a_buscar = tabelas if tabelas else MAPEAMENTO_BUSCA.keys()
 
+    chave = chave_busca("busca-geral", termos, tabelas_a_buscar, limite=limite, ordenar_por=ordenar_por)
+    em_cache = CACHE_BUSCA.get(chave)
+    if em_cache is not None:
+        return em_cache
+
     for nome_tabela in tabelas_a_buscar:
         if nome_tabela not in MAPEAMENTO_BUSCA:
             continue
 
         config = MAPEAMENTO_BUSCA[nome_tabela]
-        modelo = config["modelo"]
-        colunas_principais = [c for c in config["colunas"] if c is not None]
-        colunas_secundarias = [c for c in config["colunas_secundarias"] if c is not None]
-        todas_colunas = colunas_principais + colunas_secundarias
-        formatar_resultado = config["resultado"]
-
-        # Constrói filtros para busca multi-termo
-        filtros_principais = []
-        filtros_secundarios = []
-        
-        for termo in termos:
-            # Busca em colunas principais
-            filtros_termo_principal = [coluna.ilike(f"%{termo}%") for coluna in colunas_principais]
-            if filtros_termo_principal:
-                filtros_principais.append(or_(*filtros_termo_principal))
-            
-            # Busca em colunas secundárias
-            filtros_termo_secundario = [coluna.ilike(f"%{termo}%") for coluna in colunas_secundarias]
-            if filtros_termo_secundario:
-                filtros_secundarios.append(or_(*filtros_termo_secundario))
-
-        # Combina filtros (AND entre termos, OR entre colunas)
-        filtros_finais = []
-        if filtros_principais:
-            filtros_finais.extend(filtros_principais)
-        if filtros_secundarios:
-            filtros_finais.extend(filtros_secundarios)
-        
+        filtros_finais = _filtros_busca(config, termos)
         if not filtros_finais:
             continue
 
-        # Executa a query
-        query_results = db.query(modelo).filter(or_(*filtros_finais)).limit(limite).all()
+        # Executa a query (tabelas com relevância própria a calculam no banco)
+        if "relevancia" in config:
+            linhas = db.query(config["modelo"], config["relevancia"](termos)).filter(or_(*filtros_finais)).limit(limite).all()
+        else:
+            linhas = [(item, None) for item in db.query(config["modelo"]).filter(or_(*filtros_finais)).limit(limite).all()]
+        _registrar_relacionados(config, [item for item, _ in linhas], carregador)
 
         # Processa resultados com cálculo de relevância
-        for item in query_results:
-            # Para metadados, passa o db_session
-            if nome_tabela == "metadados":
-                resultado_base = formatar_resultado(item, db)
-            else:
-                resultado_base = formatar_resultado(item)
-            
-            # Calcula relevância baseada em onde o termo foi encontrado
-            relevancia_total = 0
-            colunas_encontradas = []
-            
-            for coluna in todas_colunas:
-                valor_coluna = str(getattr(item, coluna.name, "")).lower()
-                for termo in termos:
-                    if termo.lower() in valor_coluna:
-                        relevancia_total += calcular_relevancia(item, termo, coluna.name)
-                        colunas_encontradas.append(coluna.name)
-            
-            resultado_base["relevancia"] = relevancia_total
-            resultado_base["colunas_encontradas"] = list(set(colunas_encontradas))
-            resultado_base["termos_busca"] = termos
-            resultado_base["tabela"] = nome_tabela
-            resultado_base["link_api"] = f"/{nome_tabela}/{item.id}"
-            
-            resultados_finais.append(resultado_base)
+        for item, relevancia in linhas:
+            resultado = _montar_resultado(nome_tabela, config, item, termos, carregador)
+            if relevancia is not None:
+                resultado["relevancia"] = relevancia
+            resultados_finais.append(resultado)
 
     # Ordenação
     if ordenar_por == "relevancia":
@@ -542,7 +641,7 @@ async def busca_geral(
             detail=f"Nenhum resultado encontrado para: {', '.join(termos)}"
         )
 
-    return {
+    resposta = {
         "resultados": resultados_finais,
         "total_encontrados": len(resultados_finais),
         "termos_busca": termos,
@@ -552,13 +651,137 @@ async def busca_geral(
             "limite_por_tabela": limite
         }
     }
+    guardar_busca(db, chave, resposta)
+    return resposta
+
+def _pagina_busca(carregador: CarregadorLote, termos: List[str], tabelas_a_buscar: List[str], tamanho: int, posicao=None):
+    """
+    Uma página do resultado unificado. A união das tabelas é ordenada e cortada
+    no banco por (relevância, tabela, id); só os itens da página são carregados.
+    Retorna os resultados e a posição do último item, se houver próxima página.
+    """
+    consultas = []
+    for nome_tabela in tabelas_a_buscar:
+        config = MAPEAMENTO_BUSCA[nome_tabela]
+        filtros = _filtros_busca(config, termos)
+        if not filtros:
+            continue
+        modelo = config["modelo"]
+        relevancia = _relevancia_sql(config, termos)
+        consultas.append(
+            select(
+                literal(nome_tabela, String).label("tabela"),
+                modelo.id.label("id"),
+                relevancia.label("relevancia"),
+            ).where(or_(*filtros))
+        )
+    if not consultas:
+        return [], None
+
+    unificada = union_all(*consultas).subquery()
+    stmt = select(unificada.c.tabela, unificada.c.id, unificada.c.relevancia)
+    if posicao:
+        stmt = stmt.where(filtro_apos_cursor(unificada.c.relevancia, unificada.c.tabela, unificada.c.id, posicao))
+    stmt = stmt.order_by(unificada.c.relevancia.desc(), unificada.c.tabela, unificada.c.id).limit(tamanho + 1)
+    db = carregador.db
+    linhas = db.execute(stmt).all()
+    tem_mais = len(linhas) > tamanho
+    linhas = linhas[:tamanho]
+
+    # Carrega os itens da página com uma query por tabela presente nela
+    ids_por_tabela: Dict[str, List[int]] = {}
+    for linha in linhas:
+        ids_por_tabela.setdefault(linha.tabela, []).append(linha.id)
+    itens = {}
+    for nome_tabela, ids in ids_por_tabela.items():
+        config = MAPEAMENTO_BUSCA[nome_tabela]
+        modelo = config["modelo"]
+        encontrados = db.query(modelo).filter(modelo.id.in_(ids)).all()
+        _registrar_relacionados(config, encontrados, carregador)
+        for item in encontrados:
+            itens[(nome_tabela, item.id)] = item
+
+    resultados = []
+    for linha in linhas:
+        item = itens.get((linha.tabela, linha.id))
+        if item is None:
+            continue
+        resultado = _montar_resultado(linha.tabela, MAPEAMENTO_BUSCA[linha.tabela], item, termos, carregador)
+        resultado["relevancia"] = linha.relevancia
+        resultados.append(resultado)
+
+    ultima_posicao = (linhas[-1].relevancia, linhas[-1].tabela, linhas[-1].id) if tem_mais else None
+    return resultados, ultima_posicao
+
+def _stream_busca(termos: List[str], tabelas_a_buscar: List[str], tamanho: int, posicao=None):
+    """Percorre todas as páginas por cursor e emite um resultado por linha (NDJSON)"""
+    db = SessionLocal()
+    try:
+        while True:
+            # Um carregador por página mantém a memória limitada ao tamanho da página
+            resultados, posicao = _pagina_busca(CarregadorLote(db), termos, tabelas_a_buscar, tamanho, posicao)
+            for resultado in resultados:
+                yield para_json(resultado) + b"\n"
+            if posicao is None:
+                break
+    finally:
+        db.close()
+
+@router.get("/busca-geral/paginada/", summary="Busca geral paginada por cursor, com modo NDJSON")
+def busca_geral_paginada(
+    q: str = Query(..., min_length=2, description="Termo de busca. Mínimo de 2 caracteres."),
+    tabelas: Optional[List[str]] = Query(None, description=f"Filtro opcional para tabelas específicas. Opções: {list(MAPEAMENTO_BUSCA.keys())}"),
+    tamanho: int = Query(20, ge=1, le=100, description="Resultados por página (no resultado unificado)"),
+    cursor: Optional[str] = Query(None, description="Valor de 'proximo_cursor' da página anterior"),
+    formato: str = Query("json", description="'json' (uma página) ou 'ndjson' (stream de todas as páginas a partir do cursor)"),
+    carregador: CarregadorLote = Depends(get_carregador)
+):
+    """
+    Mesma busca de /busca-geral/, mas com o resultado de todas as tabelas unido e
+    ordenado por relevância no banco. A paginação usa um cursor estável sobre
+    (relevância, tabela, id), então páginas profundas não usam OFFSET.
+    """
+    termos = _extrair_termos(q)
+    tabelas_a_buscar = [t for t in (tabelas or MAPEAMENTO_BUSCA.keys()) if t in MAPEAMENTO_BUSCA]
+    posicao = decodificar_cursor(cursor) if cursor else None
+
+    if formato == "ndjson":
+        return StreamingResponse(
+            _stream_busca(termos, tabelas_a_buscar, tamanho, posicao),
+            media_type="application/x-ndjson"
+        )
+
+    chave = chave_busca("busca-geral-paginada", termos, tabelas_a_buscar, tamanho=tamanho, cursor=cursor or "")
+    em_cache = CACHE_BUSCA.get(chave)
+    if em_cache is not None:
+        return em_cache
+
+    resultados, ultima_posicao = _pagina_busca(carregador, termos, tabelas_a_buscar, tamanho, posicao)
+    resposta = {
+        "resultados": resultados,
+        "total_pagina": len(resultados),
+        "proximo_cursor": codificar_cursor(*ultima_posicao) if ultima_posicao else None,
+        "termos_busca": termos,
+        "tabelas_pesquisadas": tabelas_a_buscar,
+        "metadata": {
+            "ordenacao": "relevancia",
+            "tamanho_pagina": tamanho
+        }
+    }
+    guardar_busca(carregador.db, chave, resposta)
+    return resposta
+
+@router.get("/cache/", summary="Estatísticas do cache de busca")
+async def estatisticas_cache_busca():
+    """Retorna taxa de acerto, número de entradas e memória estimada do cache de busca"""
+    return CACHE_BUSCA.estatisticas()
 
 # Endpoint para sugestões de busca (autocomplete)
 @router.get("/sugestoes/", summary="Sugestões para autocomplete")
-async def obter_sugestoes(
+def obter_sugestoes(
     q: str = Query(..., min_length=1, description="Termo parcial para sugestões"),
     limite: int = Query(10, ge=1, le=20),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_leitura)
 ):
     """Retorna sugestões rápidas para autocomplete baseadas nos termos mais comuns"""
     sugestoes = []
@@ -0,0 +1,63 @@
+"""
+Custo da dependência de autenticação (get_current_user) por requisição.
+
+    BENCH_DATABASE_URL=... python -m bench.autenticacao
+
+Cada chamada abre uma AsyncSession, como o get_async_db de uma requisição.
+"Sem cache" limpa CACHE_TOKENS antes de cada chamada (decodifica o JWT e busca
+o usuário no banco); "com cache" resolve o token já verificado.
+"""
+import asyncio
+import os
+import time
+
+from bench.comum import configurar_banco, imprimir, recriar_esquema, resumo
+
+configurar_banco()
+
+from app.auth import CACHE_TOKENS, _jwt, ALGORITHM, SECRET_KEY, criar_token_acesso, get_current_user  # noqa: E402
+from app.database import AsyncSessionLocal, SessionLocal, Usuario  # noqa: E402
+
+REPETICOES = int(os.getenv("BENCH_REPETICOES", "2000"))
+EMAIL = "bench@xmap.com"
+
+
+async def cronometrar_async(funcao, repeticoes: int):
+    await funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        await funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return resumo(tempos)
+
+
+async def medir(token: str) -> None:
+    async def autenticar():
+        async with AsyncSessionLocal() as db:
+            return await get_current_user(token, db)
+
+    async def sem_cache():
+        CACHE_TOKENS.limpar()
+        return await autenticar()
+
+    async def so_jwt():
+        return _jwt().decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+    imprimir("sem cache (JWT + SELECT do usuário)", await cronometrar_async(sem_cache, REPETICOES))
+    imprimir("só decodificação do JWT", await cronometrar_async(so_jwt, REPETICOES))
+    CACHE_TOKENS.limpar()
+    imprimir("com cache (CACHE_TOKENS)", await cronometrar_async(autenticar, REPETICOES))
+
+
+def main() -> None:
+    recriar_esquema()
+    with SessionLocal() as db:
+        # O hash não é usado: o benchmark parte de um token já emitido
+        db.add(Usuario(nome="Benchmark", email=EMAIL, senha_hash="-"))
+        db.commit()
+    asyncio.run(medir(criar_token_acesso({"sub": EMAIL})))
+
+
+if __name__ == "__main__":
+    main()
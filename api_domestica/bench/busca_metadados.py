@@ -0,0 +1,117 @@
+"""
+Latência de GET /metadados/buscar/ com BENCH_METADADOS linhas (padrão: 100 mil).
+
+    BENCH_DATABASE_URL=... python -m bench.busca_metadados
+
+Compara a rota atual (uma consulta com JOIN, paginada por cursor) com a
+implementação anterior, que lia todos os metadados do termo e fazia uma consulta
+de mapa e uma de processo por linha. O cache de busca é limpo antes de cada chamada.
+"""
+import os
+
+from sqlalchemy import String, cast, insert, or_, text
+
+from bench.comum import configurar_banco, cronometrar, imprimir, recriar_esquema
+
+configurar_banco()
+
+from app.database import Mapa, Metadados, Processo, SessionLocal, engine  # noqa: E402
+
+TOTAL_METADADOS = int(os.getenv("BENCH_METADADOS", "100000"))
+REPETICOES = int(os.getenv("BENCH_REPETICOES", "20"))
+POR_MAPA = 50
+LOTE_INSERCAO = 10_000
+LGPD = ["Pessoal", "Sensível", "Não pessoal"]
+# Termo -> a cada quantas linhas ele aparece em `dados`
+TERMOS = {"passaporte": 2000, "cpf": 50, "inexistente": None}
+
+
+def popular(total: int = TOTAL_METADADOS) -> None:
+    mapas_total = -(-total // POR_MAPA)
+    with SessionLocal() as db:
+        ids_processos = db.scalars(
+            insert(Processo).returning(Processo.id, sort_by_parameter_order=True),
+            [{"titulo": f"Processo {i}"} for i in range(mapas_total)],
+        ).all()
+        ids_mapas = db.scalars(
+            insert(Mapa).returning(Mapa.id, sort_by_parameter_order=True),
+            [{"titulo": f"Mapa {i}", "id_proc": id_proc} for i, id_proc in enumerate(ids_processos)],
+        ).all()
+        for inicio in range(0, total, LOTE_INSERCAO):
+            linhas = []
+            for i in range(inicio, min(inicio + LOTE_INSERCAO, total)):
+                dados = [f"valor{i}"] + [t for t, cada in TERMOS.items() if cada and i % cada == 0]
+                linhas.append({
+                    "id_processo": ids_mapas[i // POR_MAPA],
+                    "id_atividade": f"Activity_{i}",
+                    "nome": f"campo{i % 100}",
+                    "lgpd": LGPD[i % len(LGPD)],
+                    "dados": dados,
+                })
+            db.execute(insert(Metadados), linhas)
+        db.commit()
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+
+
+def busca_anterior(termo: str):
+    """Implementação anterior: sem limite e com uma consulta de mapa e uma de processo por metadado"""
+    padrao = f"%{termo}%"
+    with SessionLocal() as db:
+        resultado = []
+        metadados = db.query(Metadados).filter(or_(
+            cast(Metadados.dados, String).ilike(padrao),
+            Metadados.lgpd.ilike(padrao),
+            Metadados.nome.ilike(padrao),
+        )).all()
+        for meta in metadados:
+            mapa = db.query(Mapa).filter(Mapa.id == meta.id_processo).first()
+            processo = db.query(Processo).filter(Processo.id == mapa.id_proc).first() if mapa else None
+            resultado.append({
+                "id": meta.id, "nome": meta.nome, "dados": meta.dados, "lgpd": meta.lgpd,
+                "id_processo": meta.id_processo, "id_atividade": meta.id_atividade,
+                "mapa_titulo": mapa.titulo if mapa else None,
+                "processo_nome": processo.titulo if processo else None,
+            })
+        return resultado
+
+
+def main() -> None:
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.search import CACHE_BUSCA
+
+    print(f"Populando {TOTAL_METADADOS} metadados ({POR_MAPA} por mapa)...")
+    recriar_esquema()
+    popular()
+
+    def pagina(termo, limite=100, cursor=None):
+        CACHE_BUSCA.limpar()
+        parametros = {"termo": termo, "limite": limite}
+        if cursor is not None:
+            parametros["cursor"] = cursor
+        resposta = client.get("/metadados/buscar/", params=parametros)
+        resposta.raise_for_status()
+        return resposta.json()
+
+    def todas_as_paginas(termo):
+        cursor, total = None, 0
+        while True:
+            dados = pagina(termo, limite=1000, cursor=cursor)
+            total += len(dados["metadados"])
+            cursor = dados["proximo_cursor"]
+            if cursor is None:
+                return total
+
+    with TestClient(app) as client:
+        for termo in TERMOS:
+            encontrados = todas_as_paginas(termo)
+            print(f"\ntermo '{termo}': {encontrados} metadados")
+            imprimir("atual, 1ª página (limite=100)", cronometrar(lambda: pagina(termo), REPETICOES))
+            imprimir("atual, todas as páginas (limite=1000)", cronometrar(lambda: todas_as_paginas(termo), REPETICOES))
+            imprimir("anterior (N+1, sem HTTP)", cronometrar(lambda: busca_anterior(termo), max(1, REPETICOES // 4)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Teste de carga: vazão e latência de requisições concorrentes em um worker.
+
+    BENCH_DATABASE_URL=... python -m bench.carga
+
+Popula BENCH_CARGA_METADADOS metadados, sobe o uvicorn com 1 worker e mede dois
+cenários com BENCH_CONCORRENCIA clientes por BENCH_DURACAO segundos:
+
+- leituras rápidas (GET de processo e de mapa);
+- as mesmas leituras com 1/4 dos clientes em /metadados/buscar/ com termos
+  sempre novos (sem cache). Uma consulta síncrona dentro de um `async def`
+  bloquearia o event loop e as leituras rápidas esperariam por ela.
+
+Com BENCH_URL a carga vai para uma API já em execução (ex.: outra versão, para
+comparar), usando os dados já presentes no banco de BENCH_DATABASE_URL (os ids
+são lidos com SQL puro, para funcionar com esquemas anteriores).
+"""
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+from bench.comum import configurar_banco, recriar_esquema, resumo
+
+configurar_banco()
+
+from bench.busca_metadados import popular  # noqa: E402
+
+METADADOS = int(os.getenv("BENCH_CARGA_METADADOS", "50000"))
+CONCORRENCIA = int(os.getenv("BENCH_CONCORRENCIA", "32"))
+DURACAO = float(os.getenv("BENCH_DURACAO", "15"))
+BENCH_URL = os.getenv("BENCH_URL")
+TIMEOUT = 30.0  # segundos por requisição; acima disso conta como erro
+PORTA = 8765
+
+
+def leituras_rapidas(ids_processos, ids_mapas):
+    return [
+        lambda: f"/processos/{random.choice(ids_processos)}",
+        lambda: f"/mapas/{random.choice(ids_mapas)}",
+    ]
+
+
+def busca_sem_cache():
+    return f"/metadados/buscar/?termo={uuid.uuid4().hex[:8]}"
+
+
+async def carga(url_base, rotas_rapidas, clientes_lentos: int):
+    """Roda os clientes até DURACAO; devolve (tempos das leituras rápidas, total de respostas, erros)"""
+    fim = time.perf_counter() + DURACAO
+    rapidas, contagem = [], {"respostas": 0, "erros": 0}
+
+    async def cliente(http, lento: bool):
+        while time.perf_counter() < fim:
+            rota = busca_sem_cache() if lento else random.choice(rotas_rapidas)()
+            inicio = time.perf_counter()
+            try:
+                ok = (await http.get(rota)).status_code == 200
+            except httpx.HTTPError:  # timeout: o servidor parou de responder
+                ok = False
+            if not ok:
+                contagem["erros"] += 1
+            contagem["respostas"] += 1
+            if not lento:
+                rapidas.append((time.perf_counter() - inicio) * 1000)
+
+    limites = httpx.Limits(max_connections=CONCORRENCIA)
+    async with httpx.AsyncClient(base_url=url_base, limits=limites, timeout=TIMEOUT) as http:
+        await asyncio.gather(*(cliente(http, i < clientes_lentos) for i in range(CONCORRENCIA)))
+    return rapidas, contagem["respostas"], contagem["erros"]
+
+
+def subir_api():
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORTA), "--workers", "1", "--log-level", "warning"],
+        env=os.environ,
+    )
+    url = f"http://127.0.0.1:{PORTA}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{url}/").status_code == 200:
+                return processo, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    processo.terminate()
+    sys.exit("A API não respondeu no startup.")
+
+
+def main() -> None:
+    from sqlalchemy import text
+    from app.database import engine
+
+    if not BENCH_URL:
+        print(f"Populando {METADADOS} metadados...")
+        recriar_esquema()
+        popular(METADADOS)
+    with engine.connect() as conn:
+        ids_processos = conn.scalars(text("SELECT id FROM processos")).all()
+        ids_mapas = conn.scalars(text("SELECT id FROM mapas")).all()
+
+    processo, url = (None, BENCH_URL) if BENCH_URL else subir_api()
+    try:
+        rotas = leituras_rapidas(ids_processos, ids_mapas)
+        print(f"{CONCORRENCIA} clientes, {DURACAO:.0f} s por cenário, 1 worker")
+        for nome, lentos in (("leituras rápidas", 0), ("leituras rápidas + buscas sem cache", CONCORRENCIA // 4)):
+            rapidas, respostas, erros = asyncio.run(carga(url, rotas, lentos))
+            estatisticas = resumo(rapidas)
+            print(
+                f"{nome:<38} {respostas / DURACAO:8.1f} req/s  leituras rápidas: "
+                f"p50 {estatisticas['p50']:7.1f} ms  p95 {estatisticas['p95']:7.1f} ms  erros {erros}"
+            )
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Tempo de serialização JSON de respostas grandes (não usa o banco).
+
+    python -m bench.serializacao
+
+Compara, para os mesmos dados, o caminho padrão do FastAPI sem response_model
+(jsonable_encoder + json.dumps), o response_model validado e serializado pelo
+Pydantic (model_dump_json) e para_json (orjson direto, usado por RespostaJSON).
+"""
+import os
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.respostas import para_json
+from app.schemas import HierarquiaResponse
+from bench.comum import cronometrar, imprimir
+
+REPETICOES = int(os.getenv("BENCH_REPETICOES", "20"))
+INICIO = datetime(2024, 1, 1, 8, 30)
+
+
+def hierarquia(macros: int = 50, processos: int = 40, mapas: int = 5) -> dict:
+    """Mesmo formato de GET /hierarchy/ (50 x 40 x 5 = 2.000 processos e 10.000 mapas)"""
+    arvore, proximo_id = [], 1
+    for m in range(macros):
+        filhos = []
+        for p in range(processos):
+            filhos.append({
+                "id": proximo_id, "titulo": f"Processo {m}.{p}", "type": "process",
+                "data_criacao": INICIO + timedelta(minutes=proximo_id),
+                "children": [
+                    {"id": proximo_id * 10 + k, "titulo": f"Mapa {m}.{p}.{k}", "type": "map",
+                     "proc_id": proximo_id, "data_criacao": INICIO + timedelta(minutes=k)}
+                    for k in range(mapas)
+                ],
+            })
+            proximo_id += 1
+        arvore.append({"id": m + 1, "titulo": f"Macroprocesso {m}", "type": "macro", "children": filhos})
+    return {"hierarchy": arvore}
+
+
+def listagem_mapas(linhas: int = 10_000) -> dict:
+    """Mesmo formato de GET /mapas/ com limite alto"""
+    return {
+        "mapas": [
+            {
+                "id": i, "id_proc": i // 5, "titulo": f"Mapa {i}", "status": "Em andamento",
+                "data_criacao": INICIO + timedelta(hours=i), "data_modificacao": INICIO + timedelta(hours=i, minutes=5),
+                "caminho": [{"tipo": "macro", "id": 1, "titulo": "Macro"}, {"tipo": "processo", "id": i // 5, "titulo": "Pai"}],
+            }
+            for i in range(linhas)
+        ],
+        "proximo_cursor": linhas,
+    }
+
+
+def padrao_fastapi(conteudo) -> bytes:
+    return JSONResponse(jsonable_encoder(conteudo)).body
+
+
+def main() -> None:
+    cargas = {
+        "hierarchy (10 mil mapas)": (hierarquia(), HierarquiaResponse),
+        "listagem de mapas (10 mil linhas)": (listagem_mapas(), None),
+    }
+    for nome, (conteudo, modelo) in cargas.items():
+        tamanho = len(para_json(conteudo))
+        print(f"\n{nome}: {tamanho / 1024:.0f} KiB")
+        imprimir("jsonable_encoder + json.dumps", cronometrar(lambda: padrao_fastapi(conteudo), REPETICOES))
+        if modelo is not None:
+            imprimir("response_model (Pydantic model_dump_json)", cronometrar(
+                lambda: modelo.model_validate(conteudo).model_dump_json(), REPETICOES,
+            ))
+        imprimir("para_json (orjson)", cronometrar(lambda: para_json(conteudo), REPETICOES))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+#!/bin/bash
+# Executado pelo entrypoint do postgres apenas na criação do volume do primário:
+# libera conexões de replicação para a réplica de leitura (docker-compose.replica.yml).
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
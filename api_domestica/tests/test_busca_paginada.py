@@ -0,0 +1,109 @@
+"""
+Paginação por cursor de /banco/busca-geral/paginada/: o cursor (relevância,
+tabela, id) percorre o resultado unificado sem repetir nem pular itens.
+"""
+import base64
+import json
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.search import codificar_cursor, decodificar_cursor
+
+URL = "/banco/busca-geral/paginada/"
+
+
+def _b64(bruto: bytes) -> str:
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("posicao", [(3.5, "processos", 1), (0.0, "mapas", 987654321), (2.0571, "metadados", 42)])
+def test_cursor_ida_e_volta(posicao):
+    cursor = codificar_cursor(*posicao)
+    assert "=" not in cursor
+    assert decodificar_cursor(cursor) == posicao
+
+
+@pytest.mark.parametrize("cursor", [
+    "!!!",
+    _b64(b"nao e json"),
+    _b64(json.dumps([1.0, "processos"]).encode()),
+    _b64(json.dumps([1.0, "processos", None]).encode()),
+    _b64(json.dumps(["x", "processos", 1]).encode()),
+    _b64(json.dumps({"relevancia": 1.0}).encode()),
+])
+def test_cursor_malformado_e_rejeitado(cursor):
+    with pytest.raises(HTTPException) as erro:
+        decodificar_cursor(cursor)
+    assert erro.value.status_code == 400
+
+
+def _popular(client) -> str:
+    """Processos e metadados com o mesmo termo e relevâncias variadas (com empates entre tabelas)"""
+    termo = f"pag{uuid.uuid4().hex[:10]}"
+    titulos = [termo, f"{termo} inicio", f"{termo} outro", f"fim {termo}", f"meio {termo} meio"] * 3
+    lote = client.post("/hierarchy/lote/", json={
+        "processos": [{"ref": f"p{i}", "titulo": titulo} for i, titulo in enumerate(titulos)],
+        "mapas": [{"ref": "m", "titulo": "Mapa", "id_proc": "p0"}],
+    })
+    assert lote.status_code == 200, lote.text
+    resposta = client.post("/metadados/lote/", json={
+        "id_processo": lote.json()["mapas"]["m"],
+        "metadados": [
+            {"id_atividade": f"Activity_{i}", "nome": titulo, "lgpd": "Pessoal", "dados": []}
+            for i, titulo in enumerate(titulos[:8])
+        ],
+    })
+    assert resposta.status_code == 200, resposta.text
+    return termo
+
+
+def _percorrer(client, termo, tamanho, entre_paginas=None):
+    """Segue proximo_cursor até o fim; devolve as chaves (tabela, id) na ordem recebida"""
+    vistos, cursor = [], None
+    while True:
+        parametros = {"q": termo, "tamanho": tamanho}
+        if cursor:
+            parametros["cursor"] = cursor
+        resposta = client.get(URL, params=parametros)
+        assert resposta.status_code == 200, resposta.text
+        dados = resposta.json()
+        assert dados["total_pagina"] <= tamanho
+        vistos.extend((r["tabela"], r["id"]) for r in dados["resultados"])
+        cursor = dados["proximo_cursor"]
+        if cursor is None:
+            return vistos
+        if entre_paginas:
+            entre_paginas()
+
+
+def test_paginas_cobrem_o_resultado_sem_repetir_nem_pular(client):
+    termo = _popular(client)
+    tudo = _percorrer(client, termo, tamanho=100)
+    assert len(tudo) == 15 + 8
+
+    for tamanho in (1, 4, 7):
+        assert _percorrer(client, termo, tamanho) == tudo
+
+
+def test_cursor_estavel_com_insercoes_entre_paginas(client):
+    termo = _popular(client)
+    tudo = _percorrer(client, termo, tamanho=100)
+    novos = []
+
+    def inserir():
+        resposta = client.post("/processos/", json={"titulo": f"{termo} novo"})
+        novos.append(("processos", resposta.json()["processo"]["id"]))
+
+    vistos = _percorrer(client, termo, tamanho=5, entre_paginas=inserir)
+    assert novos
+    # Itens novos aparecem só se caírem depois do cursor; os antigos nem repetem nem somem
+    assert len(vistos) == len(set(vistos))
+    assert [chave for chave in vistos if chave not in novos] == tudo
+
+
+def test_cursor_invalido_responde_400(client):
+    resposta = client.get(URL, params={"q": "qualquer", "cursor": "!!!"})
+    assert resposta.status_code == 400
+    assert resposta.json()["detail"] == "Cursor inválido."
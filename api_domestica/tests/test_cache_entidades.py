@@ -0,0 +1,74 @@
+"""
+validate_entity: identity map da sessão e CACHE_ENTIDADES evitam o SELECT da
+entidade; escritas (invalidar_tabelas) e sem_cache=True voltam ao banco.
+"""
+import pytest
+
+
+@pytest.fixture
+def processo_e_mapa(client):
+    lote = client.post("/hierarchy/lote/", json={
+        "processos": [{"ref": "p", "titulo": "Processo do cache"}],
+        "mapas": [{"ref": "m", "titulo": "Mapa do cache", "id_proc": "p"}],
+    })
+    assert lote.status_code == 200, lote.text
+    return lote.json()["processos"]["p"], lote.json()["mapas"]["m"]
+
+
+def test_sessao_e_cache_evitam_o_select(processo_e_mapa, contar_consultas):
+    from app.database import Processo, SessionLocal
+    from app.utils import validate_entity
+
+    processo_id, _ = processo_e_mapa
+    with SessionLocal() as db, contar_consultas() as primeira_sessao:
+        validate_entity(db, processo_id, Processo)
+        validate_entity(db, processo_id, Processo)
+    with SessionLocal() as db, contar_consultas() as segunda_sessao:
+        processo = validate_entity(db, processo_id, Processo)
+        assert processo.titulo == "Processo do cache"
+
+    assert primeira_sessao.total == 1
+    assert segunda_sessao.total == 0
+
+
+def test_escrita_e_sem_cache_voltam_ao_banco(processo_e_mapa, contar_consultas):
+    from app.cache import invalidar_tabelas
+    from app.database import Processo, SessionLocal
+    from app.utils import validate_entity
+
+    processo_id, _ = processo_e_mapa
+    with SessionLocal() as db:
+        validate_entity(db, processo_id, Processo)
+
+    invalidar_tabelas("processos")
+    with SessionLocal() as db, contar_consultas() as apos_escrita:
+        validate_entity(db, processo_id, Processo)
+    with SessionLocal() as db, contar_consultas() as sem_cache:
+        validate_entity(db, processo_id, Processo, sem_cache=True)
+
+    assert apos_escrita.total == 1
+    assert sem_cache.total == 1
+
+
+def test_xml_do_mapa_so_e_lido_quando_usado(processo_e_mapa, contar_consultas):
+    from app.database import Mapa, SessionLocal
+    from app.utils import validate_entity
+
+    _, mapa_id = processo_e_mapa
+    with SessionLocal() as db:
+        validate_entity(db, mapa_id, Mapa)
+    with SessionLocal() as db, contar_consultas() as contagem:
+        mapa = validate_entity(db, mapa_id, Mapa)
+        assert contagem.total == 0
+        assert mapa.XML
+    assert contagem.total == 1
+
+
+def test_rota_assincrona_usa_o_cache(client, processo_e_mapa, contar_consultas):
+    processo_id, _ = processo_e_mapa
+    with contar_consultas() as primeira:
+        assert client.get(f"/processos/{processo_id}").status_code == 200
+    with contar_consultas() as segunda:
+        assert client.get(f"/processos/{processo_id}").status_code == 200
+
+    assert segunda.total == primeira.total - 1
@@ -0,0 +1,86 @@
+"""
+As buscas resolvem processos, mapas e metadados relacionados em lote (loaders.py):
+o número de comandos SQL por página não pode crescer com o número de resultados.
+"""
+import uuid
+
+import pytest
+
+BUSCAS = [
+    ("/banco/busca-geral/", "q", "resultados"),
+    ("/banco/busca-geral/paginada/", "q", "resultados"),
+    ("/banco/busca-por-metadados/", "q", "resultados"),
+    ("/metadados/buscar/", "termo", "metadados"),
+]
+
+
+def _popular(client, quantidade: int) -> str:
+    """Cria `quantidade` processos, cada um com um mapa e um metadado que contêm um termo novo"""
+    termo = f"termo{uuid.uuid4().hex[:10]}"
+    lote = client.post("/hierarchy/lote/", json={
+        "processos": [{"ref": f"p{i}", "titulo": f"Processo {termo} {i}"} for i in range(quantidade)],
+        "mapas": [{"ref": f"m{i}", "titulo": f"Mapa {termo} {i}", "id_proc": f"p{i}"} for i in range(quantidade)],
+    })
+    assert lote.status_code == 200, lote.text
+    for id_mapa in lote.json()["mapas"].values():
+        resposta = client.post("/metadados/lote/", json={
+            "id_processo": id_mapa,
+            "metadados": [{"id_atividade": "Activity_1", "nome": termo, "lgpd": "Pessoal", "dados": [termo]}],
+        })
+        assert resposta.status_code == 200, resposta.text
+    return termo
+
+
+@pytest.mark.parametrize("url, parametro, chave", BUSCAS)
+def test_consultas_por_pagina_nao_crescem_com_os_resultados(client, contar_consultas, url, parametro, chave):
+    termo_um = _popular(client, 1)
+    termo_varios = _popular(client, 8)
+
+    with contar_consultas() as um:
+        resposta_um = client.get(url, params={parametro: termo_um})
+    with contar_consultas() as varios:
+        resposta_varios = client.get(url, params={parametro: termo_varios})
+
+    assert resposta_um.status_code == 200, resposta_um.text
+    assert resposta_varios.status_code == 200, resposta_varios.text
+    assert len(resposta_varios.json()[chave]) > len(resposta_um.json()[chave]) > 0
+    assert 0 < um.total == varios.total, varios.consultas
+
+
+def test_busca_por_metadados_resolve_titulos_em_uma_consulta(client, contar_consultas):
+    """Metadados cujo id_processo (id de mapa) não é id de processo caem na busca pelo título"""
+
+    def popular(quantidade: int) -> str:
+        termo = f"termo{uuid.uuid4().hex[:10]}"
+        lote = client.post("/hierarchy/lote/", json={
+            "processos": [{"ref": f"p{i}", "titulo": f"Processo {termo}-{i}"} for i in range(quantidade)],
+        })
+        assert lote.status_code == 200, lote.text
+        # Mapa com id fora da sequência: nenhum processo tem o mesmo id
+        from app.database import Mapa, SessionLocal
+        with SessionLocal() as db:
+            mapa = Mapa(id=1_000_000_000 + quantidade, titulo=f"Mapa {termo}")
+            db.add(mapa)
+            db.commit()
+            id_mapa = mapa.id
+        resposta = client.post("/metadados/lote/", json={
+            "id_processo": id_mapa,
+            "metadados": [
+                {"id_atividade": f"Activity_{i}", "nome": f"{termo}-{i}", "lgpd": "Pessoal", "dados": []}
+                for i in range(quantidade)
+            ],
+        })
+        assert resposta.status_code == 200, resposta.text
+        return termo
+
+    termo_um, termo_varios = popular(1), popular(8)
+    with contar_consultas() as um:
+        resposta_um = client.get("/banco/busca-por-metadados/", params={"q": termo_um})
+    with contar_consultas() as varios:
+        resposta_varios = client.get("/banco/busca-por-metadados/", params={"q": termo_varios})
+
+    assert resposta_um.status_code == 200, resposta_um.text
+    assert resposta_varios.status_code == 200, resposta_varios.text
+    assert len(resposta_um.json()["resultados"]) == 1
+    assert len(resposta_varios.json()["resultados"]) == 8
+    assert 0 < um.total == varios.total, varios.consultas
@@ -0,0 +1,30 @@
+"""
+Tempo de boot (perfil_importacao.py): `import app.main` não carrega as
+integrações opcionais e fica dentro de ORCAMENTO_IMPORTACAO_MS.
+"""
+import subprocess
+import sys
+
+from app.perfil_importacao import ORCAMENTO_IMPORTACAO_MS, RAIZ, medir
+
+# Carregados só no primeiro uso: SDK do Gemini, hash de senha e JWT
+CARREGADOS_SOB_DEMANDA = ("google.generativeai", "passlib", "jose")
+
+
+def test_integracoes_opcionais_fora_do_import():
+    saida = subprocess.run(
+        [sys.executable, "-c", "import sys, app.main; print('\\n'.join(sys.modules))"],
+        capture_output=True, text=True, check=True, cwd=RAIZ,
+    ).stdout
+    carregados = [
+        modulo for modulo in saida.split()
+        if any(modulo == nome or modulo.startswith(nome + ".") for nome in CARREGADOS_SOB_DEMANDA)
+    ]
+    assert carregados == []
+
+
+def test_import_dentro_do_orcamento():
+    # A primeira medição pode incluir a compilação dos .pyc: vale a menor de duas
+    tempos = min((medir() for _ in range(2)), key=lambda t: t[0][0])
+    total_ms = tempos[0][0] / 1000
+    assert total_ms <= ORCAMENTO_IMPORTACAO_MS, tempos[:10]
@@ -0,0 +1,137 @@
+"""
+Exclusão lógica (lixeira.py): o que foi excluído some das consultas, volta na
+restauração e só é removido de fato pela purga, em lotes e por um worker por vez.
+"""
+import uuid
+from datetime import timedelta
+
+
+def _criar_hierarquia(client, mapas: int = 1):
+    """Macroprocesso -> processo -> filho, com `mapas` mapas no filho (cada um com um metadado)"""
+    termo = f"lixo{uuid.uuid4().hex[:10]}"
+    macro = client.post("/macroprocessos/", json={"titulo": f"Macro {termo}"}).json()["macroprocesso"]["id"]
+    lote = client.post("/hierarchy/lote/", json={
+        "processos": [
+            {"ref": "pai", "titulo": f"Pai {termo}"},
+            {"ref": "filho", "titulo": f"Filho {termo}", "id_pai": "pai"},
+        ],
+        "mapas": [{"ref": f"m{i}", "titulo": f"Mapa {termo} {i}", "id_proc": "filho"} for i in range(mapas)],
+        "associacoes": [{"macro_processo_id": macro, "processo_id": "pai"}],
+    })
+    assert lote.status_code == 200, lote.text
+    ids = lote.json()
+    for id_mapa in ids["mapas"].values():
+        resposta = client.post("/metadados/lote/", json={
+            "id_processo": id_mapa,
+            "metadados": [{"id_atividade": "Activity_1", "nome": termo, "lgpd": "Pessoal", "dados": [termo]}],
+        })
+        assert resposta.status_code == 200, resposta.text
+    return termo, macro, ids["processos"], list(ids["mapas"].values())
+
+
+def _visiveis(client, termo, macro, processos, mapas):
+    """O que as rotas de leitura enxergam da hierarquia criada por _criar_hierarquia"""
+    return {
+        "processos": [p for p in processos.values() if client.get(f"/processos/{p}").status_code == 200],
+        "mapas": [m for m in mapas if client.get(f"/mapas/{m}").status_code == 200],
+        "metadados": len(client.get("/metadados/buscar/", params={"termo": termo}).json()["metadados"]),
+        "associacoes": len(client.get("/macroprocesso_processos/", params={"macro_processo_id": macro}).json()["associacoes"]),
+    }
+
+
+def _envelhecer(processo_id: int) -> None:
+    """Coloca a exclusão do processo (e do que saiu junto) fora da janela de restauração"""
+    from app.database import Mapa, Processo, SessionLocal
+    from app.lixeira import JANELA_RESTAURACAO
+
+    with SessionLocal() as db:
+        db.info["incluir_excluidos"] = True
+        excluido_em = db.get(Processo, processo_id).excluido_em
+        antigo = excluido_em - JANELA_RESTAURACAO - timedelta(days=1)
+        db.query(Mapa).filter(Mapa.excluido_em == excluido_em).update({Mapa.excluido_em: antigo}, synchronize_session=False)
+        db.query(Processo).filter(Processo.excluido_em == excluido_em).update({Processo.excluido_em: antigo}, synchronize_session=False)
+        db.commit()
+
+
+def test_exclusao_some_das_consultas_e_restauracao_traz_de_volta(client):
+    termo, macro, processos, mapas = _criar_hierarquia(client)
+    antes = _visiveis(client, termo, macro, processos, mapas)
+    assert antes == {"processos": list(processos.values()), "mapas": mapas, "metadados": 1, "associacoes": 1}
+
+    resposta = client.delete(f"/processos/{processos['pai']}")
+    assert resposta.status_code == 200, resposta.text
+    assert _visiveis(client, termo, macro, processos, mapas) == {
+        "processos": [], "mapas": [], "metadados": 0, "associacoes": 0,
+    }
+    lixeira = client.get("/lixeira/").json()
+    # Só a raiz da exclusão aparece na lixeira
+    assert [p["id"] for p in lixeira["processos"] if p["id"] in processos.values()] == [processos["pai"]]
+    assert not [m for m in lixeira["mapas"] if m["id"] in mapas]
+
+    filho = client.post(f"/lixeira/processos/{processos['filho']}/restaurar")
+    assert filho.status_code == 409, filho.text
+    resposta = client.post(f"/lixeira/processos/{processos['pai']}/restaurar")
+    assert resposta.status_code == 200, resposta.text
+    assert _visiveis(client, termo, macro, processos, mapas) == antes
+
+
+def test_restauracao_fora_da_janela_responde_410(client):
+    _, _, processos, _ = _criar_hierarquia(client)
+    client.delete(f"/processos/{processos['pai']}")
+    _envelhecer(processos["pai"])
+    resposta = client.post(f"/lixeira/processos/{processos['pai']}/restaurar")
+    assert resposta.status_code == 410, resposta.text
+
+
+def test_purga_remove_em_lotes(client, contar_consultas, monkeypatch):
+    from app import lixeira
+    from app.database import Mapa, Metadados, Processo, SessionLocal
+
+    _, _, processos, mapas = _criar_hierarquia(client, mapas=5)
+    client.delete(f"/processos/{processos['pai']}")
+    _envelhecer(processos["pai"])
+
+    monkeypatch.setattr(lixeira, "TAMANHO_LOTE_PURGA", 2)
+    with contar_consultas() as contagem:
+        lixeira.purgar_excluidos()
+
+    assert lixeira.ESTADO_PURGA["erro"] is None
+    removidos = lixeira.ESTADO_PURGA["removidos"]
+    assert removidos["mapas"] >= 5 and removidos["metadados"] >= 5 and removidos["processos"] >= 2
+    # 5 mapas em lotes de 2: três DELETEs de mapas, cada um com o seu commit
+    deletes_mapas = [c for c in contagem.consultas if c.startswith("DELETE FROM mapas ")]
+    assert len(deletes_mapas) == 3
+
+    with SessionLocal() as db:
+        db.info["incluir_excluidos"] = True
+        assert db.query(Mapa).filter(Mapa.id.in_(mapas)).count() == 0
+        assert db.query(Metadados).filter(Metadados.id_processo.in_(mapas)).count() == 0
+        assert db.query(Processo).filter(Processo.id.in_(processos.values())).count() == 0
+    assert client.post(f"/lixeira/processos/{processos['pai']}/restaurar").status_code == 404
+
+
+def test_purga_nao_roda_com_outro_worker_purgando(client):
+    from sqlalchemy import text
+    from app import lixeira
+    from app.database import Mapa, SessionLocal, engine
+
+    _, _, processos, mapas = _criar_hierarquia(client)
+    client.delete(f"/processos/{processos['pai']}")
+    _envelhecer(processos["pai"])
+
+    # Outro worker com o advisory lock da purga
+    with engine.connect() as outro_worker:
+        outro_worker.execute(text("SELECT pg_advisory_lock(:chave)"), {"chave": lixeira.CHAVE_LOCK_PURGA})
+        inicio_anterior = lixeira.ESTADO_PURGA["inicio"]
+        lixeira.purgar_excluidos()
+        assert lixeira.ESTADO_PURGA["inicio"] == inicio_anterior
+        outro_worker.execute(text("SELECT pg_advisory_unlock(:chave)"), {"chave": lixeira.CHAVE_LOCK_PURGA})
+
+    with SessionLocal() as db:
+        db.info["incluir_excluidos"] = True
+        assert db.query(Mapa).filter(Mapa.id.in_(mapas)).count() == 1
+
+    lixeira.purgar_excluidos()
+    with SessionLocal() as db:
+        db.info["incluir_excluidos"] = True
+        assert db.query(Mapa).filter(Mapa.id.in_(mapas)).count() == 0
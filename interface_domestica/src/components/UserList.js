@@ -1,6 +1,19 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 
+// As listagens da API são paginadas: segue o proximo_cursor até o fim
+const buscarTodasPaginas = async (url, chave) => {
+    const itens = [];
+    let cursor = null;
+    do {
+        const params = cursor !== null ? { limite: 1000, cursor } : { limite: 1000 };
+        const response = await axios.get(url, { params });
+        itens.push(...response.data[chave]);
+        cursor = response.data.proximo_cursor;
+    } while (cursor !== null);
+    return itens;
+};
+
 function UserList() {
     const [usuarios, setUsuarios] = useState([]);
     const [items, setItems] = useState([]);
@@ -13,11 +26,9 @@ function UserList() {
             // console.log(`${apiUrl}/usuarios/`)
 
             // const response = await axios.get(`${apiUrl}`);
-            const response = await axios.get(`${apiUrl}/usuarios/`);
-            setUsuarios(response.data.usuarios);
-            const response2 = await axios.get(`${apiUrl}/items/`);
+            setUsuarios(await buscarTodasPaginas(`${apiUrl}/usuarios/`, 'usuarios'));
             // const response2 = await axios.get(`${apiUrl}`);
-            setItems(response2.data.items);
+            setItems(await buscarTodasPaginas(`${apiUrl}/items/`, 'items'));
         }
 
         fetchUsuarios();
@@ -57,6 +57,20 @@ const getStatusBadgeVariant = (status: string): "default" | "secondary" | "destr
   }
 };
 
+// As listagens da API são paginadas: segue o proximo_cursor até o fim
+const fetchTodasPaginas = async <T,>(url: string, chave: string, erro: string): Promise<T[]> => {
+  const itens: T[] = [];
+  let cursor: number | null = null;
+  do {
+    const response = await fetch(`${url}&limite=1000${cursor !== null ? `&cursor=${cursor}` : ''}`, { credentials: 'include' });
+    if (!response.ok) throw new Error(erro);
+    const data = await response.json();
+    itens.push(...data[chave]);
+    cursor = data.proximo_cursor;
+  } while (cursor !== null);
+  return itens;
+};
+
 export const MockupProcesso = () => {
   const [mapas, setMapas] = useState<Array<{
     id: number;
@@ -72,23 +86,27 @@ export const MockupProcesso = () => {
   useEffect(() => {
     const fetchMapasEProcessos = async () => {
       try {
-        // Fetch mapas
-        const mapasResponse = await fetch(`${API_URL}/mapas/`);
-        if (!mapasResponse.ok) throw new Error('Falha ao carregar mapas');
-        const mapasData = await mapasResponse.json();
+        // Fetch mapas (sem o XML)
+        const mapas = await fetchTodasPaginas<Mapa>(
+          `${API_URL}/mapas/?fields=id,id_proc,titulo,status,data_modificacao`,
+          'mapas',
+          'Falha ao carregar mapas'
+        );
 
         // Fetch processos
-        const processosResponse = await fetch(`${API_URL}/processos/`);
-        if (!processosResponse.ok) throw new Error('Falha ao carregar processos');
-        const processosData = await processosResponse.json();
+        const processos = await fetchTodasPaginas<Processo>(
+          `${API_URL}/processos/?fields=id,titulo`,
+          'processos',
+          'Falha ao carregar processos'
+        );
 
         // Create a map of processo_id to processo
         const processosMap = new Map(
-          processosData.processos.map((p: Processo) => [p.id, p])
+          processos.map((p: Processo) => [p.id, p])
         );
 
         // Combine mapa data with processo data
-        const mappedData = mapasData.mapas.map((mapa: Mapa) => {
+        const mappedData = mapas.map((mapa: Mapa) => {
           const processo = processosMap.get(mapa.id_proc);
           return {
             id: mapa.id,
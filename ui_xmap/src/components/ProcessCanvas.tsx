@@ -80,7 +80,7 @@ interface ProcessNode {
 const API_URL = "http://localhost:8000";
 
 const fetchHierarchy = async (): Promise<ProcessNode[]> => {
-  const response = await fetch(`${API_URL}/hierarchy/`);
+  const response = await fetch(`${API_URL}/hierarchy/`, { credentials: 'include' });
   if (!response.ok) {
     throw new Error('Failed to fetch hierarchy');
   }
@@ -90,6 +90,7 @@ const fetchHierarchy = async (): Promise<ProcessNode[]> => {
 
 const createMacroProcesso = async (titulo: string) => {
   const response = await fetch(`${API_URL}/macroprocessos/`, {
+    credentials: 'include',
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ titulo }),
@@ -100,6 +101,7 @@ const createMacroProcesso = async (titulo: string) => {
 
 const deleteMacroProcesso = async (macroId: number) => {
   const response = await fetch(`${API_URL}/macroprocessos/${macroId}`, {
+    credentials: 'include',
     method: 'DELETE',
   });
   if (!response.ok) throw new Error('Failed to delete macroprocesso');
@@ -111,6 +113,7 @@ const createProcess = async ({ titulo, id_pai, ordem }: { titulo: string; id_pai
   if (id_pai !== undefined) body.id_pai = id_pai;
   if (ordem !== undefined) body.ordem = ordem;
   const response = await fetch(`${API_URL}/processos/`, {
+    credentials: 'include',
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(body),
@@ -121,6 +124,7 @@ const createProcess = async ({ titulo, id_pai, ordem }: { titulo: string; id_pai
 
 const deleteProcess = async (processId: number) => {
   const response = await fetch(`${API_URL}/processos/${processId}`, {
+    credentials: 'include',
     method: 'DELETE',
   });
   if (!response.ok) throw new Error('Failed to delete process');
@@ -131,6 +135,7 @@ const createAssociation = async ({ macro_processo_id, processo_id, ordem }: { ma
   const body: any = { macro_processo_id, processo_id };
   if (ordem !== undefined) body.ordem = ordem;
   const response = await fetch(`${API_URL}/macroprocesso_processos/`, {
+    credentials: 'include',
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify(body),
@@ -141,6 +146,7 @@ const createAssociation = async ({ macro_processo_id, processo_id, ordem }: { ma
 
 const createMap = async ({ id_proc, titulo, XML }: { id_proc: number; titulo: string; XML: string }) => {
   const response = await fetch(`${API_URL}/mapas/`, {
+    credentials: 'include',
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ id_proc, titulo, XML }),
@@ -151,6 +157,7 @@ const createMap = async ({ id_proc, titulo, XML }: { id_proc: number; titulo: st
 
 const deleteMap = async (mapId: number) => {
   const response = await fetch(`${API_URL}/mapas/${mapId}`, {
+    credentials: 'include',
     method: 'DELETE',
   });
   if (!response.ok) throw new Error('Failed to delete map');
@@ -163,6 +170,7 @@ const moveProcess = async ({ processId, targetMacroId, targetProcessoId }: {
   targetProcessoId?: number 
 }) => {
   const response = await fetch(`${API_URL}/processos/${processId}/move`, {
+    credentials: 'include',
     method: 'PUT',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ 
@@ -179,6 +187,7 @@ const moveProcess = async ({ processId, targetMacroId, targetProcessoId }: {
 
 const moveMap = async ({ mapId, targetProcessoId }: { mapId: number; targetProcessoId: number }) => {
   const response = await fetch(`${API_URL}/mapas/${mapId}/move`, {
+    credentials: 'include',
     method: 'PUT',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({ target_processo_id: targetProcessoId }),
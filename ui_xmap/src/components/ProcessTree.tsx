@@ -44,7 +44,7 @@ interface ProcessNode {
 }
 
 const fetchHierarchy = async (): Promise<ProcessNode[]> => {
-  const response = await fetch('http://localhost:8000/hierarchy/');
+  const response = await fetch('http://localhost:8000/hierarchy/', { credentials: 'include' });
   if (!response.ok) {
     throw new Error('Failed to fetch hierarchy');
   }
@@ -76,6 +76,7 @@ export const ProcessTree = () => {
   const deleteProcessMutation = useMutation({
     mutationFn: async (id: number) => {
       const response = await fetch(`http://localhost:8000/processos/${id}`, {
+        credentials: 'include',
         method: 'DELETE',
       });
       if (!response.ok) {
@@ -104,6 +105,7 @@ export const ProcessTree = () => {
   const deleteMacroMutation = useMutation({
     mutationFn: async (id: number) => {
       const response = await fetch(`http://localhost:8000/macroprocessos/${id}`, {
+        credentials: 'include',
         method: 'DELETE',
       });
       if (!response.ok) {
@@ -132,6 +134,7 @@ export const ProcessTree = () => {
   const deleteMapMutation = useMutation({
     mutationFn: async (id: number) => {
       const response = await fetch(`http://localhost:8000/mapas/${id}`, {
+        credentials: 'include',
         method: 'DELETE',
       });
       if (!response.ok) {
@@ -44,14 +44,14 @@ export const ProcessViewer = ({ processoId, onClose }: ProcessViewerProps) => {
         setLoading(true);
         
         // Fetch metadados do processo
-        const metadadosResponse = await fetch(`${API_URL}/metadados/processo/${processoId}`);
+        const metadadosResponse = await fetch(`${API_URL}/metadados/processo/${processoId}`, { credentials: 'include' });
         if (metadadosResponse.ok) {
           const metadadosData = await metadadosResponse.json();
           setMetadados(metadadosData.metadados || []);
         }
 
         // Fetch documentos do processo
-        const documentosResponse = await fetch(`${API_URL}/documentos/processo/${processoId}`);
+        const documentosResponse = await fetch(`${API_URL}/documentos/processo/${processoId}`, { credentials: 'include' });
         if (documentosResponse.ok) {
           const documentosData = await documentosResponse.json();
           setDocumentos(documentosData.documentos || []);
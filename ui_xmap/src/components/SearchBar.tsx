@@ -150,7 +150,7 @@ export const SearchBar = () => {
       console.log('🔍 Buscando por metadados:', searchTerm);
       const url = `${API_URL}/metadados/buscar/?termo=${encodeURIComponent(searchTerm)}`;
 
-      const response = await fetch(url);
+      const response = await fetch(url, { credentials: 'include' });
       
       if (!response.ok) {
         if (response.status === 404) {
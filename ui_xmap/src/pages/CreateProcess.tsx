@@ -35,6 +35,7 @@ const CreateProcess: React.FC<CreateProcessProps> = ({ onSuccess }) => {
     if (payload.titulo) queryParams.append('titulo', payload.titulo);
     
     const response = await fetch(`${API_URL}/processos/?${queryParams}`, {
+      credentials: 'include',
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -80,6 +81,7 @@ const createMapa = async (processoId: number) => {
   });
     
   const response = await fetch(`${API_URL}/mapas/?${queryParams}`, {
+    credentials: 'include',
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
@@ -36,7 +36,7 @@ interface ProcessNode {
 }
 
 const fetchHierarchy = async (): Promise<ProcessNode[]> => {
-  const response = await fetch('http://localhost:8000/hierarchy/');
+  const response = await fetch('http://localhost:8000/hierarchy/', { credentials: 'include' });
   if (!response.ok) {
     throw new Error('Failed to fetch hierarchy');
   }
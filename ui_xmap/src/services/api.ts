@@ -26,6 +26,7 @@ export async function searchAll(
 
   const token = localStorage.getItem('access_token');
   const res = await fetch(`${API_BASE_URL}/banco/busca-geral/?${params.toString()}`, {
+    credentials: 'include',
     method: 'GET',
     headers: {
       'Accept': 'application/json',
@@ -66,7 +67,7 @@ export const getDashboardData = async (status?: string): Promise<DashboardData>
   }
 
   // O cabeçalho de autorização foi removido da requisição
-  const response = await fetch(url.toString());
+  const response = await fetch(url.toString(), { credentials: 'include' });
 
   if (!response.ok) {
     throw new Error('Falha ao buscar dados do dashboard');
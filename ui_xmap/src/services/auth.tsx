@@ -24,7 +24,7 @@ const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 const authService = {
   async checkAuthStatus() {
     try {
-      const response = await fetch(`${API_BASE_URL}/auth/status`);
+      const response = await fetch(`${API_BASE_URL}/auth/status`, { credentials: 'include' });
       if (response.ok) {
         const data = await response.json();
         return data.auth_enabled;
@@ -39,6 +39,7 @@ const authService = {
   async login(email, password) {
     try {
       const response = await fetch(`${API_BASE_URL}/login`, {
+        credentials: 'include',
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -73,6 +74,7 @@ const authService = {
   async register(nome, email, password) {
     try {
       const response = await fetch(`${API_BASE_URL}/register`, {
+        credentials: 'include',
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
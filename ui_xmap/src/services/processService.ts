@@ -17,6 +17,7 @@ export const processService = {
   async criar(data: ProcessoData) {
     try {
       const response = await fetch(`${API_URL}/processos/`, {
+        credentials: 'include',
         method: "POST",
         headers: { 
           "Content-Type": "application/json",
@@ -42,6 +43,7 @@ export const processService = {
   async criarMapa(data: MapaData) {
     try {
       const response = await fetch(`${API_URL}/mapas/`, {
+        credentials: 'include',
         method: "POST",
         headers: { 
           "Content-Type": "application/json",
@@ -24,6 +24,7 @@ export async function searchAll(
 
   const token = localStorage.getItem('access_token');
   const res = await fetch(`${API_BASE_URL}/banco/busca-geral/?${params.toString()}`, {
+    credentials: 'include',
     method: 'GET',
  
     signal